@@ -19,10 +19,7 @@ import json
 from webob import Response
 
 from ryu.base import app_manager
-from ryu.controller import ofp_event
 from ryu.controller import dpset
-from ryu.controller.handler import MAIN_DISPATCHER
-from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_0
 from ryu.ofproto import ofproto_v1_3
 from ryu.lib import ofctl_v1_0
@@ -48,6 +45,15 @@ LOG = logging.getLogger('ryu.app.ofctl_rest')
 # get ports stats of the switch
 # GET /stats/port/<dpid>
 #
+# flows and ports stats can be streamed as chunked JSON, entry by entry as
+# the switch replies, instead of being collected first.  it keeps memory
+# usage flat for a switch with a huge flow table.
+# GET /stats/flow/<dpid>?stream=1
+# GET /stats/port/<dpid>?stream=1
+#
+# get the send queue counters of the controller for the switch
+# GET /stats/sendq/<dpid>
+#
 ## Update the switch stats
 #
 # add a flow entry
@@ -64,11 +70,27 @@ LOG = logging.getLogger('ryu.app.ofctl_rest')
 #
 
 
+def _json_stream(dpid, entries):
+    # generate the same document as json.dumps({str(dpid): list(entries)}).
+    # nothing is sent until the first entry arrives, so that a request
+    # which fails at once gets a 500.  a later failure is raised too,
+    # which closes the connection before the end of the chunked body, so
+    # that a client can't take the truncated list for a whole one.
+    entries = iter(entries)
+    for entry in entries:
+        yield '{%s: [%s' % (json.dumps(str(dpid)), json.dumps(entry))
+        break
+    else:
+        yield '{%s: [' % json.dumps(str(dpid))
+    for entry in entries:
+        yield ', ' + json.dumps(entry)
+    yield ']}'
+
+
 class StatsController(ControllerBase):
     def __init__(self, req, link, data, **config):
         super(StatsController, self).__init__(req, link, data, **config)
         self.dpset = data['dpset']
-        self.waiters = data['waiters']
 
     def get_dpids(self, req, **_kwargs):
         dps = self.dpset.dps.keys()
@@ -81,9 +103,9 @@ class StatsController(ControllerBase):
             return Response(status=404)
 
         if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
-            desc = ofctl_v1_0.get_desc_stats(dp, self.waiters)
+            desc = ofctl_v1_0.get_desc_stats(dp)
         elif dp.ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
-            desc = ofctl_v1_3.get_desc_stats(dp, self.waiters)
+            desc = ofctl_v1_3.get_desc_stats(dp)
         else:
             LOG.debug('Unsupported OF protocol')
             return Response(status=501)
@@ -97,13 +119,19 @@ class StatsController(ControllerBase):
             return Response(status=404)
 
         if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
-            flows = ofctl_v1_0.get_flow_stats(dp, self.waiters)
+            ofctl = ofctl_v1_0
         elif dp.ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
-            flows = ofctl_v1_3.get_flow_stats(dp, self.waiters)
+            ofctl = ofctl_v1_3
         else:
             LOG.debug('Unsupported OF protocol')
             return Response(status=501)
 
+        if req.GET.get('stream'):
+            return Response(content_type='application/json',
+                            app_iter=_json_stream(dp.id,
+                                                  ofctl.iter_flow_stats(dp)))
+
+        flows = ofctl.get_flow_stats(dp)
         body = json.dumps(flows)
         return (Response(content_type='application/json', body=body))
 
@@ -113,16 +141,32 @@ class StatsController(ControllerBase):
             return Response(status=404)
 
         if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
-            ports = ofctl_v1_0.get_port_stats(dp, self.waiters)
+            ofctl = ofctl_v1_0
         elif dp.ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
-            ports = ofctl_v1_3.get_port_stats(dp, self.waiters)
+            ofctl = ofctl_v1_3
         else:
             LOG.debug('Unsupported OF protocol')
             return Response(status=501)
 
+        if req.GET.get('stream'):
+            return Response(content_type='application/json',
+                            app_iter=_json_stream(dp.id,
+                                                  ofctl.iter_port_stats(dp)))
+
+        ports = ofctl.get_port_stats(dp)
         body = json.dumps(ports)
         return (Response(content_type='application/json', body=body))
 
+    def get_send_stats(self, req, dpid, **_kwargs):
+        dp = self.dpset.get(int(dpid))
+        if dp is None:
+            return Response(status=404)
+
+        stats = dict(dp.send_stats)
+        stats['queued'] = dp.send_q.qsize() if dp.send_q else 0
+        body = json.dumps({str(dp.id): stats})
+        return (Response(content_type='application/json', body=body))
+
     def mod_flow_entry(self, req, cmd, **_kwargs):
         try:
             flow = eval(req.body)
@@ -182,10 +226,8 @@ class RestStatsApi(app_manager.RyuApp):
         super(RestStatsApi, self).__init__(*args, **kwargs)
         self.dpset = kwargs['dpset']
         wsgi = kwargs['wsgi']
-        self.waiters = {}
         self.data = {}
         self.data['dpset'] = self.dpset
-        self.data['waiters'] = self.waiters
         mapper = wsgi.mapper
 
         wsgi.registory['StatsController'] = self.data
@@ -210,6 +252,11 @@ class RestStatsApi(app_manager.RyuApp):
                        controller=StatsController, action='get_port_stats',
                        conditions=dict(method=['GET']))
 
+        uri = path + '/sendq/{dpid}'
+        mapper.connect('stats', uri,
+                       controller=StatsController, action='get_send_stats',
+                       conditions=dict(method=['GET']))
+
         uri = path + '/flowentry/{cmd}'
         mapper.connect('stats', uri,
                        controller=StatsController, action='mod_flow_entry',
@@ -219,37 +266,3 @@ class RestStatsApi(app_manager.RyuApp):
         mapper.connect('stats', uri,
                        controller=StatsController, action='delete_flow_entry',
                        conditions=dict(method=['DELETE']))
-
-    def stats_reply_handler(self, ev):
-        msg = ev.msg
-        dp = msg.datapath
-
-        if dp.id not in self.waiters:
-            return
-        if msg.xid not in self.waiters[dp.id]:
-            return
-        lock, msgs = self.waiters[dp.id][msg.xid]
-        msgs.append(msg)
-
-        flags = 0
-        if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
-            flags = dp.ofproto.OFPSF_REPLY_MORE
-        elif dp.ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
-            flags = dp.ofproto.OFPMPF_REPLY_MORE
-
-        if msg.flags & flags:
-            return
-        del self.waiters[dp.id][msg.xid]
-        lock.set()
-
-    @set_ev_cls(ofp_event.EventOFPDescStatsReply, MAIN_DISPATCHER)
-    def desc_stats_reply_handler(self, ev):
-        self.stats_reply_handler(ev)
-
-    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
-    def flow_stats_reply_handler(self, ev):
-        self.stats_reply_handler(ev)
-
-    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
-    def port_stats_reply_handler(self, ev):
-        self.stats_reply_handler(ev)
@@ -201,10 +201,8 @@ class RestFirewallAPI(app_manager.RyuApp):
 
         self.dpset = kwargs['dpset']
         wsgi = kwargs['wsgi']
-        self.waiters = {}
         self.data = {}
         self.data['dpset'] = self.dpset
-        self.data['waiters'] = self.waiters
 
         mapper = wsgi.mapper
         wsgi.registory['FirewallController'] = self.data
@@ -282,29 +280,6 @@ class RestFirewallAPI(app_manager.RyuApp):
                        conditions=dict(method=['DELETE']),
                        requirements=requirements)
 
-    def stats_reply_handler(self, ev):
-        msg = ev.msg
-        dp = msg.datapath
-
-        if dp.id not in self.waiters:
-            return
-        if msg.xid not in self.waiters[dp.id]:
-            return
-        lock, msgs = self.waiters[dp.id][msg.xid]
-        msgs.append(msg)
-
-        flags = 0
-        if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION or \
-                dp.ofproto.OFP_VERSION == ofproto_v1_2.OFP_VERSION:
-            flags = dp.ofproto.OFPSF_REPLY_MORE
-        elif dp.ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
-            flags = dp.ofproto.OFPMPF_REPLY_MORE
-
-        if msg.flags & flags:
-            return
-        del self.waiters[dp.id][msg.xid]
-        lock.set()
-
     @set_ev_cls(dpset.EventDP, dpset.DPSET_EV_DISPATCHER)
     def handler_datapath(self, ev):
         if ev.enter:
@@ -312,16 +287,6 @@ class RestFirewallAPI(app_manager.RyuApp):
         else:
             FirewallController.unregist_ofs(ev.dp)
 
-    # for OpenFlow version1.0
-    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
-    def stats_reply_handler_v1_0(self, ev):
-        self.stats_reply_handler(ev)
-
-    # for OpenFlow version1.2 or later
-    @set_ev_cls(ofp_event.EventOFPStatsReply, MAIN_DISPATCHER)
-    def stats_reply_handler_v1_2(self, ev):
-        self.stats_reply_handler(ev)
-
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
         FirewallController.packet_in_handler(ev.msg)
@@ -361,7 +326,6 @@ class FirewallController(ControllerBase):
     def __init__(self, req, link, data, **config):
         super(FirewallController, self).__init__(req, link, data, **config)
         self.dpset = data['dpset']
-        self.waiters = data['waiters']
 
     @classmethod
     def set_logger(cls, logger):
@@ -399,8 +363,7 @@ class FirewallController(ControllerBase):
 
     # GET /firewall/module/status
     def get_status(self, req, **_kwargs):
-        return self._access_module(REST_ALL, 'get_status',
-                                   waiters=self.waiters)
+        return self._access_module(REST_ALL, 'get_status')
 
     # POST /firewall/module/enable/{switchid}
     def set_enable(self, req, switchid, **_kwargs):
@@ -412,8 +375,7 @@ class FirewallController(ControllerBase):
 
     # GET /firewall/log/status
     def get_log_status(self, dummy, **_kwargs):
-        return self._access_module(REST_ALL, 'get_log_status',
-                                   waiters=self.waiters)
+        return self._access_module(REST_ALL, 'get_log_status')
 
     # PUT /firewall/log/enable/{switchid}
     def set_log_enable(self, dummy, switchid, **_kwargs):
@@ -423,7 +385,7 @@ class FirewallController(ControllerBase):
     def set_log_disable(self, dummy, switchid, **_kwargs):
         return self._access_module(switchid, 'set_log_disable')
 
-    def _access_module(self, switchid, func, waiters=None):
+    def _access_module(self, switchid, func):
         try:
             dps = self._OFS_LIST.get_ofs(switchid)
         except ValueError, message:
@@ -432,7 +394,7 @@ class FirewallController(ControllerBase):
         msgs = []
         for f_ofs in dps.values():
             function = getattr(f_ofs, func)
-            msg = function() if waiters is None else function(waiters)
+            msg = function()
             msgs.append(msg)
 
         body = json.dumps(msgs)
@@ -471,7 +433,7 @@ class FirewallController(ControllerBase):
 
         msgs = []
         for f_ofs in dps.values():
-            rules = f_ofs.get_rules(self.waiters, vid)
+            rules = f_ofs.get_rules(vid)
             msgs.append(rules)
 
         body = json.dumps(msgs)
@@ -517,7 +479,7 @@ class FirewallController(ControllerBase):
         msgs = []
         for f_ofs in dps.values():
             try:
-                msg = f_ofs.delete_rule(ruleid, self.waiters, vid)
+                msg = f_ofs.delete_rule(ruleid, vid)
                 msgs.append(msg)
             except ValueError, message:
                 return Response(status=400, body=str(message))
@@ -598,8 +560,8 @@ class Firewall(object):
         return _rest_command
 
     @rest_command
-    def get_status(self, waiters):
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
+    def get_status(self):
+        msgs = self.ofctl.get_flow_stats(self.dp)
 
         status = REST_STATUS_ENABLE
         if str(self.dp.id) in msgs:
@@ -643,8 +605,8 @@ class Firewall(object):
         return REST_COMMAND_RESULT, msg
 
     @rest_command
-    def get_log_status(self, waiters):
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
+    def get_log_status(self):
+        msgs = self.ofctl.get_flow_stats(self.dp)
 
         status = REST_STATUS_DISABLE
         if str(self.dp.id) in msgs:
@@ -735,9 +697,9 @@ class Firewall(object):
         return msg
 
     @rest_command
-    def get_rules(self, waiters, vlan_id):
+    def get_rules(self, vlan_id):
         rules = {}
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
+        msgs = self.ofctl.get_flow_stats(self.dp)
 
         if str(self.dp.id) in msgs:
             flow_stats = msgs[str(self.dp.id)]
@@ -763,7 +725,7 @@ class Firewall(object):
         return REST_ACL, get_data
 
     @rest_command
-    def delete_rule(self, rest, waiters, vlan_id):
+    def delete_rule(self, rest, vlan_id):
         try:
             if rest[REST_RULE_ID] == REST_ALL:
                 rule_id = REST_ALL
@@ -775,7 +737,7 @@ class Firewall(object):
         vlan_list = []
         delete_list = []
 
-        msgs = self.ofctl.get_flow_stats(self.dp, waiters)
+        msgs = self.ofctl.get_flow_stats(self.dp)
         if str(self.dp.id) in msgs:
             flow_stats = msgs[str(self.dp.id)]
             for flow_stat in flow_stats:
@@ -220,8 +220,7 @@ class RestRouterAPI(app_manager.RyuApp):
         RouterController.set_logger(self.logger)
 
         wsgi = kwargs['wsgi']
-        self.waiters = {}
-        self.data = {'waiters': self.waiters}
+        self.data = {}
 
         mapper = wsgi.mapper
         wsgi.registory['RouterController'] = self.data
@@ -268,35 +267,6 @@ class RestRouterAPI(app_manager.RyuApp):
     def packet_in_handler(self, ev):
         RouterController.packet_in_handler(ev.msg)
 
-    def _stats_reply_handler(self, ev):
-        msg = ev.msg
-        dp = msg.datapath
-
-        if (dp.id not in self.waiters
-                or msg.xid not in self.waiters[dp.id]):
-            return
-        event, msgs = self.waiters[dp.id][msg.xid]
-        msgs.append(msg)
-
-        if ofproto_v1_3.OFP_VERSION == dp.ofproto.OFP_VERSION:
-            more = dp.ofproto.OFPMPF_REPLY_MORE
-        else:
-            more = dp.ofproto.OFPSF_REPLY_MORE
-        if msg.flags & more:
-            return
-        del self.waiters[dp.id][msg.xid]
-        event.set()
-
-    # for OpenFlow version1.0
-    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
-    def stats_reply_handler_v1_0(self, ev):
-        self._stats_reply_handler(ev)
-
-    # for OpenFlow version1.2/1.3
-    @set_ev_cls(ofp_event.EventOFPStatsReply, MAIN_DISPATCHER)
-    def stats_reply_handler_v1_2(self, ev):
-        self._stats_reply_handler(ev)
-
     #TODO: Update routing table when port status is changed.
 
 
@@ -331,10 +301,6 @@ class RouterController(ControllerBase):
     _ROUTER_LIST = {}
     _LOGGER = None
 
-    def __init__(self, req, link, data, **config):
-        super(RouterController, self).__init__(req, link, data, **config)
-        self.waiters = data['waiters']
-
     @classmethod
     def set_logger(cls, logger):
         cls._LOGGER = logger
@@ -413,7 +379,7 @@ class RouterController(ControllerBase):
         param = eval(rest_param) if rest_param else {}
         for router in routers.values():
             function = getattr(router, func)
-            data = function(vlan_id, param, self.waiters)
+            data = function(vlan_id, param)
             rest_message.append(data)
 
         return rest_message
@@ -501,7 +467,7 @@ class Router(dict):
             self[vlan_id] = vlan_router
         return self[vlan_id]
 
-    def _del_vlan_router(self, vlan_id, waiters):
+    def _del_vlan_router(self, vlan_id):
         #  Remove unnecessary VlanRouter.
         if vlan_id == VLANID_NONE:
             return
@@ -509,10 +475,10 @@ class Router(dict):
         vlan_router = self[vlan_id]
         if (len(vlan_router.address_data) == 0
                 and len(vlan_router.routing_tbl) == 0):
-            vlan_router.delete(waiters)
+            vlan_router.delete()
             del self[vlan_id]
 
-    def get_data(self, vlan_id, dummy1, dummy2):
+    def get_data(self, vlan_id, dummy):
         vlan_routers = self._get_vlan_router(vlan_id)
         if vlan_routers:
             msgs = [vlan_router.get_data() for vlan_router in vlan_routers]
@@ -522,7 +488,7 @@ class Router(dict):
         return {REST_SWITCHID: self.dpid_str,
                 REST_NW: msgs}
 
-    def set_data(self, vlan_id, param, waiters):
+    def set_data(self, vlan_id, param):
         vlan_routers = self._get_vlan_router(vlan_id)
         if not vlan_routers:
             vlan_routers = [self._add_vlan_router(vlan_id)]
@@ -534,25 +500,25 @@ class Router(dict):
                 msgs.append(msg)
                 if msg[REST_RESULT] == REST_NG:
                     # Data setting is failure.
-                    self._del_vlan_router(vlan_router.vlan_id, waiters)
+                    self._del_vlan_router(vlan_router.vlan_id)
             except ValueError as err_msg:
                 # Data setting is failure.
-                self._del_vlan_router(vlan_router.vlan_id, waiters)
+                self._del_vlan_router(vlan_router.vlan_id)
                 raise err_msg
 
         return {REST_SWITCHID: self.dpid_str,
                 REST_COMMAND_RESULT: msgs}
 
-    def delete_data(self, vlan_id, param, waiters):
+    def delete_data(self, vlan_id, param):
         msgs = []
         vlan_routers = self._get_vlan_router(vlan_id)
         if vlan_routers:
             for vlan_router in vlan_routers:
-                msg = vlan_router.delete_data(param, waiters)
+                msg = vlan_router.delete_data(param)
                 if msg:
                     msgs.append(msg)
                 # Check unnecessary VlanRouter.
-                self._del_vlan_router(vlan_router.vlan_id, waiters)
+                self._del_vlan_router(vlan_router.vlan_id)
         if not msgs:
             msgs = [{REST_RESULT: REST_NG,
                      REST_DETAILS: 'Data is nothing.'}]
@@ -606,9 +572,9 @@ class VlanRouter(object):
         # Set flow: default route (drop)
         self._set_defaultroute_drop()
 
-    def delete(self, waiters):
+    def delete(self):
         # Delete flow.
-        msgs = self.ofctl.get_all_flow(waiters)
+        msgs = self.ofctl.get_all_flow()
         for msg in msgs:
             for stats in msg.body:
                 vlan_id = VlanRouter._cookie_to_id(REST_VLANID, stats.cookie)
@@ -790,19 +756,19 @@ class VlanRouter(object):
         self.logger.info('Set %s (packet in) flow [cookie=0x%x]', log_msg,
                          cookie, extra=self.sw_id)
 
-    def delete_data(self, data, waiters):
+    def delete_data(self, data):
         if REST_ROUTEID in data:
             route_id = data[REST_ROUTEID]
-            msg = self._delete_routing_data(route_id, waiters)
+            msg = self._delete_routing_data(route_id)
         elif REST_ADDRESSID in data:
             address_id = data[REST_ADDRESSID]
-            msg = self._delete_address_data(address_id, waiters)
+            msg = self._delete_address_data(address_id)
         else:
             raise ValueError('Invalid parameter.')
 
         return self._response(msg)
 
-    def _delete_address_data(self, address_id, waiters):
+    def _delete_address_data(self, address_id):
         if address_id != REST_ALL:
             try:
                 address_id = int(address_id)
@@ -814,7 +780,7 @@ class VlanRouter(object):
 
         # Get all flow.
         delete_list = []
-        msgs = self.ofctl.get_all_flow(waiters)
+        msgs = self.ofctl.get_all_flow()
         max_id = UINT16_MAX
         for msg in msgs:
             for stats in msg.body:
@@ -866,7 +832,7 @@ class VlanRouter(object):
 
         return msg
 
-    def _delete_routing_data(self, route_id, waiters):
+    def _delete_routing_data(self, route_id):
         if route_id != REST_ALL:
             try:
                 route_id = int(route_id)
@@ -875,7 +841,7 @@ class VlanRouter(object):
                 raise ValueError(err_msg % (REST_ROUTEID, e.message))
 
         # Get all flow.
-        msgs = self.ofctl.get_all_flow(waiters)
+        msgs = self.ofctl.get_all_flow()
 
         delete_list = []
         for msg in msgs:
@@ -1402,7 +1368,7 @@ class SuspendPacketList(list):
 
     def add(self, in_port, header_list, data):
         suspend_pkt = SuspendPacket(in_port, header_list, data,
-                                    self.wait_arp_reply_timer)
+                                    self.arp_reply_timeout)
         self.append(suspend_pkt)
 
     def delete(self, pkt=None, del_addr=None):
@@ -1414,28 +1380,28 @@ class SuspendPacketList(list):
 
         for pkt in del_list:
             self.remove(pkt)
-            hub.kill(pkt.wait_thread)
-            pkt.wait_thread.wait()
+            pkt.wait_timer.cancel()
 
     def get_data(self, dst_ip):
         return [pkt for pkt in self if pkt.dst_ip == dst_ip]
 
-    def wait_arp_reply_timer(self, suspend_pkt):
-        hub.sleep(ARP_REPLY_TIMER)
+    def arp_reply_timeout(self, suspend_pkt):
         if suspend_pkt in self:
             self.timeout_function(suspend_pkt)
             self.delete(pkt=suspend_pkt)
 
 
 class SuspendPacket(object):
-    def __init__(self, in_port, header_list, data, timer):
+    def __init__(self, in_port, header_list, data, timeout_function):
         super(SuspendPacket, self).__init__()
         self.in_port = in_port
         self.dst_ip = header_list[IPV4].dst
         self.header_list = header_list
         self.data = data
-        # Start ARP reply wait timer.
-        self.wait_thread = hub.spawn(timer, self)
+        # Start ARP reply wait timer.  The timeout function sends an ICMP
+        # error, which can block, so it isn't run by the timer wheel.
+        self.wait_timer = hub.call_later(ARP_REPLY_TIMER, hub.spawn,
+                                         timeout_function, self)
 
 
 class OfCtl(object):
@@ -1581,20 +1547,12 @@ class OfCtl(object):
                       dl_vlan=dl_vlan, nw_dst=dst_ip, dst_mask=dst_mask,
                       nw_proto=nw_proto, actions=actions)
 
-    def send_stats_request(self, stats, waiters):
-        self.dp.set_xid(stats)
-        waiters_per_dp = waiters.setdefault(self.dp.id, {})
-        event = hub.Event()
-        msgs = []
-        waiters_per_dp[stats.xid] = (event, msgs)
-        self.dp.send_msg(stats)
-
+    def send_stats_request(self, stats):
+        future = self.dp.send_request(stats)
         try:
-            event.wait(timeout=OFP_REPLY_TIMER)
-        except hub.Timeout:
-            del waiters_per_dp[stats.xid]
-
-        return msgs
+            return future.result(timeout=OFP_REPLY_TIMER)
+        except RyuException:
+            return []
 
 
 @OfCtl.register_of_version(ofproto_v1_0.OFP_VERSION)
@@ -1606,7 +1564,7 @@ class OfCtl_v1_0(OfCtl):
     def get_packetin_inport(self, msg):
         return msg.in_port
 
-    def get_all_flow(self, waiters):
+    def get_all_flow(self):
         ofp = self.dp.ofproto
         ofp_parser = self.dp.ofproto_parser
 
@@ -1614,7 +1572,7 @@ class OfCtl_v1_0(OfCtl):
                                     0, 0, 0, 0, 0, 0, 0, 0, 0)
         stats = ofp_parser.OFPFlowStatsRequest(self.dp, 0, match,
                                                0xff, ofp.OFPP_NONE)
-        return self.send_stats_request(stats, waiters)
+        return self.send_stats_request(stats)
 
     def set_flow(self, cookie, priority, dl_type=0, dl_dst=0, dl_vlan=0,
                  nw_src=0, src_mask=32, nw_dst=0, dst_mask=32,
@@ -1706,7 +1664,7 @@ class OfCtl_after_v1_2(OfCtl):
                 break
         return in_port
 
-    def get_all_flow(self, waiters):
+    def get_all_flow(self):
         pass
 
     def set_flow(self, cookie, priority, dl_type=0, dl_dst=0, dl_vlan=0,
@@ -1801,14 +1759,14 @@ class OfCtl_v1_2(OfCtl_after_v1_2):
         self.logger.info('Set SW config for TTL error packet in.',
                          extra=self.sw_id)
 
-    def get_all_flow(self, waiters):
+    def get_all_flow(self):
         ofp = self.dp.ofproto
         ofp_parser = self.dp.ofproto_parser
 
         match = ofp_parser.OFPMatch()
         stats = ofp_parser.OFPFlowStatsRequest(self.dp, 0, ofp.OFPP_ANY,
                                                ofp.OFPG_ANY, 0, 0, match)
-        return self.send_stats_request(stats, waiters)
+        return self.send_stats_request(stats)
 
 
 @OfCtl.register_of_version(ofproto_v1_3.OFP_VERSION)
@@ -1833,14 +1791,14 @@ class OfCtl_v1_3(OfCtl_after_v1_2):
         self.logger.info('Set SW config for TTL error packet in.',
                          extra=self.sw_id)
 
-    def get_all_flow(self, waiters):
+    def get_all_flow(self):
         ofp = self.dp.ofproto
         ofp_parser = self.dp.ofproto_parser
 
         match = ofp_parser.OFPMatch()
         stats = ofp_parser.OFPFlowStatsRequest(self.dp, 0, 0, ofp.OFPP_ANY,
                                                ofp.OFPG_ANY, 0, 0, match)
-        return self.send_stats_request(stats, waiters)
+        return self.send_stats_request(stats)
 
 
 def ip_addr_aton(ip_str, err_msg=None):
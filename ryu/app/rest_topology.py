@@ -13,13 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import json
 from webob import Response
 
 from ryu.app.wsgi import ControllerBase, WSGIApplication
 from ryu.base import app_manager
+from ryu.controller.handler import set_ev_cls
 from ryu.lib import dpid as dpid_lib
+from ryu.lib import hub
 from ryu.lib import port_no as port_no_lib
+from ryu.topology import event
 from ryu.topology.switches import get_switch, get_link
 
 # REST API for switch configuration
@@ -36,8 +40,182 @@ from ryu.topology.switches import get_switch, get_link
 # get the links of a switch
 # GET /v1.0/topology/links/<dpid>
 #
+# get the changes of the switches and links
+# GET /v1.0/topology/changes?since=<version>[&wait=<seconds>]
+#
 # where
 # <dpid>: datapath id in 16 hex
+#
+# The topology has a version which is incremented by every change of a
+# switch, including its ports, or a link.  The lists of switches and
+# links are returned with the version of their latest change as ETag,
+# and "304 Not Modified" is returned for If-None-Match with the current
+# ETag.
+#
+# With ?since=<version>, the switches and links requests return only
+# their changes after the version, as
+#   {"version": <current version>,
+#    "changes": [{"version": <version>, "event": "add"|"delete"|"modify",
+#                 "switch"|"link": <switch or link>}, ...]}
+# With &wait=<seconds> too, the request waits for a change for the
+# seconds, at most MAX_WAIT, if there is none yet.  The seconds must be
+# a finite number which isn't negative.  "410 Gone" is
+# returned if the changes are no longer kept (or the version is unknown,
+# e.g. after a restart) and the client should get the lists again.
+
+# number of changes kept for ?since= requests
+CHANGE_LOG_SIZE = 4096
+
+# maximum seconds which a ?wait= request waits for
+MAX_WAIT = 60
+
+# key of the changed switch or link in a change
+_CHANGE_KEYS = {'switches': 'switch', 'links': 'link'}
+
+
+class TopologyState(object):
+    """
+    Versioned topology which is kept up to date by the topology events.
+
+    Every change is kept in a log of log_size changes for changes().
+    The JSON of the lists of switches and links is cached until the
+    next change of them, for all the switches and for each known switch
+    only, so that the cache doesn't grow with the requests for unknown
+    or departed switches.
+    """
+
+    def __init__(self, log_size=CHANGE_LOG_SIZE):
+        super(TopologyState, self).__init__()
+        self.version = 0
+        self.switches = {}      # dpid -> port_no -> port dict
+        self.links = {}         # Link -> link dict
+        # latest version of the changes of each kind
+        self._versions = {'switches': 0, 'links': 0}
+        # (version, kind, dpid, change dict)
+        self._log = collections.deque(maxlen=log_size)
+        self._snapshots = {}    # (kind, dpid) -> (version, JSON)
+        self._changed = hub.Event()
+
+    def _record(self, kind, dpid, event_, obj):
+        self.version += 1
+        self._versions[kind] = self.version
+        change = {'version': self.version, 'event': event_,
+                  _CHANGE_KEYS[kind]: obj}
+        self._log.append((self.version, kind, dpid, change))
+        # wake up the waiters of wait().  they keep the old event.
+        changed = self._changed
+        self._changed = hub.Event()
+        changed.set()
+
+    def _switch_dict(self, dpid):
+        ports = self.switches[dpid]
+        return {'dpid': dpid_lib.dpid_to_str(dpid),
+                'ports': [ports[port_no] for port_no in sorted(ports)]}
+
+    def switch_enter(self, switch):
+        dpid = switch.dp.id
+        self.switches[dpid] = dict((port.port_no, port.to_dict())
+                                   for port in switch.ports)
+        self._record('switches', dpid, 'add', self._switch_dict(dpid))
+
+    def switch_leave(self, switch):
+        dpid = switch.dp.id
+        if dpid not in self.switches:
+            return
+        switch_dict = self._switch_dict(dpid)
+        del self.switches[dpid]
+        for kind in _CHANGE_KEYS:
+            self._snapshots.pop((kind, dpid), None)
+        self._record('switches', dpid, 'delete', switch_dict)
+
+    def port_update(self, port, deleted=False):
+        ports = self.switches.get(port.dpid)
+        if ports is None or port.is_reserved():
+            return
+        if deleted:
+            if ports.pop(port.port_no, None) is None:
+                return
+        else:
+            port_dict = port.to_dict()
+            if ports.get(port.port_no) == port_dict:
+                return
+            ports[port.port_no] = port_dict
+        self._record('switches', port.dpid, 'modify',
+                     self._switch_dict(port.dpid))
+
+    def link_add(self, link):
+        if link in self.links:
+            return
+        link_dict = link.to_dict()
+        self.links[link] = link_dict
+        self._record('links', link.src.dpid, 'add', link_dict)
+
+    def link_delete(self, link):
+        link_dict = self.links.pop(link, None)
+        if link_dict is not None:
+            self._record('links', link.src.dpid, 'delete', link_dict)
+
+    def seed(self, switches, links):
+        """
+        Add the switches and links which aren't known yet, e.g. the ones
+        which entered before the topology events were observed.
+        """
+        for switch in switches:
+            if switch.dp.id not in self.switches:
+                self.switch_enter(switch)
+        for link in links:
+            self.link_add(link)
+
+    def snapshot(self, kind, dpid=None):
+        """
+        Return the version of the latest change of the switches or links,
+        as given by *kind*, and the JSON of their list.  The links of a
+        switch are the ones from it.
+        """
+        version = self._versions[kind]
+        key = (kind, dpid)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None or snapshot[0] != version:
+            if kind == 'switches':
+                if dpid is None:
+                    dpids = sorted(self.switches)
+                else:
+                    dpids = [dpid] if dpid in self.switches else []
+                objs = [self._switch_dict(dpid_) for dpid_ in dpids]
+            else:
+                objs = [link_dict for link, link_dict in self.links.items()
+                        if dpid is None or link.src.dpid == dpid]
+            snapshot = (version, json.dumps(objs))
+            if dpid is None or dpid in self.switches:
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def changes(self, since, kind=None, dpid=None):
+        """
+        Return the list of the changes after version *since*, of *kind*
+        and *dpid* only if they're given.  Return None if the changes
+        are no longer kept or *since* is newer than the version.
+        """
+        if since > self.version:
+            return None
+        changes = []
+        for version, kind_, dpid_, change in reversed(self._log):
+            if version <= since:
+                break
+            if ((kind is None or kind == kind_) and
+                    (dpid is None or dpid == dpid_)):
+                changes.append(change)
+        else:
+            if since < self.version - len(self._log):
+                return None
+        changes.reverse()
+        return changes
+
+    def wait(self, timeout):
+        """
+        Wait for the next change for *timeout* seconds at most.
+        """
+        self._changed.wait(timeout=timeout)
 
 
 class TopologyController(ControllerBase):
@@ -45,21 +223,55 @@ class TopologyController(ControllerBase):
         super(TopologyController, self).__init__(req, link, data, **config)
         self.topology_api_app = data['topology_api_app']
 
-    def list_switches(self, req, **kwargs):
+    def _list(self, req, kind, **kwargs):
         dpid = None
         if 'dpid' in kwargs:
             dpid = dpid_lib.str_to_dpid(kwargs['dpid'])
-        switches = get_switch(self.topology_api_app, dpid)
-        body = json.dumps([switch.to_dict() for switch in switches])
+        if 'since' in req.GET:
+            return self._changes(req, kind, dpid)
+
+        version, body = self.topology_api_app.state.snapshot(kind, dpid)
+        etag = '"%d"' % version
+        if req.headers.get('If-None-Match') == etag:
+            res = Response(status=304)
+        else:
+            res = Response(content_type='application/json', body=body)
+        res.headers['ETag'] = etag
+        return res
+
+    def _changes(self, req, kind=None, dpid=None):
+        try:
+            since = int(req.GET['since'])
+            wait = float(req.GET.get('wait', 0))
+        except (KeyError, ValueError):
+            return Response(status=400)
+        # nan isn't in the range either
+        if not 0 <= wait < float('inf'):
+            return Response(status=400)
+        wait = min(wait, MAX_WAIT)
+
+        state = self.topology_api_app.state
+        changes = state.changes(since, kind, dpid)
+        deadline = hub.monotonic() + wait
+        while changes == []:
+            timeout = deadline - hub.monotonic()
+            if timeout <= 0:
+                break
+            state.wait(timeout)
+            changes = state.changes(since, kind, dpid)
+        if changes is None:
+            return Response(status=410)
+        body = json.dumps({'version': state.version, 'changes': changes})
         return Response(content_type='application/json', body=body)
 
+    def list_switches(self, req, **kwargs):
+        return self._list(req, 'switches', **kwargs)
+
     def list_links(self, req, **kwargs):
-        dpid = None
-        if 'dpid' in kwargs:
-            dpid = dpid_lib.str_to_dpid(kwargs['dpid'])
-        links = get_link(self.topology_api_app, dpid)
-        body = json.dumps([link.to_dict() for link in links])
-        return Response(content_type='application/json', body=body)
+        return self._list(req, 'links', **kwargs)
+
+    def list_changes(self, req, **_kwargs):
+        return self._changes(req)
 
 
 class TopologyAPI(app_manager.RyuApp):
@@ -69,6 +281,7 @@ class TopologyAPI(app_manager.RyuApp):
 
     def __init__(self, *args, **kwargs):
         super(TopologyAPI, self).__init__(*args, **kwargs)
+        self.state = TopologyState()
         wsgi = kwargs['wsgi']
         mapper = wsgi.mapper
 
@@ -97,3 +310,46 @@ class TopologyAPI(app_manager.RyuApp):
         s = mapper.submapper(controller=controller, requirements=requirements)
         s.connect(route_name, uri, action='list_links',
                   conditions=dict(method=['GET']))
+
+        uri = '/v1.0/topology/changes'
+        mapper.connect(route_name, uri, controller=controller,
+                       action='list_changes',
+                       conditions=dict(method=['GET']))
+
+    def start(self):
+        super(TopologyAPI, self).start()
+        hub.spawn(self._seed)
+
+    def _seed(self):
+        # the switches and links found before this application started.
+        # the events sent before the replies are handled after the seed
+        # and only add or delete again, those sent after them are newer.
+        self.state.seed(get_switch(self), get_link(self))
+
+    @set_ev_cls(event.EventSwitchEnter)
+    def switch_enter_handler(self, ev):
+        self.state.switch_enter(ev.switch)
+
+    @set_ev_cls(event.EventSwitchLeave)
+    def switch_leave_handler(self, ev):
+        self.state.switch_leave(ev.switch)
+
+    @set_ev_cls(event.EventPortAdd)
+    def port_add_handler(self, ev):
+        self.state.port_update(ev.port)
+
+    @set_ev_cls(event.EventPortModify)
+    def port_modify_handler(self, ev):
+        self.state.port_update(ev.port)
+
+    @set_ev_cls(event.EventPortDelete)
+    def port_delete_handler(self, ev):
+        self.state.port_update(ev.port, deleted=True)
+
+    @set_ev_cls(event.EventLinkAdd)
+    def link_add_handler(self, ev):
+        self.state.link_add(ev.link)
+
+    @set_ev_cls(event.EventLinkDelete)
+    def link_delete_handler(self, ev):
+        self.state.link_delete(ev.link)
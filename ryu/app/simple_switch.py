@@ -23,8 +23,7 @@ from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_0
 from ryu.lib.mac import haddr_to_bin
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
+from ryu.lib.packet import packet_view
 
 
 class SimpleSwitch(app_manager.RyuApp):
@@ -53,11 +52,10 @@ class SimpleSwitch(app_manager.RyuApp):
         datapath = msg.datapath
         ofproto = datapath.ofproto
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocol(ethernet.ethernet)
+        view = packet_view.PacketView(msg.data)
 
-        dst = eth.dst
-        src = eth.src
+        dst = view.eth_dst
+        src = view.eth_src
 
         dpid = datapath.id
         self.mac_to_port.setdefault(dpid, {})
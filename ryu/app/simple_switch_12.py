@@ -21,8 +21,7 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_2
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
+from ryu.lib.packet import packet_view
 
 
 class SimpleSwitch12(app_manager.RyuApp):
@@ -56,11 +55,10 @@ class SimpleSwitch12(app_manager.RyuApp):
         ofproto = datapath.ofproto
         in_port = msg.match['in_port']
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
+        view = packet_view.PacketView(msg.data)
 
-        dst = eth.dst
-        src = eth.src
+        dst = view.eth_dst
+        src = view.eth_src
 
         dpid = datapath.id
         self.mac_to_port.setdefault(dpid, {})
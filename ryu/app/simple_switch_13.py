@@ -18,8 +18,7 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
+from ryu.lib.packet import packet_view
 
 
 class SimpleSwitch13(app_manager.RyuApp):
@@ -64,13 +63,12 @@ class SimpleSwitch13(app_manager.RyuApp):
         datapath = msg.datapath
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
-        in_port = msg.match['in_port']
+        in_port = msg.get_match_field('in_port')
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
+        view = packet_view.PacketView(msg.data)
 
-        dst = eth.dst
-        src = eth.src
+        dst = view.eth_dst
+        src = view.eth_src
 
         dpid = datapath.id
         self.mac_to_port.setdefault(dpid, {})
@@ -14,11 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import inspect
 import itertools
 import logging
 import sys
 
+from oslo.config import cfg
+
+from ryu import exception
 from ryu import utils
 from ryu.controller.handler import register_instance, get_dependent_services
 from ryu.controller.controller import Datapath
@@ -28,6 +32,16 @@ from ryu.lib import hub
 
 LOG = logging.getLogger('ryu.base.app_manager')
 
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.IntOpt('app-event-queue-size', default=128,
+               help='number of queued events per application at which '
+                    'overload handling starts'),
+    cfg.StrOpt('app-event-queue-overload', default='drop-oldest',
+               help='overload handling of application event queues: '
+                    'block, drop-oldest or drop-newest')
+])
+
 SERVICE_BRICKS = {}
 
 
@@ -46,12 +60,123 @@ def unregister_app(app):
     SERVICE_BRICKS.pop(app.name)
 
 
+class EventQueue(object):
+    """
+    Event queue of an application.
+
+    Events are delivered in the order of their EVENT_PRIORITY and in
+    FIFO order within a priority.  An event with EVENT_BARRIER set is
+    delivered only after every event queued before it, so that it is
+    never reordered ahead of them.  When maxsize events are queued,
+    the overload policy decides what happens to a new event:
+
+    block:       the sender waits until the application catches up.
+    drop-oldest: the oldest queued low priority event is dropped to
+                 make room.  If there is none, a new low priority
+                 event is dropped and any other sender waits.
+    drop-newest: a new low priority event is dropped and any other
+                 sender waits.
+
+    Only low priority events (e.g. packet-in) are ever dropped, so that
+    a slow application can't block the receive loop of a datapath
+    behind them.
+    """
+
+    POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+    def __init__(self, maxsize=128, policy='drop-oldest'):
+        super(EventQueue, self).__init__()
+        if policy not in self.POLICIES:
+            raise ValueError('unknown event queue overload policy %s' %
+                             policy)
+        self.maxsize = maxsize
+        self.policy = policy
+        self._queues = tuple(collections.deque()
+                             for _i in event.EVENT_PRIORITIES)
+        self._len = 0
+        self._seq = itertools.count()
+        self._getters = 0
+        self._putters = 0
+        self._not_empty = hub.Event()
+        self._not_full = hub.Event()
+        self.stats = {
+            'queued': 0,        # number of events put
+            'dropped': 0,       # number of events shed on overload
+            'stalls': 0,        # number of times a sender blocked
+            'max_len': 0,       # high watermark of queued events
+        }
+
+    def qsize(self):
+        return self._len
+
+    def empty(self):
+        return self._len == 0
+
+    def _shed(self, priority):
+        # return True if the new event is dropped
+        low = self._queues[event.EVENT_PRIORITY_LOW]
+        if self.policy == 'drop-oldest' and low:
+            low.popleft()
+            self._len -= 1
+            self.stats['dropped'] += 1
+            return False
+        if self.policy != 'block' and priority == event.EVENT_PRIORITY_LOW:
+            self.stats['dropped'] += 1
+            return True
+
+        self.stats['stalls'] += 1
+        self._putters += 1
+        try:
+            while self._len >= self.maxsize:
+                self._not_full.clear()
+                self._not_full.wait()
+        finally:
+            self._putters -= 1
+        return False
+
+    def put(self, item):
+        ev, _state = item
+        priority = ev.EVENT_PRIORITY
+        if self._len >= self.maxsize and self._shed(priority):
+            return
+        self._queues[priority].append((next(self._seq), item))
+        self._len += 1
+        self.stats['queued'] += 1
+        if self._len > self.stats['max_len']:
+            self.stats['max_len'] = self._len
+        if self._getters:
+            self._not_empty.set()
+
+    def get(self):
+        self._getters += 1
+        try:
+            while not self._len:
+                self._not_empty.clear()
+                self._not_empty.wait()
+        finally:
+            self._getters -= 1
+        queues = [queue for queue in self._queues if queue]
+        queue = queues[0]
+        if queue[0][1][0].EVENT_BARRIER:
+            # deliver the events queued before the barrier first
+            queue = min(queues, key=lambda queue: queue[0][0])
+        _seq, item = queue.popleft()
+        self._len -= 1
+        if self._putters and self._len < self.maxsize:
+            self._not_full.set()
+        return item
+
+
 class RyuApp(object):
     """
     Base class for Ryu network application
     """
     _CONTEXTS = {}
     _EVENTS = []  # list of events to be generated in app
+    # True if the application needs to see every datapath, e.g. to
+    # discover the links between them, so that it can't run with
+    # ofp-workers, each of which sees only its own share of datapaths.
+    _ALL_DATAPATHS = False
 
     @classmethod
     def context_iteritems(cls):
@@ -65,8 +190,11 @@ class RyuApp(object):
         self.name = self.__class__.__name__
         self.event_handlers = {}        # ev_cls -> handlers:list
         self.observers = {}     # ev_cls -> observer-name -> states:set
+        # (ev_cls, state) -> (observer-names:tuple, handlers:tuple)
+        self._dispatch_table = {}
         self.threads = []
-        self.events = hub.Queue(128)
+        self.events = EventQueue(CONF.app_event_queue_size,
+                                 CONF.app_event_queue_overload)
         self.replies = hub.Queue()
         self.logger = logging.getLogger(self.name)
 
@@ -91,35 +219,60 @@ class RyuApp(object):
         assert callable(handler)
         self.event_handlers.setdefault(ev_cls, [])
         self.event_handlers[ev_cls].append(handler)
+        self._dispatch_table.clear()
 
     def register_observer(self, ev_cls, name, states=None):
         states = states or set()
         ev_cls_observers = self.observers.setdefault(ev_cls, {})
         ev_cls_observers.setdefault(name, set()).update(states)
+        self._dispatch_table.clear()
 
     def unregister_observer(self, ev_cls, name):
         observers = self.observers.get(ev_cls, {})
         observers.pop(name)
+        self._dispatch_table.clear()
 
     def unregister_observer_all_event(self, name):
         for observers in self.observers.values():
             observers.pop(name, None)
+        self._dispatch_table.clear()
 
-    def get_handlers(self, ev, state=None):
-        handlers = self.event_handlers.get(ev.__class__, [])
-        if state is None:
-            return handlers
+    def get_dispatch(self, ev_cls, state=None):
+        """
+        Return a tuple of (observer names, handlers) which an event of
+        ev_cls in the given state is delivered to.
+        The result is cached until a handler or an observer changes.
+        """
+        key = (ev_cls, state)
+        try:
+            return self._dispatch_table[key]
+        except KeyError:
+            pass
+
+        handlers = self.event_handlers.get(ev_cls, [])
+        if state is not None:
+            handlers = [handler for handler in handlers
+                        if not handler.dispatchers or
+                        state in handler.dispatchers]
+        observers = [k for k, v in self.observers.get(ev_cls, {}).iteritems()
+                     if not state or not v or state in v]
+        dispatch = (tuple(observers), tuple(handlers))
+        self._dispatch_table[key] = dispatch
+        return dispatch
+
+    def wants_event(self, ev_cls, state=None):
+        """
+        Return True if ev_cls in the given state has a handler in this
+        application or an observer.
+        """
+        observers, handlers = self.get_dispatch(ev_cls, state)
+        return bool(observers or handlers)
 
-        return [handler for handler in handlers
-                if not handler.dispatchers or state in handler.dispatchers]
+    def get_handlers(self, ev, state=None):
+        return list(self.get_dispatch(ev.__class__, state)[1])
 
     def get_observers(self, ev, state):
-        observers = []
-        for k, v in self.observers.get(ev.__class__, {}).iteritems():
-            if not state or not v or state in v:
-                observers.append(k)
-
-        return observers
+        return list(self.get_dispatch(ev.__class__, state)[0])
 
     def send_reply(self, rep):
         assert isinstance(rep, EventReplyBase)
@@ -137,9 +290,13 @@ class RyuApp(object):
             ev, state = self.events.get()
             if ev == self._event_stop:
                 continue
-            handlers = self.get_handlers(ev, state)
-            for handler in handlers:
-                handler(ev)
+            for handler in self.get_dispatch(ev.__class__, state)[1]:
+                try:
+                    handler(ev)
+                except exception.OFPMalformedMessage:
+                    # a lazily decoded attribute of an OpenFlow message
+                    # was malformed, which the parser has logged
+                    pass
 
     def _send_event(self, ev, state):
         self.events.put((ev, state))
@@ -148,15 +305,15 @@ class RyuApp(object):
         if name in SERVICE_BRICKS:
             if isinstance(ev, EventRequestBase):
                 ev.src = self.name
-            LOG.debug("EVENT %s->%s %s" %
-                      (self.name, name, ev.__class__.__name__))
+            LOG.debug("EVENT %s->%s %s",
+                      self.name, name, ev.__class__.__name__)
             SERVICE_BRICKS[name]._send_event(ev, state)
         else:
-            LOG.debug("EVENT LOST %s->%s %s" %
-                      (self.name, name, ev.__class__.__name__))
+            LOG.debug("EVENT LOST %s->%s %s",
+                      self.name, name, ev.__class__.__name__)
 
     def send_event_to_observers(self, ev, state=None):
-        for observer in self.get_observers(ev, state):
+        for observer in self.get_dispatch(ev.__class__, state)[0]:
             self.send_event(observer, ev, state)
 
     def reply_to_request(self, req, rep):
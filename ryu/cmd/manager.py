@@ -18,6 +18,7 @@
 
 import logging
 import os
+import subprocess
 import sys
 
 from oslo.config import cfg
@@ -33,6 +34,7 @@ from ryu import log
 from ryu import version
 from ryu.app import wsgi
 from ryu.base.app_manager import AppManager
+from ryu.controller import controller
 #from ryu import flags
 #from ryu.controller import controller
 #from ryu.topology import switches
@@ -61,6 +63,7 @@ CONF.register_cli_opts([
 
 CONF.import_opt('zk_servers', 'ryu.app.inception_conf')
 CONF.import_opt('zk_election', 'ryu.app.inception_conf')
+CONF.import_opt('ofp_workers', 'ryu.controller.controller')
 
 
 def main():
@@ -80,6 +83,11 @@ def main():
     log.init_log()
     LOGGER.info('config_file=%s', config_file)
 
+    if controller.ofp_worker_index() is not None:
+        # the parent process already won the leader election.
+        real_main()
+        return
+
     LOGGER.info('ZooKeeper servers=%s', CONF.zk_servers)
     zk = KazooClient(hosts=CONF.zk_servers, logger=LOGGER)
     zk.start()
@@ -87,9 +95,54 @@ def main():
     LOGGER.info('Contending to be the leader...')
     election.run(real_main)
 
-def real_main():
-    LOGGER.info('I win leader election, Ryu controller start running')
 
+def run_workers():
+    """
+    Run the applications in CONF.ofp_workers child processes.
+
+    Every worker binds the openflow listen ports with SO_REUSEPORT, so
+    the kernel spreads switch connections over the workers and each
+    worker handles its share of datapaths in its own hub.
+
+    Events are not relayed between workers; an application only sees
+    the datapaths connected to its own worker.  So the applications
+    which need every datapath are refused by _check_workers().
+    """
+    LOGGER.info('starting %d openflow worker processes', CONF.ofp_workers)
+    argv = [sys.executable] + sys.argv
+    workers = []
+    for i in range(CONF.ofp_workers):
+        env = dict(os.environ)
+        env[controller.OFP_WORKER_INDEX_ENV] = str(i)
+        workers.append(subprocess.Popen(argv, env=env))
+
+    try:
+        # poll rather than wait() so that the ZooKeeper session is kept
+        # alive by the hub.
+        while all(w.poll() is None for w in workers):
+            hub.sleep(1)
+    finally:
+        for w in workers:
+            if w.poll() is None:
+                w.terminate()
+        for w in workers:
+            w.wait()
+
+
+def _check_workers(app_mgr):
+    # each worker sees only its share of datapaths.  refuse to run the
+    # applications which need all of them, and the REST APIs, which would
+    # show a different part of the network on every worker.
+    names = [name for name, cls in app_mgr.applications_cls.items()
+             if cls._ALL_DATAPATHS or
+             wsgi.WSGIApplication in cls._CONTEXTS.values()]
+    if names:
+        LOGGER.error('applications which need every datapath can\'t run '
+                     'with --ofp-workers: %s', ', '.join(sorted(names)))
+        sys.exit(1)
+
+
+def real_main():
     app_lists = CONF.app_lists + CONF.app
     # keep old behaivor, run ofp if no application is specified.
     if not app_lists:
@@ -97,6 +150,17 @@ def real_main():
 
     app_mgr = AppManager.get_instance()
     app_mgr.load_apps(app_lists)
+
+    worker_index = controller.ofp_worker_index()
+    if worker_index is None:
+        LOGGER.info('I win leader election, Ryu controller start running')
+        if CONF.ofp_workers > 1:
+            _check_workers(app_mgr)
+            run_workers()
+            return
+    else:
+        LOGGER.info('openflow worker %d start running', worker_index)
+
     contexts = app_mgr.create_contexts()
     services = []
     services.extend(app_mgr.instantiate_apps(**contexts))
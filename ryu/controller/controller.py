@@ -17,14 +17,17 @@
 import contextlib
 from oslo.config import cfg
 import logging
+import os
 from ryu.lib import hub
 from ryu.lib.hub import StreamServer
 import traceback
 import random
 import ssl
+import struct
 
 import ryu.base.app_manager
 
+from ryu import exception
 from ryu.ofproto import ofproto_common
 from ryu.ofproto import ofproto_parser
 from ryu.ofproto import ofproto_v1_0
@@ -51,9 +54,37 @@ CONF.register_cli_opts([
                help='openflow ssl listen port'),
     cfg.StrOpt('ctl-privkey', default=None, help='controller private key'),
     cfg.StrOpt('ctl-cert', default=None, help='controller certificate'),
-    cfg.StrOpt('ca-certs', default=None, help='CA certificates')
+    cfg.StrOpt('ca-certs', default=None, help='CA certificates'),
+    cfg.IntOpt('ofp-send-queue-high', default=128,
+               help='number of queued messages per datapath at which '
+                    'senders block'),
+    cfg.IntOpt('ofp-send-queue-low', default=32,
+               help='number of queued messages per datapath below which '
+                    'blocked senders resume'),
+    cfg.IntOpt('ofp-workers', default=0,
+               help='number of worker processes sharing the openflow '
+                    'listen ports, 0 or 1 runs a single process')
 ])
 
+# the environment variable which ryu-manager sets to the index of each
+# worker process it starts for --ofp-workers
+OFP_WORKER_INDEX_ENV = 'RYU_OFP_WORKER_INDEX'
+
+# The size of a single recv() on a datapath socket.  A large chunk lets a
+# burst of messages be framed from one read instead of one header at a time.
+RECV_BUFSIZE = 64 * 1024
+
+
+def ofp_worker_index():
+    """
+    Return the index of this process among the workers started for
+    --ofp-workers, or None if it isn't one of them.
+    """
+    index = os.environ.get(OFP_WORKER_INDEX_ENV)
+    if index is None:
+        return None
+    return int(index)
+
 
 class OpenFlowController(object):
     def __init__(self):
@@ -65,6 +96,9 @@ class OpenFlowController(object):
         self.server_loop()
 
     def server_loop(self):
+        # each worker process binds the listen ports on its own and
+        # the kernel distributes the switch connections among them.
+        reuse_port = ofp_worker_index() is not None
         if CONF.ctl_privkey is not None and CONF.ctl_cert is not None:
             if CONF.ca_certs is not None:
                 server = StreamServer((CONF.ofp_listen_host,
@@ -74,23 +108,383 @@ class OpenFlowController(object):
                                       certfile=CONF.ctl_cert,
                                       cert_reqs=ssl.CERT_REQUIRED,
                                       ca_certs=CONF.ca_certs,
-                                      ssl_version=ssl.PROTOCOL_TLSv1)
+                                      ssl_version=ssl.PROTOCOL_TLSv1,
+                                      reuse_port=reuse_port)
             else:
                 server = StreamServer((CONF.ofp_listen_host,
                                        CONF.ofp_ssl_listen_port),
                                       datapath_connection_factory,
                                       keyfile=CONF.ctl_privkey,
                                       certfile=CONF.ctl_cert,
-                                      ssl_version=ssl.PROTOCOL_TLSv1)
+                                      ssl_version=ssl.PROTOCOL_TLSv1,
+                                      reuse_port=reuse_port)
         else:
             server = StreamServer((CONF.ofp_listen_host,
                                    CONF.ofp_tcp_listen_port),
-                                  datapath_connection_factory)
+                                  datapath_connection_factory,
+                                  reuse_port=reuse_port)
 
         #LOG.debug('loop')
         server.serve_forever()
 
 
+# version -> (request type, reply type, "more replies follow" flag)
+# of statistics/multipart messages
+_MULTIPART_TYPES = {
+    ofproto_v1_0.OFP_VERSION: (ofproto_v1_0.OFPT_STATS_REQUEST,
+                               ofproto_v1_0.OFPT_STATS_REPLY,
+                               ofproto_v1_0.OFPSF_REPLY_MORE),
+    ofproto_v1_2.OFP_VERSION: (ofproto_v1_2.OFPT_STATS_REQUEST,
+                               ofproto_v1_2.OFPT_STATS_REPLY,
+                               ofproto_v1_2.OFPSF_REPLY_MORE),
+    ofproto_v1_3.OFP_VERSION: (ofproto_v1_3.OFPT_MULTIPART_REQUEST,
+                               ofproto_v1_3.OFPT_MULTIPART_REPLY,
+                               ofproto_v1_3.OFPMPF_REPLY_MORE),
+}
+
+# messages which a switch sends on its own initiative, never as a reply.
+# the message types are the same in every version.
+_ASYNC_MSG_TYPES = frozenset([ofproto_v1_0.OFPT_HELLO,
+                              ofproto_v1_0.OFPT_ECHO_REQUEST,
+                              ofproto_v1_0.OFPT_PACKET_IN,
+                              ofproto_v1_0.OFPT_FLOW_REMOVED,
+                              ofproto_v1_0.OFPT_PORT_STATUS])
+
+# the maximum number of buffers passed to a single sendmsg().
+_IOV_MAX = 1024
+
+# xid in the header of a serialized message, the same in every version.
+_XID_STRUCT = struct.Struct('!I')
+_XID_OFFSET = 4
+
+
+class RequestFuture(object):
+    """
+    The pending reply to a request sent by Datapath.send_request().
+
+    The reply is delivered by the receive loop of the datapath, so it
+    is not dispatched as an event to applications.  For a statistics
+    (multipart) request, every reply message is collected until the one
+    without the "more" flag arrives.
+
+    A request sent with stream=True doesn't collect replies.  They are
+    consumed one by one, as they arrive, with iter_replies() or
+    iter_body() instead, so a huge statistics dump is not held in memory
+    as a whole by a reader which keeps up.  Replies which a slow reader
+    hasn't consumed yet are buffered, as the receive loop of the
+    datapath must never wait for the reader: meanwhile nothing else,
+    e.g. echo replies, would be read from the switch.
+    """
+
+    def __init__(self, datapath, msg, stream=False):
+        super(RequestFuture, self).__init__()
+        self.datapath = datapath
+        self.msg = msg
+        self.xid = msg.xid
+        self.replies = []
+        (request_type, self._reply_type,
+         self._reply_more) = _MULTIPART_TYPES[datapath.ofproto.OFP_VERSION]
+        self.multipart = msg.cls_msg_type == request_type
+        self._done = False
+        self._exception = None
+        self._callbacks = []
+        self._event = hub.Event()
+        self._stream = hub.Queue() if stream else None
+
+    def done(self):
+        return self._done
+
+    def cancel(self):
+        """
+        Stop waiting for the reply.  Return False if it has already
+        arrived.
+        """
+        if self._done:
+            return False
+        self._finish(exception.OFPRequestCancelled(xid=self.xid))
+        return True
+
+    def add_done_callback(self, callback):
+        """
+        Arrange callback(future) to be called when the request completes.
+        It runs in the receive loop of the datapath, so it must not block.
+        """
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def exception(self, timeout=None):
+        self._wait(timeout)
+        return self._exception
+
+    def result(self, timeout=None):
+        """
+        Wait for the reply and return it.  For a statistics request, the
+        list of all reply messages is returned.
+
+        Raises OFPRequestError when the switch answers with an error
+        message, which is kept in its kwargs['error_msg'].
+        Raises OFPRequestTimeout and cancels the request when no reply
+        arrives within timeout seconds.
+        Raises OFPRequestCancelled or OFPDatapathDisconnected otherwise.
+        """
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        if self.multipart:
+            return self.replies
+        return self.replies[0]
+
+    def iter_replies(self, timeout=None):
+        """
+        Yield reply messages of a request sent with stream=True as they
+        arrive.  timeout limits the wait for each of them.  The same
+        exceptions as result() are raised.
+        """
+        assert self._stream is not None
+        while True:
+            try:
+                msg = self._stream.get(timeout=timeout)
+            except hub.QueueEmpty:
+                self._finish(exception.OFPRequestTimeout(xid=self.xid))
+                raise self._exception
+            if msg is None:
+                break
+            yield msg
+        if self._exception is not None:
+            raise self._exception
+
+    def iter_body(self, timeout=None):
+        """
+        Yield the body entries of replies of a request sent with
+        stream=True as they arrive.
+        """
+        for msg in self.iter_replies(timeout):
+            body = msg.body
+            if isinstance(body, list):
+                for entry in body:
+                    yield entry
+            else:
+                yield body
+
+    def _wait(self, timeout):
+        if self._done:
+            return
+        self._event.wait(timeout)
+        if not self._done:
+            self._finish(exception.OFPRequestTimeout(xid=self.xid))
+
+    def _reply(self, msg):
+        # called by the receive loop of the datapath
+        if msg.msg_type == self.datapath.ofproto.OFPT_ERROR:
+            self._finish(exception.OFPRequestError(
+                xid=self.xid, type=msg.type, code=msg.code, error_msg=msg))
+            return
+        if self._stream is not None:
+            self._stream.put(msg)
+        else:
+            self.replies.append(msg)
+        if (self.multipart and msg.msg_type == self._reply_type and
+                msg.flags & self._reply_more):
+            return
+        self._finish(None)
+
+    def _finish(self, exception_):
+        if self._done:
+            return
+        if self.datapath.requests.get(self.xid) is self:
+            del self.datapath.requests[self.xid]
+        self._done = True
+        self._exception = exception_
+        self._event.set()
+        if self._stream is not None:
+            if exception_ is not None:
+                # the reader gets the error instead of the replies left
+                try:
+                    while True:
+                        self._stream.get(block=False)
+                except hub.QueueEmpty:
+                    pass
+            self._stream.put(None)
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class BatchFuture(RequestFuture):
+    """
+    The pending completion of a MessageBatch, i.e. the reply to its
+    barrier request.
+
+    result() returns a dict of xid -> OFPErrorMsg of the messages in the
+    batch which the switch rejected.  It is empty if all of them were
+    applied.  msgs maps the xids back to the messages.
+    """
+
+    def __init__(self, datapath, barrier, msgs):
+        super(BatchFuture, self).__init__(datapath, barrier)
+        self.msgs = dict((msg.xid, msg) for msg in msgs)
+        self.errors = {}
+
+    def result(self, timeout=None):
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self.errors
+
+    def _reply(self, msg):
+        if msg.xid != self.xid:
+            # the switch replies to a message in the batch only on error
+            if msg.msg_type == self.datapath.ofproto.OFPT_ERROR:
+                self.errors[msg.xid] = msg
+                for hook in Datapath.batch_error_hooks:
+                    hook(msg)
+            return
+        super(BatchFuture, self)._reply(msg)
+
+    def _finish(self, exception_):
+        requests = self.datapath.requests
+        for xid in self.msgs:
+            if requests.get(xid) is self:
+                del requests[xid]
+        super(BatchFuture, self)._finish(exception_)
+
+
+class MessageBatch(object):
+    """
+    Messages, typically flow-mods and group-mods, which are serialized
+    back to back into one buffer and sent to a datapath in one go,
+    followed by a barrier request.  Created by Datapath.batch().
+
+    commit() returns a BatchFuture which completes when the switch has
+    processed the whole batch.  Used as a context manager, the batch is
+    committed on exit and the future is kept in the future attribute.
+    """
+
+    def __init__(self, datapath):
+        super(MessageBatch, self).__init__()
+        self.datapath = datapath
+        self.msgs = []
+        self.buf = bytearray()
+        self.future = None
+
+    def __len__(self):
+        return len(self.msgs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, _exc_value, _traceback):
+        if exc_type is None:
+            self.commit()
+
+    def add(self, msg):
+        """
+        Add a message to the batch and return its xid.
+        """
+        assert self.future is None
+        if msg.xid is None:
+            self.datapath.set_xid(msg)
+        msg.serialize()
+        self.buf += msg.buf
+        self.msgs.append(msg)
+        return msg.xid
+
+    def commit(self):
+        assert self.future is None
+        datapath = self.datapath
+        barrier = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+        datapath.set_xid(barrier)
+        barrier.serialize()
+        self.buf += barrier.buf
+
+        future = BatchFuture(datapath, barrier, self.msgs)
+        self.future = future
+        if not datapath.is_active:
+            future._finish(exception.OFPDatapathDisconnected(xid=barrier.xid))
+            return future
+        datapath.requests[barrier.xid] = future
+        for msg in self.msgs:
+            datapath.requests[msg.xid] = future
+        datapath.send(self.buf)
+        # only now, as an abandoned batch is never sent.  the send loop
+        # can't send the buffer before the hooks have run, as nothing
+        # yields in between, so they still precede any reply.
+        for msg in self.msgs:
+            for hook in Datapath.send_msg_hooks:
+                hook(msg)
+        return future
+
+
+class PacketOutTemplate(object):
+    """
+    A packet-out message which is serialized once and sent repeatedly,
+    e.g. for periodic control packets like LLDP or BPDUs.  Created by
+    Datapath.packet_out_template().
+
+    The message outputs the packet to out_port.  send() patches only
+    the xid of the serialized message, and its packet data when it
+    differs from the previous one, instead of building the message again.
+    """
+
+    def __init__(self, datapath, out_port, in_port=None):
+        super(PacketOutTemplate, self).__init__()
+        self.datapath = datapath
+        self.out_port = out_port
+        if in_port is None:
+            in_port = datapath.ofproto.OFPP_CONTROLLER
+        self.in_port = in_port
+        self.msg = None
+        self._data_offset = None
+
+    def _serialize(self, data):
+        datapath = self.datapath
+        ofproto = datapath.ofproto
+        ofproto_parser = datapath.ofproto_parser
+        actions = [ofproto_parser.OFPActionOutput(self.out_port, 0)]
+        msg = ofproto_parser.OFPPacketOut(
+            datapath, ofproto.OFP_NO_BUFFER, self.in_port, actions, data)
+        msg.serialize()
+        self.msg = msg
+        self._data_offset = len(msg.buf) - len(data)
+
+    def build(self, data):
+        """
+        Return the serialized message for the packet *data* with a new
+        xid, without sending it.  This is for callers which send many
+        messages to the datapath in one buffer.
+        """
+        return self._build(data)[1]
+
+    def _build(self, data):
+        # a copy, which the caller can't modify in place and send again
+        # without changing msg.data too
+        data = str(data)
+        msg = self.msg
+        if msg is None or len(msg.data) != len(data):
+            self._serialize(data)
+            msg = self.msg
+        elif msg.data != data:
+            msg.buf[self._data_offset:] = data
+            msg.data = data
+        xid = msg.xid = self.datapath.next_xid()
+        _XID_STRUCT.pack_into(msg.buf, _XID_OFFSET, xid)
+        for hook in Datapath.send_msg_hooks:
+            hook(msg)
+        # a copy, which later builds don't patch
+        return xid, bytearray(msg.buf)
+
+    def send(self, data):
+        """
+        Send the packet *data* and return the xid of the message.
+        """
+        # the send can wait, meanwhile another build changes self.msg
+        xid, buf = self._build(data)
+        self.datapath.send(buf)
+        return xid
+
+
 def _deactivate(method):
     def deactivate(self):
         try:
@@ -101,6 +495,14 @@ def _deactivate(method):
 
 
 class Datapath(object):
+    # callables which are called with every serialized message sent by
+    # send_msg() or MessageBatch, e.g. to keep track of flow-mods.
+    send_msg_hooks = []
+    # callables which are called with every error message replied to a
+    # message of a MessageBatch, which isn't sent as EventOFPErrorMsg.
+    # they run in the receive loop of the datapath, so must not block.
+    batch_error_hooks = []
+
     supported_ofp_version = {
         ofproto_v1_0.OFP_VERSION: (ofproto_v1_0,
                                    ofproto_v1_0_parser),
@@ -116,10 +518,29 @@ class Datapath(object):
         self.socket = socket
         self.address = address
         self.is_active = True
-
-        # The limit is arbitrary. We need to limit queue size to
-        # prevent it from eating memory up
-        self.send_q = hub.Queue(16)
+        # a vectored write, which python 2 sockets don't have
+        self._sendmsg = getattr(socket, 'sendmsg', None)
+
+        # We need to limit queue size to prevent it from eating memory up.
+        # Senders block at the high watermark and are resumed only after
+        # the send loop has drained the queue down to the low watermark.
+        self.send_q = hub.Queue()
+        self.send_q_high = CONF.ofp_send_queue_high
+        self.send_q_low = min(CONF.ofp_send_queue_low, self.send_q_high)
+        self._send_q_writable = hub.Event()
+        self.send_stats = {
+            'bytes_queued': 0,   # bytes waiting in send_q
+            'bytes_sent': 0,
+            'msgs_sent': 0,
+            'stalls': 0,         # times a sender blocked on a full send_q
+            'wakeups': 0,        # writes issued by the send loop
+            'last_drained': 0,   # messages coalesced by the latest write
+            'max_drained': 0,
+        }
+
+        self.requests = {}      # xid -> RequestFuture
+        # (out_port, in_port) -> PacketOutTemplate
+        self.packet_out_templates = {}
 
         self.set_version(max(self.supported_ofp_version))
         self.xid = random.randint(0, self.ofproto.MAX_XID)
@@ -141,41 +562,90 @@ class Datapath(object):
     def set_version(self, version):
         assert version in self.supported_ofp_version
         self.ofproto, self.ofproto_parser = self.supported_ofp_version[version]
+        self.packet_out_templates.clear()
+
+    def _is_msg_wanted(self, version, msg_type):
+        # don't bother to parse a message nobody is going to see.
+        msg_cls = ofproto_parser.msg_cls(version, msg_type)
+        if msg_cls is None:
+            # let the parser complain about it
+            return True
+        for ev_cls in ofp_event.ofp_msg_cls_to_ev_clses(msg_cls):
+            if self.ofp_brick.wants_event(ev_cls, self.state):
+                return True
+        return False
 
     # Low level socket handling layer
     @_deactivate
     def _recv_loop(self):
-        buf = bytearray()
-        required_len = ofproto_common.OFP_HEADER_SIZE
+        # A chunk returned by recv() is never modified afterwards, so a
+        # message which takes up most of a chunk is handed to the parser
+        # as a read-only buffer() view of that chunk.  A view keeps the
+        # whole chunk alive as long as the message, or anything sliced
+        # from it like packet-in data, is queued or kept by an
+        # application, so a smaller message is copied out instead.  A
+        # message straddling chunk boundaries is assembled in a bytearray,
+        # which is likewise left untouched once messages are parsed out
+        # of it.
+        partial = None
 
         count = 0
         while self.is_active:
-            ret = self.socket.recv(required_len)
+            ret = self.socket.recv(RECV_BUFSIZE)
             if len(ret) == 0:
                 self.is_active = False
                 break
-            buf += ret
-            while len(buf) >= required_len:
-                (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
-                required_len = msg_len
-                if len(buf) < required_len:
+            if partial is None:
+                buf = ret
+            else:
+                partial += ret
+                buf = partial
+            buf_len = len(buf)
+            offset = 0
+            while buf_len - offset >= ofproto_common.OFP_HEADER_SIZE:
+                (version, msg_type, msg_len, xid) = ofproto_parser.header(
+                    buf, offset)
+                if msg_len < ofproto_common.OFP_HEADER_SIZE:
+                    LOG.error('invalid message length %d from %s',
+                              msg_len, self.address)
+                    self.is_active = False
+                    break
+                if buf_len - offset < msg_len:
                     break
 
-                msg = ofproto_parser.msg(self,
-                                         version, msg_type, msg_len, xid, buf)
+                request = None
+                if self.requests and msg_type not in _ASYNC_MSG_TYPES:
+                    request = self.requests.get(xid)
+                if request is not None or self._is_msg_wanted(version,
+                                                              msg_type):
+                    if msg_len * 2 < buf_len:
+                        data = buf[offset:offset + msg_len]
+                    else:
+                        data = buffer(buf, offset, msg_len)
+                    msg = ofproto_parser.msg(self, version, msg_type,
+                                             msg_len, xid, data)
+                else:
+                    msg = None
                 #LOG.debug('queue msg %s cls %s', msg, msg.__class__)
-                if msg:
-                    ev = ofp_event.ofp_msg_to_ev(msg)
-                    self.ofp_brick.send_event_to_observers(ev, self.state)
-
-                    handlers = [handler for handler in
-                                self.ofp_brick.get_handlers(ev) if
-                                self.state in handler.dispatchers]
+                if msg and request is not None:
+                    request._reply(msg)
+                elif msg:
+                    ev_cls = ofp_event.ofp_msg_cls_to_ev_cls(msg.__class__)
+                    ev = ev_cls(msg)
+                    observers, handlers = self.ofp_brick.get_dispatch(
+                        ev_cls, self.state)
+                    for observer in observers:
+                        self.ofp_brick.send_event(observer, ev, self.state)
                     for handler in handlers:
-                        handler(ev)
+                        try:
+                            handler(ev)
+                        except exception.OFPMalformedMessage:
+                            # a lazily decoded attribute was malformed,
+                            # which the parser has logged.  drop the
+                            # event like a message which fails to parse.
+                            pass
 
-                buf = buf[required_len:]
-                required_len = ofproto_common.OFP_HEADER_SIZE
+                offset += msg_len
 
                 # We need to schedule other greenlets. Otherwise, ryu
                 # can't accept new switches or handle the existing
@@ -186,41 +656,131 @@ class Datapath(object):
                     count = 0
                     hub.sleep(0)
 
+            if offset < buf_len:
+                partial = bytearray(buffer(buf, offset))
+            else:
+                partial = None
+
     @_deactivate
     def _send_loop(self):
+        stats = self.send_stats
         try:
             while self.is_active:
-                buf = self.send_q.get()
-                self.socket.sendall(buf)
+                bufs = [self.send_q.get()]
+                # coalesce everything queued so far into a single write
+                try:
+                    while True:
+                        bufs.append(self.send_q.get(block=False))
+                except hub.QueueEmpty:
+                    pass
+
+                size = sum(len(buf) for buf in bufs)
+                stats['bytes_queued'] -= size
+                if len(bufs) == 1:
+                    self.socket.sendall(bufs[0])
+                elif self._sendmsg is not None:
+                    self._sendmsg_all(bufs)
+                else:
+                    self.socket.sendall(bytearray().join(bufs))
+                if self.send_q.qsize() <= self.send_q_low:
+                    self._send_q_writable.set()
+                stats['bytes_sent'] += size
+                stats['msgs_sent'] += len(bufs)
+                stats['wakeups'] += 1
+                stats['last_drained'] = len(bufs)
+                stats['max_drained'] = max(stats['max_drained'], len(bufs))
         finally:
             q = self.send_q
             # first, clear self.send_q to prevent new references.
             self.send_q = None
-            # there might be threads currently blocking in send_q.put().
-            # unblock them by draining the queue.
+            # there might be threads currently blocking in send().
+            # unblock them and drop what is still queued.
+            self._send_q_writable.set()
             try:
                 while q.get(block=False):
                     pass
             except hub.QueueEmpty:
                 pass
 
-    def send(self, buf):
-        if self.send_q:
-            self.send_q.put(buf)
-
-    def set_xid(self, msg):
+    def _sendmsg_all(self, bufs):
+        # write bufs with as few vectored writes as possible, without
+        # copying them into one buffer first.
+        sendmsg = self._sendmsg
+        while bufs:
+            sent = sendmsg(bufs[:_IOV_MAX])
+            while sent:
+                buf = bufs[0]
+                if sent < len(buf):
+                    bufs[0] = buffer(buf, sent)
+                    break
+                sent -= len(buf)
+                del bufs[0]
+
+    def send(self, buf, block=True):
+        """
+        Queue buf to be sent to the datapath.  Return False if it's
+        dropped because the datapath is disconnected, or because the
+        send queue is full and block is False.
+        """
+        while self.send_q and self.send_q.qsize() >= self.send_q_high:
+            if not block:
+                return False
+            self.send_stats['stalls'] += 1
+            self._send_q_writable.clear()
+            self._send_q_writable.wait()
+        if not self.send_q:
+            return False
+        self.send_stats['bytes_queued'] += len(buf)
+        self.send_q.put(buf)
+        return True
+
+    def next_xid(self):
         self.xid += 1
         self.xid &= self.ofproto.MAX_XID
-        msg.set_xid(self.xid)
         return self.xid
 
-    def send_msg(self, msg):
+    def set_xid(self, msg):
+        xid = self.next_xid()
+        msg.set_xid(xid)
+        return xid
+
+    def send_msg(self, msg, block=True):
         assert isinstance(msg, self.ofproto_parser.MsgBase)
         if msg.xid is None:
             self.set_xid(msg)
         msg.serialize()
+        for hook in self.send_msg_hooks:
+            hook(msg)
         # LOG.debug('send_msg %s', msg)
-        self.send(msg.buf)
+        return self.send(msg.buf, block)
+
+    def batch(self):
+        """
+        Return a new MessageBatch to send messages in one go.
+
+            with datapath.batch() as batch:
+                for flow_mod in flow_mods:
+                    batch.add(flow_mod)
+            errors = batch.future.result(timeout=5)
+        """
+        return MessageBatch(self)
+
+    def send_request(self, msg, stream=False):
+        """
+        Send a request message and return a RequestFuture for its reply.
+
+        Any number of requests can be outstanding at a time.  Replies
+        are matched to requests by xid.  See RequestFuture about stream.
+        """
+        if msg.xid is None:
+            self.set_xid(msg)
+        future = RequestFuture(self, msg, stream)
+        if not self.is_active:
+            future._finish(exception.OFPDatapathDisconnected(xid=msg.xid))
+            return future
+        self.requests[msg.xid] = future
+        self.send_msg(msg)
+        return future
 
     def serve(self):
         send_thr = hub.spawn(self._send_loop)
@@ -234,6 +794,10 @@ class Datapath(object):
         finally:
             hub.kill(send_thr)
             hub.joinall([send_thr])
+            for request in self.requests.values():
+                # _finish() ignores a request which is already done
+                request._finish(
+                    exception.OFPDatapathDisconnected(xid=request.xid))
 
     #
     # Utility methods for convenience
@@ -246,6 +810,21 @@ class Datapath(object):
             self, buffer_id, in_port, actions, data)
         self.send_msg(packet_out)
 
+    def packet_out_template(self, out_port, in_port=None):
+        """
+        Return the PacketOutTemplate which outputs packets to *out_port*.
+        Templates are cached per (out_port, in_port).  *in_port* defaults
+        to OFPP_CONTROLLER.
+
+            datapath.packet_out_template(port_no).send(data)
+        """
+        key = (out_port, in_port)
+        template = self.packet_out_templates.get(key)
+        if template is None:
+            template = PacketOutTemplate(self, out_port, in_port)
+            self.packet_out_templates[key] = template
+        return template
+
     def send_flow_mod(self, rule, cookie, command, idle_timeout, hard_timeout,
                       priority=None, buffer_id=0xffffffff,
                       out_port=None, flags=0, actions=None):
@@ -15,9 +15,20 @@
 # limitations under the License.
 
 
+# priority classes of events in the queue of the receiving application.
+# a lower value is delivered first.
+EVENT_PRIORITY_HIGH = 0
+EVENT_PRIORITY_NORMAL = 1
+EVENT_PRIORITY_LOW = 2     # may be dropped when the application is overloaded
+EVENT_PRIORITIES = (EVENT_PRIORITY_HIGH, EVENT_PRIORITY_NORMAL,
+                    EVENT_PRIORITY_LOW)
+
+
 class EventBase(object):
-    # Nothing yet
-    pass
+    EVENT_PRIORITY = EVENT_PRIORITY_NORMAL
+    # if True, every event queued before this one is delivered first,
+    # whatever its priority.
+    EVENT_BARRIER = False
 
 
 class EventRequestBase(EventBase):
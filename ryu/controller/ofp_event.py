@@ -15,6 +15,7 @@
 # limitations under the License.
 
 import inspect
+import itertools
 
 from ryu.controller import handler
 from ryu import ofproto
@@ -39,9 +40,46 @@ def _ofp_msg_name_to_ev_name(msg_name):
     return 'Event' + msg_name
 
 
+_OFP_MSG_CLS_TO_EV_CLS = {}
+
+
+def ofp_msg_cls_to_ev_cls(msg_cls):
+    ev_cls = _OFP_MSG_CLS_TO_EV_CLS.get(msg_cls)
+    if ev_cls is None:
+        name = _ofp_msg_name_to_ev_name(msg_cls.__name__)
+        ev_cls = _OFP_MSG_EVENTS[name]
+        _OFP_MSG_CLS_TO_EV_CLS[msg_cls] = ev_cls
+    return ev_cls
+
+
 def ofp_msg_to_ev(msg):
-    name = _ofp_msg_name_to_ev_name(msg.__class__.__name__)
-    return _OFP_MSG_EVENTS[name](msg)
+    return ofp_msg_cls_to_ev_cls(msg.__class__)(msg)
+
+
+_OFP_MSG_CLS_EVENTS = {}
+
+
+def _all_subclasses(cls):
+    for sub_cls in cls.__subclasses__():
+        yield sub_cls
+        for sub_sub_cls in _all_subclasses(sub_cls):
+            yield sub_sub_cls
+
+
+def ofp_msg_cls_to_ev_clses(msg_cls):
+    """
+    Return the event classes which a message parsed as msg_cls can be
+    delivered as.  A parser may return an instance of a sub class of the
+    registered class, e.g. OFPFlowStatsReply for OFPMultipartReply.
+    """
+    ev_clses = _OFP_MSG_CLS_EVENTS.get(msg_cls)
+    if ev_clses is None:
+        names = set(_ofp_msg_name_to_ev_name(cls.__name__) for cls
+                    in itertools.chain([msg_cls], _all_subclasses(msg_cls)))
+        ev_clses = tuple(_OFP_MSG_EVENTS[name] for name in names
+                         if name in _OFP_MSG_EVENTS)
+        _OFP_MSG_CLS_EVENTS[msg_cls] = ev_clses
+    return ev_clses
 
 
 def _create_ofp_msg_ev_class(msg_cls):
@@ -51,9 +89,7 @@ def _create_ofp_msg_ev_class(msg_cls):
     if name in _OFP_MSG_EVENTS:
         return
 
-    cls = type(name, (EventOFPMsgBase,),
-               dict(__init__=lambda self, msg:
-                    super(self.__class__, self).__init__(msg)))
+    cls = type(name, (EventOFPMsgBase,), {})
     globals()[name] = cls
     _OFP_MSG_EVENTS[name] = cls
 
@@ -72,7 +108,19 @@ for ofp_mods in ofproto.get_ofp_modules().values():
     _create_ofp_msg_ev_from_module(ofp_parser)
 
 
+# keepalives must not wait behind a backlog of packet-ins, and packet-ins
+# are the first to go when an app falls behind.
+for _name in ('EventOFPEchoRequest', 'EventOFPEchoReply'):
+    _OFP_MSG_EVENTS[_name].EVENT_PRIORITY = event.EVENT_PRIORITY_HIGH
+_OFP_MSG_EVENTS['EventOFPPacketIn'].EVENT_PRIORITY = event.EVENT_PRIORITY_LOW
+
+
 class EventOFPStateChange(event.EventBase):
+    # handlers of the events of a datapath received before its state
+    # change, e.g. a port status before DEAD_DISPATCHER, rely on seeing
+    # them in the old state.
+    EVENT_BARRIER = True
+
     def __init__(self, dp):
         super(EventOFPStateChange, self).__init__()
         self.datapath = dp
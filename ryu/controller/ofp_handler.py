@@ -14,8 +14,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import itertools
 import logging
+import socket
+
+from oslo.config import cfg
 
 import ryu.base.app_manager
 
@@ -26,6 +30,22 @@ from ryu.controller.controller import OpenFlowController
 from ryu.controller.handler import set_ev_handler
 from ryu.controller.handler import HANDSHAKE_DISPATCHER, CONFIG_DISPATCHER,\
     MAIN_DISPATCHER
+from ryu.lib.dpid import dpid_to_str
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.FloatOpt('echo-request-interval', default=15.0,
+                 help='seconds between echo requests sent to each datapath, '
+                      '0 disables them'),
+    cfg.IntOpt('maximum-unreplied-echo-requests', default=3,
+               help='number of consecutive unreplied echo requests after '
+                    'which a datapath is disconnected, 0 never disconnects')
+])
+
+# upper bounds in seconds of the buckets of echo round trip time histograms.
+# the last bucket counts anything slower.
+ECHO_RTT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+                    0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
 
 
 # The state transition: HANDSHAKE -> CONFIG -> MAIN
@@ -40,17 +60,130 @@ from ryu.controller.handler import HANDSHAKE_DISPATCHER, CONFIG_DISPATCHER,\
 #
 # Note that at any state, when we receive Echo Request message, send
 # back Echo Reply message.
+#
+# Once a datapath has sent its features, it is probed with an Echo Request
+# every echo-request-interval seconds, by a timer of the shared timer wheel
+# of hub.  A datapath which leaves maximum-unreplied-echo-requests probes
+# in a row unanswered is disconnected.
+
+
+def _echo_rtt_histogram():
+    return [0] * (len(ECHO_RTT_BUCKETS) + 1)
+
+
+class _EchoState(object):
+    def __init__(self):
+        super(_EchoState, self).__init__()
+        self.timer = None       # hub.WheelTimer of the next echo request
+        self.xid = None         # xid of the outstanding echo request
+        self.sent = None        # time when it was sent
+        self.unreplied = 0
+        self.stats = {
+            'sent': 0,
+            'replied': 0,
+            'missed': 0,        # echo requests left unanswered
+            'last_rtt': None,
+            'min_rtt': None,
+            'max_rtt': None,
+            'rtt_histogram': _echo_rtt_histogram(),
+        }
+
+    def replied(self, rtt):
+        self.xid = None
+        self.unreplied = 0
+        stats = self.stats
+        stats['replied'] += 1
+        stats['last_rtt'] = rtt
+        if stats['min_rtt'] is None or rtt < stats['min_rtt']:
+            stats['min_rtt'] = rtt
+        if stats['max_rtt'] is None or rtt > stats['max_rtt']:
+            stats['max_rtt'] = rtt
+        stats['rtt_histogram'][bisect.bisect_left(ECHO_RTT_BUCKETS, rtt)] += 1
 
 
 class OFPHandler(ryu.base.app_manager.RyuApp):
     def __init__(self, *args, **kwargs):
         super(OFPHandler, self).__init__(*args, **kwargs)
         self.name = 'ofp_event'
+        self.echo_interval = CONF.echo_request_interval
+        self.echo_max_unreplied = CONF.maximum_unreplied_echo_requests
+        self.echo_rtt_histogram = _echo_rtt_histogram()    # all datapaths
+        self._echo_states = {}  # datapath -> _EchoState
 
     def start(self):
         super(OFPHandler, self).start()
         return hub.spawn(OpenFlowController())
 
+    def stop(self):
+        self.is_active = False
+        for state in self._echo_states.values():
+            state.timer.cancel()
+        self._echo_states.clear()
+        super(OFPHandler, self).stop()
+
+    def get_echo_stats(self, datapath):
+        """
+        Return the echo statistics of the datapath, or None if it isn't
+        probed.  RTTs are in seconds and rtt_histogram counts the replies
+        per bucket of ECHO_RTT_BUCKETS.
+        """
+        state = self._echo_states.get(datapath)
+        if state is None:
+            return None
+        return state.stats
+
+    def _echo_start(self, datapath):
+        if self.echo_interval <= 0 or datapath in self._echo_states:
+            return
+        state = _EchoState()
+        state.timer = hub.call_later(self.echo_interval, self._echo_timer,
+                                     datapath)
+        self._echo_states[datapath] = state
+
+    def _echo_timer(self, datapath):
+        if self._echo_probe(datapath, hub.monotonic()):
+            self._echo_states[datapath].timer.reschedule(self.echo_interval)
+
+    def _echo_probe(self, datapath, now):
+        # return True to keep probing the datapath
+        state = self._echo_states.get(datapath)
+        if state is None:
+            return False
+        if not datapath.is_active:
+            del self._echo_states[datapath]
+            return False
+
+        if state.xid is not None:
+            state.unreplied += 1
+            state.stats['missed'] += 1
+            if (self.echo_max_unreplied > 0 and
+                    state.unreplied >= self.echo_max_unreplied):
+                self._echo_timed_out(datapath, state)
+                return False
+
+        echo_request = datapath.ofproto_parser.OFPEchoRequest(datapath)
+        state.xid = datapath.set_xid(echo_request)
+        # this runs on the thread of the timer wheel, which must not wait
+        # for the send queue of a stuck datapath.  if it's full, the
+        # request is counted as unreplied by the next probe.
+        datapath.send_msg(echo_request, block=False)
+        state.sent = now
+        state.stats['sent'] += 1
+        return True
+
+    def _echo_timed_out(self, datapath, state):
+        del self._echo_states[datapath]
+        self.logger.warning('datapath %s from %s left %d echo requests '
+                            'unreplied, disconnecting',
+                            dpid_to_str(datapath.id), datapath.address,
+                            state.unreplied)
+        # wake up the receive loop of the datapath, which cleans it up.
+        datapath.is_active = False
+        try:
+            datapath.socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
     def _hello_failed(self, datapath, error_desc):
         self.logger.error(error_desc)
         error_msg = datapath.ofproto_parser.OFPErrorMsg(datapath)
@@ -190,6 +323,7 @@ class OFPHandler(ryu.base.app_manager.RyuApp):
         self.logger.debug('switch features ev %s', msg)
 
         datapath.id = msg.datapath_id
+        self._echo_start(datapath)
 
         # hacky workaround, will be removed. OF1.3 doesn't have
         # ports. An application should not depend on them. But there
@@ -238,6 +372,19 @@ class OFPHandler(ryu.base.app_manager.RyuApp):
         echo_reply.data = msg.data
         datapath.send_msg(echo_reply)
 
+    @set_ev_handler(ofp_event.EventOFPEchoReply,
+                    [HANDSHAKE_DISPATCHER, CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    def echo_reply_handler(self, ev):
+        msg = ev.msg
+        state = self._echo_states.get(msg.datapath)
+        if state is None or state.xid != msg.xid:
+            # not a reply to our probe
+            return
+        rtt = hub.monotonic() - state.sent
+        state.replied(rtt)
+        self.echo_rtt_histogram[
+            bisect.bisect_left(ECHO_RTT_BUCKETS, rtt)] += 1
+
     @set_ev_handler(ofp_event.EventOFPErrorMsg,
                     [HANDSHAKE_DISPATCHER, CONFIG_DISPATCHER, MAIN_DISPATCHER])
     def error_msg_handler(self, ev):
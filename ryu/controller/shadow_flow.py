@@ -0,0 +1,451 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shadow flow tables
+
+ShadowFlowTables keeps a copy of the flows which the controller installed
+on each datapath, by datapath id, so that it outlives a connection.
+It's fed by every flow-mod sent with Datapath.send_msg() or a
+MessageBatch, and by OFPFlowRemoved.  A flow-mod which the switch rejects
+is undone in the shadow.
+
+reconcile() dumps the flows of a datapath once and sends only the
+difference to its shadow.  It runs by itself when a datapath reconnects.
+Flows which aren't in the shadow, e.g. installed by another controller,
+are kept unless --shadow-flow-delete-unknown is given.
+After a controller restart, applications can stage() the flows they want,
+without sending them, and reconcile() afterwards, instead of reinstalling
+everything.
+
+Only OpenFlow 1.2 and 1.3 are supported.  Flow-mods with out_port or
+out_group filters are applied as if they had none.
+"""
+
+import collections
+import logging
+import struct
+
+from oslo.config import cfg
+
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.controller import handler
+from ryu.controller import ofp_event
+from ryu.controller.handler import set_ev_cls
+from ryu.lib import hub
+from ryu.lib.dpid import dpid_to_str
+from ryu.ofproto import ofproto_common
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_v1_2
+from ryu.ofproto import ofproto_v1_3
+from ryu import utils
+
+LOG = logging.getLogger('ryu.controller.shadow_flow')
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.BoolOpt('shadow-flow-delete-unknown', default=False,
+                help='delete the flows which are not in the shadow flow '
+                     'table when a datapath reconnects')
+])
+
+SUPPORTED_OFP_VERSIONS = (ofproto_v1_2.OFP_VERSION, ofproto_v1_3.OFP_VERSION)
+
+UINT64_MAX = (1 << 64) - 1
+
+# number of sent flow-mods which are remembered to undo them on error
+UNDO_LOG_SIZE = 4096
+
+
+class FlowEntry(object):
+    """
+    A flow in a shadow flow table.
+
+    match is a tuple of sorted (field name, value) of OFPMatch.
+    match_inst is the wire format of the match followed by that of the
+    instructions, which start at inst_offset.
+    """
+
+    def __init__(self, table_id, priority, match, cookie, idle_timeout,
+                 hard_timeout, flags, match_inst, inst_offset):
+        super(FlowEntry, self).__init__()
+        self.table_id = table_id
+        self.priority = priority
+        self.match = match
+        self.cookie = cookie
+        self.idle_timeout = idle_timeout
+        self.hard_timeout = hard_timeout
+        self.flags = flags
+        self.match_inst = match_inst
+        self.inst_offset = inst_offset
+
+    @property
+    def key(self):
+        return (self.table_id, self.priority, self.match)
+
+    @property
+    def instructions(self):
+        return self.match_inst[self.inst_offset:]
+
+    def with_instructions(self, instructions):
+        return FlowEntry(self.table_id, self.priority, self.match,
+                         self.cookie, self.idle_timeout, self.hard_timeout,
+                         self.flags,
+                         self.match_inst[:self.inst_offset] + instructions,
+                         self.inst_offset)
+
+
+class _FlowMod(ofproto_parser.MsgBase):
+    # a flow-mod rebuilt from a FlowEntry
+    def __init__(self, datapath, entry, command):
+        super(_FlowMod, self).__init__(datapath)
+        self.cls_msg_type = datapath.ofproto.OFPT_FLOW_MOD
+        self.entry = entry
+        self.command = command
+
+    def _serialize_body(self):
+        ofp = self.datapath.ofproto
+        entry = self.entry
+        ofproto_parser.msg_pack_into(
+            ofp.OFP_FLOW_MOD_PACK_STR0, self.buf, ofp.OFP_HEADER_SIZE,
+            entry.cookie, 0, entry.table_id, self.command,
+            entry.idle_timeout, entry.hard_timeout, entry.priority,
+            ofp.OFP_NO_BUFFER, ofp.OFPP_ANY, ofp.OFPG_ANY, entry.flags)
+        self.buf += entry.match_inst
+
+
+def _match_key(match):
+    return tuple(sorted(match._fields2))
+
+
+def _covers(match, entry_match):
+    # True if a non-strict flow-mod with match applies to entry_match
+    entry_fields = dict(entry_match)
+    for name, value in match:
+        if entry_fields.get(name) != value:
+            return False
+    return True
+
+
+def _serialize_instructions(instructions):
+    buf = bytearray()
+    offset = 0
+    for inst in instructions:
+        inst.serialize(buf, offset)
+        offset += inst.len
+    return str(buf)
+
+
+class ShadowFlowTable(object):
+    """
+    The shadow of the flow tables of a datapath.
+    """
+
+    def __init__(self):
+        super(ShadowFlowTable, self).__init__()
+        self.flows = {}         # (table_id, priority, match) -> FlowEntry
+        self.cookies = {}       # cookie -> set of keys
+
+    def __len__(self):
+        return len(self.flows)
+
+    def get(self, table_id, priority, match):
+        return self.flows.get((table_id, priority, match))
+
+    def put(self, entry):
+        """
+        Add or replace a flow and return the replaced one.
+        """
+        key = entry.key
+        old = self.flows.get(key)
+        if old is not None:
+            self._unindex(old)
+        self.flows[key] = entry
+        self.cookies.setdefault(entry.cookie, set()).add(key)
+        return old
+
+    def remove(self, key):
+        """
+        Remove a flow and return it, or None if there is no such flow.
+        """
+        entry = self.flows.pop(key, None)
+        if entry is not None:
+            self._unindex(entry)
+        return entry
+
+    def _unindex(self, entry):
+        keys = self.cookies[entry.cookie]
+        keys.discard(entry.key)
+        if not keys:
+            del self.cookies[entry.cookie]
+
+    def find(self, table_id, match, cookie=0, cookie_mask=0, all_tables=None):
+        """
+        Return the keys of the flows which a non-strict flow-mod with the
+        given arguments applies to.
+        """
+        if cookie_mask == UINT64_MAX:
+            keys = self.cookies.get(cookie, ())
+        else:
+            keys = self.flows.iterkeys()
+        found = []
+        for key in keys:
+            entry = self.flows[key]
+            if table_id != all_tables and entry.table_id != table_id:
+                continue
+            if (entry.cookie & cookie_mask) != (cookie & cookie_mask):
+                continue
+            if match and not _covers(match, entry.match):
+                continue
+            found.append(key)
+        return found
+
+    def apply_flow_mod(self, ofp, parser, buf):
+        """
+        Apply a serialized flow-mod.  Return a list of (key, replaced
+        FlowEntry or None) to undo it.
+        """
+        (cookie, cookie_mask, table_id, command, idle_timeout, hard_timeout,
+         priority, _buffer_id, _out_port, _out_group,
+         flags) = struct.unpack_from(ofp.OFP_FLOW_MOD_PACK_STR0, buf,
+                                     ofp.OFP_HEADER_SIZE)
+        match_offset = ofp.OFP_FLOW_MOD_SIZE - ofp.OFP_MATCH_SIZE
+        match = parser.OFPMatch.parser(buf, match_offset)
+        match_key = _match_key(match)
+        inst_offset = utils.round_up(match.length, 8)
+        match_inst = str(buf[match_offset:])
+
+        undo = []
+        if command == ofp.OFPFC_ADD:
+            entry = FlowEntry(table_id, priority, match_key, cookie,
+                              idle_timeout, hard_timeout, flags, match_inst,
+                              inst_offset)
+            undo.append((entry.key, self.put(entry)))
+        elif command in (ofp.OFPFC_MODIFY, ofp.OFPFC_MODIFY_STRICT):
+            if command == ofp.OFPFC_MODIFY_STRICT:
+                keys = [(table_id, priority, match_key)]
+            else:
+                keys = self.find(table_id, match_key, cookie, cookie_mask)
+            instructions = match_inst[inst_offset:]
+            for key in keys:
+                entry = self.flows.get(key)
+                if (entry is None or
+                        (entry.cookie & cookie_mask) !=
+                        (cookie & cookie_mask)):
+                    continue
+                undo.append((key,
+                             self.put(entry.with_instructions(instructions))))
+        elif command in (ofp.OFPFC_DELETE, ofp.OFPFC_DELETE_STRICT):
+            if command == ofp.OFPFC_DELETE_STRICT:
+                keys = [(table_id, priority, match_key)]
+            else:
+                keys = self.find(table_id, match_key, cookie, cookie_mask,
+                                 ofp.OFPTT_ALL)
+            for key in keys:
+                entry = self.flows.get(key)
+                if (entry is None or
+                        (entry.cookie & cookie_mask) !=
+                        (cookie & cookie_mask)):
+                    continue
+                undo.append((key, self.remove(key)))
+        return undo
+
+    def undo(self, undo):
+        for key, entry in reversed(undo):
+            if entry is None:
+                self.remove(key)
+            else:
+                self.put(entry)
+
+
+class ShadowFlowTables(app_manager.RyuApp):
+    """
+    ShadowFlowTable of every datapath id.  Use it as a context:
+
+        _CONTEXTS = {'shadow_flow': shadow_flow.ShadowFlowTables}
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ShadowFlowTables, self).__init__(*args, **kwargs)
+        self.name = 'shadow_flow'
+        self.tables = {}        # dpid -> ShadowFlowTable
+        self._connected = set()  # dpids which have been connected
+        # (Datapath, xid) -> undo list of recently sent flow-mods.  a
+        # reconnected datapath is another Datapath, whose xids start over.
+        self._undo_log = collections.OrderedDict()
+        controller.Datapath.send_msg_hooks.append(self._msg_sent)
+        controller.Datapath.batch_error_hooks.append(self._msg_failed)
+
+    def close(self):
+        for hooks, hook in ((controller.Datapath.send_msg_hooks,
+                             self._msg_sent),
+                            (controller.Datapath.batch_error_hooks,
+                             self._msg_failed)):
+            if hook in hooks:
+                hooks.remove(hook)
+
+    def get(self, dpid):
+        """
+        Return the ShadowFlowTable of the datapath id.
+        """
+        table = self.tables.get(dpid)
+        if table is None:
+            table = ShadowFlowTable()
+            self.tables[dpid] = table
+        return table
+
+    def _apply(self, datapath, msg):
+        ofp = datapath.ofproto
+        if (msg.cls_msg_type != ofp.OFPT_FLOW_MOD or datapath.id is None or
+                ofp.OFP_VERSION not in SUPPORTED_OFP_VERSIONS):
+            return None
+        return self.get(datapath.id).apply_flow_mod(
+            ofp, datapath.ofproto_parser, msg.buf)
+
+    def _msg_sent(self, msg):
+        if isinstance(msg, _FlowMod):
+            return
+        datapath = msg.datapath
+        undo = self._apply(datapath, msg)
+        if not undo:
+            return
+        self._undo_log[(datapath, msg.xid)] = undo
+        if len(self._undo_log) > UNDO_LOG_SIZE:
+            self._undo_log.popitem(last=False)
+
+    def _msg_failed(self, msg):
+        # an error message replied to a flow-mod.  the error has the
+        # start of the failed message as its data, which must be a
+        # flow-mod, not another message which happens to have the xid.
+        datapath = msg.datapath
+        if len(msg.data) < ofproto_common.OFP_HEADER_SIZE:
+            return
+        _version, msg_type, _msg_len, _xid = struct.unpack_from(
+            ofproto_common.OFP_HEADER_PACK_STR, msg.data)
+        if msg_type != datapath.ofproto.OFPT_FLOW_MOD:
+            return
+        undo = self._undo_log.pop((datapath, msg.xid), None)
+        if undo is not None:
+            self.tables[datapath.id].undo(undo)
+
+    def stage(self, datapath, msg):
+        """
+        Record a flow-mod in the shadow of the datapath without sending it.
+        """
+        if msg.xid is None:
+            datapath.set_xid(msg)
+        msg.serialize()
+        self._apply(datapath, msg)
+
+    def reconcile(self, datapath, delete_unknown=False, timeout=None):
+        """
+        Make the flows of the datapath the same as its shadow.
+
+        The flows are dumped once.  Flows which are missing or differ
+        in cookie or instructions are installed again.  If
+        delete_unknown is True, flows which aren't in the shadow are
+        deleted.  They may have been installed by another controller or
+        before a restart of this one, so they are kept by default.
+        Missing flows which have a timeout are assumed to have expired
+        and are dropped from the shadow.
+
+        The changes are sent as one MessageBatch, whose BatchFuture is
+        returned.
+        """
+        ofp = datapath.ofproto
+        parser = datapath.ofproto_parser
+        assert ofp.OFP_VERSION in SUPPORTED_OFP_VERSIONS
+        table = self.get(datapath.id)
+
+        req = parser.OFPFlowStatsRequest(datapath, match=parser.OFPMatch())
+        future = datapath.send_request(req, stream=True)
+        batch = datapath.batch()
+        seen = set()
+        deleted = 0
+        for stats in future.iter_body(timeout=timeout):
+            match = _match_key(stats.match)
+            key = (stats.table_id, stats.priority, match)
+            seen.add(key)
+            entry = table.flows.get(key)
+            if entry is None:
+                if delete_unknown:
+                    batch.add(parser.OFPFlowMod(
+                        datapath, cookie=stats.cookie,
+                        cookie_mask=UINT64_MAX, table_id=stats.table_id,
+                        command=ofp.OFPFC_DELETE_STRICT,
+                        priority=stats.priority, out_port=ofp.OFPP_ANY,
+                        out_group=ofp.OFPG_ANY, match=stats.match))
+                    deleted += 1
+            elif (entry.cookie != stats.cookie or
+                  entry.instructions !=
+                  _serialize_instructions(stats.instructions)):
+                batch.add(_FlowMod(datapath, entry, ofp.OFPFC_ADD))
+
+        for key, entry in table.flows.items():
+            if key in seen:
+                continue
+            if entry.idle_timeout or entry.hard_timeout:
+                table.remove(key)
+            else:
+                batch.add(_FlowMod(datapath, entry, ofp.OFPFC_ADD))
+
+        LOG.debug('reconciling datapath %s: %d flows, %d to install, '
+                  '%d to delete', dpid_to_str(datapath.id), len(table),
+                  len(batch) - deleted, deleted)
+        return batch.commit()
+
+    def _reconcile(self, datapath):
+        try:
+            errors = self.reconcile(
+                datapath, CONF.shadow_flow_delete_unknown).result()
+        except Exception as e:
+            LOG.error('failed to reconcile datapath %s: %s',
+                      dpid_to_str(datapath.id), e)
+            return
+        for xid, error in errors.items():
+            LOG.error('reconciling datapath %s: flow-mod xid 0x%x failed '
+                      'with error type 0x%x code 0x%x',
+                      dpid_to_str(datapath.id), xid, error.type, error.code)
+
+    @set_ev_cls(ofp_event.EventOFPStateChange,
+                [handler.MAIN_DISPATCHER, handler.DEAD_DISPATCHER])
+    def state_change_handler(self, ev):
+        datapath = ev.datapath
+        if ev.state == handler.DEAD_DISPATCHER:
+            # no error is replied to its flow-mods any more
+            for key in [key for key in self._undo_log
+                        if key[0] is datapath]:
+                del self._undo_log[key]
+            return
+        if (datapath.id in self._connected and
+                datapath.ofproto.OFP_VERSION in SUPPORTED_OFP_VERSIONS):
+            hub.spawn(self._reconcile, datapath)
+        self._connected.add(datapath.id)
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, handler.MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        msg = ev.msg
+        datapath = msg.datapath
+        table = self.tables.get(datapath.id)
+        if table is None:
+            return
+        table.remove((msg.table_id, msg.priority, _match_key(msg.match)))
+
+    @set_ev_cls(ofp_event.EventOFPErrorMsg,
+                [handler.HANDSHAKE_DISPATCHER, handler.CONFIG_DISPATCHER,
+                 handler.MAIN_DISPATCHER])
+    def error_msg_handler(self, ev):
+        self._msg_failed(ev.msg)
@@ -39,6 +39,24 @@ class OFPMalformedMessage(RyuException):
     message = 'malformed message'
 
 
+class OFPRequestError(RyuException):
+    message = 'request xid 0x%(xid)x failed with error type 0x%(type)x ' \
+              'code 0x%(code)x'
+
+
+class OFPRequestTimeout(RyuException):
+    message = 'request xid 0x%(xid)x timed out'
+
+
+class OFPRequestCancelled(RyuException):
+    message = 'request xid 0x%(xid)x was cancelled'
+
+
+class OFPDatapathDisconnected(RyuException):
+    message = 'datapath disconnected before request xid 0x%(xid)x ' \
+              'was answered'
+
+
 class NetworkNotFound(RyuException):
     message = 'no such network id %(network_id)s'
 
@@ -14,6 +14,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import binascii
+import socket
+
 import netaddr
 
 
@@ -30,11 +33,111 @@ class AddressConverter(object):
         return str(self._addr(self._strat.packed_to_int(bin),
                               **self._addr_kwargs))
 
-ipv4 = AddressConverter(netaddr.IPAddress, netaddr.strategy.ipv4, version=4)
-ipv6 = AddressConverter(netaddr.IPAddress, netaddr.strategy.ipv6, version=6)
+
+class _FastAddressConverter(AddressConverter):
+    # converts the usual forms without netaddr, and falls back to
+    # AddressConverter for the others and for errors.
+
+    def __init__(self, addr, strat, **kwargs):
+        super(_FastAddressConverter, self).__init__(addr, strat, **kwargs)
+        self._cache_size = 0
+        self._bin_cache = {}
+        self._text_cache = {}
+
+    def set_cache_size(self, size):
+        """
+        Remember up to size results of each of text_to_bin and
+        bin_to_text.  When a cache is full, it's emptied.
+        0 disables the caches, which is the default.
+        """
+        self._cache_size = size
+        self._bin_cache.clear()
+        self._text_cache.clear()
+        if size:
+            self.text_to_bin = self._cached_text_to_bin
+            self.bin_to_text = self._cached_bin_to_text
+        else:
+            self.__dict__.pop('text_to_bin', None)
+            self.__dict__.pop('bin_to_text', None)
+
+    def _cached(self, cache, conv, key):
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable, e.g. bytearray
+            return conv(self, key)
+        value = conv(self, key)
+        if len(cache) >= self._cache_size:
+            cache.clear()
+        cache[key] = value
+        return value
+
+    def _cached_text_to_bin(self, text):
+        return self._cached(self._bin_cache, type(self).text_to_bin, text)
+
+    def _cached_bin_to_text(self, bin):
+        return self._cached(self._text_cache, type(self).bin_to_text, bin)
+
+
+class _IPAddressConverter(_FastAddressConverter):
+    def __init__(self, family, strat, version):
+        super(_IPAddressConverter, self).__init__(netaddr.IPAddress, strat,
+                                                  version=version)
+        self._family = family
+
+    def text_to_bin(self, text):
+        try:
+            return socket.inet_pton(self._family, text)
+        except (socket.error, TypeError, ValueError):
+            return super(_IPAddressConverter, self).text_to_bin(text)
+
+    def bin_to_text(self, bin):
+        try:
+            return socket.inet_ntop(self._family, bin)
+        except (socket.error, TypeError, ValueError):
+            return super(_IPAddressConverter, self).bin_to_text(bin)
+
+
+class _IPv4AddressConverter(_IPAddressConverter):
+    def bin_to_text(self, bin):
+        try:
+            return socket.inet_ntoa(bin)
+        except (socket.error, TypeError, ValueError):
+            return super(_IPAddressConverter, self).bin_to_text(bin)
+
+
+# byte (as a character or an integer) -> 2 lower case hex digits
+_BYTE_TO_HEX = {}
+for _i in range(256):
+    _BYTE_TO_HEX[_i] = _BYTE_TO_HEX[chr(_i)] = '%02x' % _i
+del _i
+
+
+class _MACAddressConverter(_FastAddressConverter):
+    def text_to_bin(self, text):
+        try:
+            if len(text) == 17 and text[2::3] == ':::::':
+                return binascii.unhexlify(text.replace(':', ''))
+        except TypeError:
+            pass
+        return super(_MACAddressConverter, self).text_to_bin(text)
+
+    def bin_to_text(self, bin):
+        try:
+            if len(bin) == 6:
+                return ':'.join([_BYTE_TO_HEX[b] for b in bin])
+        except (KeyError, TypeError):
+            pass
+        return super(_MACAddressConverter, self).bin_to_text(bin)
+
+
+ipv4 = _IPv4AddressConverter(socket.AF_INET, netaddr.strategy.ipv4, 4)
+ipv6 = _IPAddressConverter(socket.AF_INET6, netaddr.strategy.ipv6, 6)
 
 
 class mac_mydialect(netaddr.mac_unix):
     word_fmt = '%.2x'
-mac = AddressConverter(netaddr.EUI, netaddr.strategy.eui48, version=48,
-                       dialect=mac_mydialect)
+mac = _MACAddressConverter(netaddr.EUI, netaddr.strategy.eui48, version=48,
+                           dialect=mac_mydialect)
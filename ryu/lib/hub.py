@@ -15,7 +15,15 @@
 # limitations under the License.
 
 import logging
+import math
 import os
+import traceback
+
+try:
+    from time import monotonic
+except ImportError:
+    # python 2
+    from monotonic import monotonic
 
 
 # we don't bother to use cfg.py because monkey patch needs to be
@@ -28,13 +36,13 @@ LOG = logging.getLogger('ryu.lib.hub')
 if HUB_TYPE == 'eventlet':
     import eventlet
     import eventlet.event
+    import eventlet.green.socket
     import eventlet.queue
     import eventlet.timeout
     import eventlet.wsgi
     import greenlet
     import ssl
     import socket
-    import traceback
 
     getcurrent = eventlet.getcurrent
     patch = eventlet.monkey_patch
@@ -72,17 +80,33 @@ if HUB_TYPE == 'eventlet':
     Queue = eventlet.queue.Queue
     QueueEmpty = eventlet.queue.Empty
 
+    # python 2 doesn't export SO_REUSEPORT.  15 is the value on linux.
+    SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', 15)
+
+    def _listen_reuse_port(listen_info, family, backlog=50):
+        # every process binding the address with SO_REUSEPORT gets its
+        # own accept queue and the kernel spreads connections over them.
+        sock = eventlet.green.socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
+        sock.bind(listen_info)
+        sock.listen(backlog)
+        return sock
+
     class StreamServer(object):
         def __init__(self, listen_info, handle=None, backlog=None,
-                     spawn='default', **ssl_args):
+                     spawn='default', reuse_port=False, **ssl_args):
             assert backlog is None
             assert spawn == 'default'
 
             if ':' in listen_info[0]:
-                self.server = eventlet.listen(listen_info,
-                                              family=socket.AF_INET6)
+                family = socket.AF_INET6
             else:
-                self.server = eventlet.listen(listen_info)
+                family = socket.AF_INET
+            if reuse_port:
+                self.server = _listen_reuse_port(listen_info, family)
+            else:
+                self.server = eventlet.listen(listen_info, family=family)
             if ssl_args:
                 def wrap_and_handle(sock, addr):
                     ssl_args.setdefault('server_side', True)
@@ -137,3 +161,245 @@ if HUB_TYPE == 'eventlet':
                     pass
 
             return self._cond
+
+
+# a hierarchical timing wheel, after Varghese and Lauck and the timers of
+# the linux kernel.  the timers which expire within 256 ticks are hashed
+# by their expiry tick into the 256 slots of level 0.  the later ones go
+# to the 64 slots of the higher levels, each of which spans 64 times the
+# range of the level below, and are cascaded down a level each time the
+# level below wraps around.  a timer is in one slot, a set, so adding,
+# cancelling and rescheduling it is O(1).
+_WHEEL_BITS = (8, 6, 6, 6)
+
+
+class WheelTimer(object):
+    """
+    A timer of TimerWheel, which calls func(\*args, \*\*kwargs) on the
+    thread of the wheel when it expires.
+    """
+
+    __slots__ = ('_wheel', '_slot', '_tick', 'expires', 'func', 'args',
+                 'kwargs')
+
+    def __init__(self, wheel, func, args, kwargs):
+        super(WheelTimer, self).__init__()
+        self._wheel = wheel
+        self._slot = None
+        self._tick = None       # the tick which it expires on
+        self.expires = None     # the clock time which it expires at
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def is_active(self):
+        """
+        Return True if the timer is scheduled and hasn't expired yet.
+        """
+        return self._slot is not None
+
+    def cancel(self):
+        """
+        Cancel the timer if it is active.
+        """
+        if self._slot is not None:
+            self._wheel._remove(self)
+
+    def reschedule(self, seconds):
+        """
+        Schedule the timer to expire *seconds* later, whether it is
+        active or not, e.g. has expired or is running its function.
+        """
+        self.cancel()
+        self._wheel._schedule(self, seconds)
+
+
+class TimerWheel(object):
+    """
+    Timers which are run by one thread instead of a thread each.
+
+    Timer functions run on the thread of the wheel, one at a time, so
+    they must not block; spawn a thread for the work which can, e.g.
+    sending to a datapath, whose send queue may be full, or sending an
+    event to an application.  Otherwise one stuck peer stalls every
+    timer of the wheel.  A timer expires no earlier than its time, and
+    within a tick after it unless the thread is busy.  The timers which
+    expire on the same tick run in no particular order.
+
+    Times are measured by a monotonic clock, so that a step of the
+    system time doesn't fire or hold back the timers.
+
+    The thread is started by start().  Otherwise run() runs the expired
+    timers, e.g. with a simulated clock.
+    """
+
+    def __init__(self, tick=.01, clock=monotonic):
+        super(TimerWheel, self).__init__()
+        self.tick = tick
+        self._clock = clock
+        self._origin = clock()
+        self._next = 0                  # the next tick to run
+        self._levels = [[set() for _i in range(1 << bits)]
+                        for bits in _WHEEL_BITS]
+        # (level, shift, mask, span) of each level, where span is the
+        # number of ticks from the next tick which the levels up to it
+        # span
+        self._spans = []
+        shift = 0
+        for level, bits in zip(self._levels, _WHEEL_BITS):
+            self._spans.append((level, shift, (1 << bits) - 1,
+                                1 << (shift + bits)))
+            shift += bits
+        self._count = 0                 # number of the active timers
+        self._thread = None
+        self._wakeup = None
+        # the tick which the thread sleeps until, or None if it isn't
+        # sleeping
+        self._wakeup_tick = None
+
+    def __len__(self):
+        return self._count
+
+    def call_later(self, seconds, func, *args, **kwargs):
+        """
+        Call func(\*args, \*\*kwargs) *seconds* later and return its
+        WheelTimer.
+        """
+        timer = WheelTimer(self, func, args, kwargs)
+        self._schedule(timer, seconds)
+        return timer
+
+    def _schedule(self, timer, seconds):
+        timer.expires = self._clock() + seconds
+        tick = int(math.ceil((timer.expires - self._origin) / self.tick))
+        timer._tick = max(tick, self._next)
+        self._add(timer)
+        self._count += 1
+        wakeup_tick = self._wakeup_tick
+        if wakeup_tick is not None and timer._tick < wakeup_tick:
+            # the thread sleeps longer than the timer
+            self._wakeup_tick = None
+            self._wakeup.set()
+
+    def _add(self, timer):
+        tick = timer._tick
+        delta = tick - self._next
+        for level, shift, mask, span in self._spans:
+            if delta < span:
+                break
+        else:
+            # beyond the wheel.  it's cascaded down again when the last
+            # level wraps around.
+            tick = self._next + span - 1
+        slot = level[(tick >> shift) & mask]
+        slot.add(timer)
+        timer._slot = slot
+
+    def _remove(self, timer):
+        timer._slot.discard(timer)
+        timer._slot = None
+        self._count -= 1
+
+    def _cascade(self, level_no):
+        # move the timers of the current slot of the level down, and
+        # return the index of the slot
+        shift = sum(_WHEEL_BITS[:level_no])
+        bits = _WHEEL_BITS[level_no]
+        level = self._levels[level_no]
+        index = (self._next >> shift) & ((1 << bits) - 1)
+        slot = level[index]
+        level[index] = set()
+        for timer in slot:
+            self._add(timer)
+        return index
+
+    def _run_tick(self):
+        level0 = self._levels[0]
+        index = self._next & (len(level0) - 1)
+        if index == 0:
+            for level_no in range(1, len(self._levels)):
+                if self._cascade(level_no):
+                    break
+        slot = level0[index]
+        level0[index] = set()
+        self._next += 1
+        # the functions can cancel the other timers of the slot
+        while slot:
+            timer = slot.pop()
+            timer._slot = None
+            self._count -= 1
+            try:
+                timer.func(*timer.args, **timer.kwargs)
+            except:
+                LOG.error('hub: uncaught exception in timer: %s',
+                          traceback.format_exc())
+
+    def run(self, now=None):
+        """
+        Run the timers which have expired by *now*, or the current time.
+        """
+        if now is None:
+            now = self._clock()
+        last = int((now - self._origin) / self.tick)
+        while self._next <= last:
+            if not self._count:
+                # nothing to cascade or run
+                self._next = last + 1
+                break
+            self._run_tick()
+
+    def _next_tick(self):
+        # the tick to run next, the next one with timers in level 0 or
+        # the next cascade
+        level0 = self._levels[0]
+        start = self._next & (len(level0) - 1)
+        for index in range(start, len(level0)):
+            if level0[index]:
+                return self._next + index - start
+        return self._next + len(level0) - start
+
+    def _loop(self):
+        while True:
+            self._wakeup.clear()
+            self._wakeup_tick = None
+            self.run()
+            if self._count:
+                self._wakeup_tick = self._next_tick()
+                timeout = max(self._origin +
+                              self._wakeup_tick * self.tick -
+                              self._clock(), 0)
+            else:
+                self._wakeup_tick = float('inf')
+                timeout = None
+            self._wakeup.wait(timeout)
+
+    def start(self):
+        """
+        Start the thread which runs the timers.
+        """
+        if self._thread is None:
+            self._wakeup = Event()
+            self._thread = spawn(self._loop)
+
+
+_timer_wheel = None
+
+
+def timer_wheel():
+    """
+    Return the TimerWheel shared by the applications.
+    """
+    global _timer_wheel
+    if _timer_wheel is None:
+        _timer_wheel = TimerWheel()
+        _timer_wheel.start()
+    return _timer_wheel
+
+
+def call_later(seconds, func, *args, **kwargs):
+    """
+    Call func(\*args, \*\*kwargs) *seconds* later on the thread of the
+    shared TimerWheel, and return its WheelTimer.  func must not block;
+    see TimerWheel.
+    """
+    return timer_wheel().call_later(seconds, func, *args, **kwargs)
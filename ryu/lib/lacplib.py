@@ -33,6 +33,8 @@ from ryu.lib.packet import slow
 
 class EventPacketIn(event.EventBase):
     """a PacketIn event class using except LACP."""
+    EVENT_PRIORITY = event.EVENT_PRIORITY_LOW
+
     def __init__(self, msg):
         """initialization."""
         super(EventPacketIn, self).__init__()
@@ -141,7 +143,6 @@ class LacpLib(app_manager.RyuApp):
         datapath = msg.datapath
         dpid = datapath.id
         ofproto = datapath.ofproto
-        parser = datapath.ofproto_parser
         if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
             port = msg.in_port
         else:
@@ -186,11 +187,7 @@ class LacpLib(app_manager.RyuApp):
 
         # packet-out the response packet.
         out_port = ofproto.OFPP_IN_PORT
-        actions = [parser.OFPActionOutput(out_port)]
-        out = datapath.ofproto_parser.OFPPacketOut(
-            datapath=datapath, buffer_id=ofproto.OFP_NO_BUFFER,
-            data=res_pkt.data, in_port=port, actions=actions)
-        datapath.send_msg(out)
+        datapath.packet_out_template(out_port, port).send(res_pkt.data)
 
     def _create_response(self, datapath, port, req):
         """create a packet including LACP."""
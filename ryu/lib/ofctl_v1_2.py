@@ -17,10 +17,10 @@ import struct
 import socket
 import logging
 
+from ryu.exception import RyuException
 from ryu.ofproto import inet
 from ryu.ofproto import ofproto_v1_2
 from ryu.ofproto import ofproto_v1_2_parser
-from ryu.lib import hub
 from ryu.lib import mac
 
 
@@ -191,19 +191,16 @@ def match_ip_to_str(value, mask):
 
 
 def send_stats_request(dp, stats, waiters, msgs):
-    dp.set_xid(stats)
-    waiters_per_dp = waiters.setdefault(dp.id, {})
-    lock = hub.Event()
-    waiters_per_dp[stats.xid] = (lock, msgs)
-    dp.send_msg(stats)
-
+    # waiters is no longer used, as replies are matched to the request
+    # by Datapath.send_request().  it's kept for existing callers.
+    future = dp.send_request(stats)
     try:
-        lock.wait(timeout=DEFAULT_TIMEOUT)
-    except hub.Timeout:
-        del waiters_per_dp[stats.xid]
+        msgs.extend(future.result(timeout=DEFAULT_TIMEOUT))
+    except RyuException as e:
+        LOG.debug('stats request failed: %s', e)
 
 
-def get_flow_stats(dp, waiters):
+def get_flow_stats(dp, waiters=None):
     table_id = 0
     out_port = dp.ofproto.OFPP_ANY
     out_group = dp.ofproto.OFPG_ANY
@@ -215,7 +212,7 @@ def get_flow_stats(dp, waiters):
         dp, table_id, out_port, out_group, cookie, cookie_mask, match)
 
     msgs = []
-    send_stats_request(dp, stats, waiters, msgs)
+    send_stats_request(dp, stats, None, msgs)
 
     flows = []
     for msg in msgs:
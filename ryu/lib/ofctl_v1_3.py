@@ -17,10 +17,10 @@ import struct
 import socket
 import logging
 
+from ryu.exception import RyuException
 from ryu.ofproto import inet
 from ryu.ofproto import ofproto_v1_3
 from ryu.ofproto import ofproto_v1_3_parser
-from ryu.lib import hub
 from ryu.lib import mac
 
 
@@ -282,22 +282,33 @@ def match_ip_to_str(value, mask):
 
 
 def send_stats_request(dp, stats, waiters, msgs):
-    dp.set_xid(stats)
-    waiters_per_dp = waiters.setdefault(dp.id, {})
-    lock = hub.Event()
-    waiters_per_dp[stats.xid] = (lock, msgs)
-    dp.send_msg(stats)
+    # waiters is no longer used, as replies are matched to the request
+    # by Datapath.send_request().  it's kept for existing callers.
+    future = dp.send_request(stats)
+    try:
+        msgs.extend(future.result(timeout=DEFAULT_TIMEOUT))
+    except RyuException as e:
+        LOG.debug('stats request failed: %s', e)
+
 
+def iter_stats(dp, stats):
+    # yield the body entries of every reply as it arrives.  a failure
+    # is raised, as the entries yielded so far are incomplete.
+    future = dp.send_request(stats, stream=True)
     try:
-        lock.wait(timeout=DEFAULT_TIMEOUT)
-    except hub.Timeout:
-        del waiters_per_dp[stats.xid]
+        for entry in future.iter_body(timeout=DEFAULT_TIMEOUT):
+            yield entry
+    except RyuException as e:
+        LOG.warning('stats request failed: %s', e)
+        raise
+    finally:
+        future.cancel()
 
 
-def get_desc_stats(dp, waiters):
+def get_desc_stats(dp, waiters=None):
     stats = dp.ofproto_parser.OFPDescStatsRequest(dp, 0)
     msgs = []
-    send_stats_request(dp, stats, waiters, msgs)
+    send_stats_request(dp, stats, None, msgs)
 
     for msg in msgs:
         stats = msg.body
@@ -310,7 +321,7 @@ def get_desc_stats(dp, waiters):
     return desc
 
 
-def get_flow_stats(dp, waiters):
+def flow_stats_request(dp):
     table_id = 0
     flags = 0
     out_port = dp.ofproto.OFPP_ANY
@@ -319,63 +330,86 @@ def get_flow_stats(dp, waiters):
     cookie_mask = 0
     match = dp.ofproto_parser.OFPMatch()
 
-    stats = dp.ofproto_parser.OFPFlowStatsRequest(
+    return dp.ofproto_parser.OFPFlowStatsRequest(
         dp, flags, table_id, out_port, out_group, cookie, cookie_mask,
         match)
 
+
+def flow_stats_to_dict(stats):
+    actions = actions_to_str(stats.instructions)
+    match = match_to_str(stats.match)
+
+    return {'priority': stats.priority,
+            'cookie': stats.cookie,
+            'idle_timeout': stats.idle_timeout,
+            'hard_timeout': stats.hard_timeout,
+            'actions': actions,
+            'match': match,
+            'byte_count': stats.byte_count,
+            'duration_sec': stats.duration_sec,
+            'duration_nsec': stats.duration_nsec,
+            'packet_count': stats.packet_count,
+            'table_id': stats.table_id}
+
+
+def get_flow_stats(dp, waiters=None):
+    stats = flow_stats_request(dp)
     msgs = []
-    send_stats_request(dp, stats, waiters, msgs)
+    send_stats_request(dp, stats, None, msgs)
 
     flows = []
     for msg in msgs:
         for stats in msg.body:
-            actions = actions_to_str(stats.instructions)
-            match = match_to_str(stats.match)
-
-            s = {'priority': stats.priority,
-                 'cookie': stats.cookie,
-                 'idle_timeout': stats.idle_timeout,
-                 'hard_timeout': stats.hard_timeout,
-                 'actions': actions,
-                 'match': match,
-                 'byte_count': stats.byte_count,
-                 'duration_sec': stats.duration_sec,
-                 'duration_nsec': stats.duration_nsec,
-                 'packet_count': stats.packet_count,
-                 'table_id': stats.table_id}
-            flows.append(s)
+            flows.append(flow_stats_to_dict(stats))
     flows = {str(dp.id): flows}
 
     return flows
 
 
-def get_port_stats(dp, waiters):
-    stats = dp.ofproto_parser.OFPPortStatsRequest(
+def iter_flow_stats(dp):
+    for stats in iter_stats(dp, flow_stats_request(dp)):
+        yield flow_stats_to_dict(stats)
+
+
+def port_stats_request(dp):
+    return dp.ofproto_parser.OFPPortStatsRequest(
         dp, 0, dp.ofproto.OFPP_ANY)
+
+
+def port_stats_to_dict(stats):
+    return {'port_no': stats.port_no,
+            'rx_packets': stats.rx_packets,
+            'tx_packets': stats.tx_packets,
+            'rx_bytes': stats.rx_bytes,
+            'tx_bytes': stats.tx_bytes,
+            'rx_dropped': stats.rx_dropped,
+            'tx_dropped': stats.tx_dropped,
+            'rx_errors': stats.rx_errors,
+            'tx_errors': stats.tx_errors,
+            'rx_frame_err': stats.rx_frame_err,
+            'rx_over_err': stats.rx_over_err,
+            'rx_crc_err': stats.rx_crc_err,
+            'collisions': stats.collisions}
+
+
+def get_port_stats(dp, waiters=None):
+    stats = port_stats_request(dp)
     msgs = []
-    send_stats_request(dp, stats, waiters, msgs)
+    send_stats_request(dp, stats, None, msgs)
 
     ports = []
     for msg in msgs:
         for stats in msg.body:
-            s = {'port_no': stats.port_no,
-                 'rx_packets': stats.rx_packets,
-                 'tx_packets': stats.tx_packets,
-                 'rx_bytes': stats.rx_bytes,
-                 'tx_bytes': stats.tx_bytes,
-                 'rx_dropped': stats.rx_dropped,
-                 'tx_dropped': stats.tx_dropped,
-                 'rx_errors': stats.rx_errors,
-                 'tx_errors': stats.tx_errors,
-                 'rx_frame_err': stats.rx_frame_err,
-                 'rx_over_err': stats.rx_over_err,
-                 'rx_crc_err': stats.rx_crc_err,
-                 'collisions': stats.collisions}
-            ports.append(s)
+            ports.append(port_stats_to_dict(stats))
     ports = {str(dp.id): ports}
     return ports
 
 
+def iter_port_stats(dp):
+    for stats in iter_stats(dp, port_stats_request(dp)):
+        yield port_stats_to_dict(stats)
+
+
 def mod_flow_entry(dp, flow, cmd):
     cookie = int(flow.get('cookie', 0))
     cookie_mask = int(flow.get('cookie_mask', 0))
@@ -25,9 +25,9 @@ LOG = logging.getLogger(__name__)
 def packet_in_filter(cls, args=None):
     def _packet_in_filter(packet_in_handler):
         def __packet_in_filter(self, ev):
-            pkt = packet.Packet(ev.msg.data)
+            pkt = packet.Packet(ev.msg.data, lazy=True)
             if not packet_in_handler.pkt_in_filter.filter(pkt):
-                LOG.debug('The packet is discarded by %s: %s' % (cls, pkt))
+                LOG.debug('The packet is discarded by %s: %s', cls, pkt)
                 return
             return packet_in_handler(self, ev)
         pkt_in_filter = cls(args)
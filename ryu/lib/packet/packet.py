@@ -20,6 +20,41 @@ from . import packet_base
 from . import ethernet
 
 
+# bytes allocated by Packet.serialize for headers
+_SERIALIZE_HEADROOM = 128
+_RAW_TYPES = (str, bytearray, buffer)
+
+
+class _ProtocolList(list):
+    # the protocols of a Packet, and an index of them which is
+    # forgotten when the list is modified
+    def __init__(self, *args):
+        super(_ProtocolList, self).__init__(*args)
+        # protocol class -> the first one, or None if there is none
+        self.first = {}
+        # protocol class -> list of all, only when decoding is done
+        self.all = {}
+
+    def changed(self):
+        self.first.clear()
+        self.all.clear()
+
+
+def _changing(name):
+    method = getattr(list, name)
+
+    def _method(self, *args):
+        self.changed()
+        return method(self, *args)
+    _method.__name__ = name
+    return _method
+
+for _name in ('__setitem__', '__delitem__', '__setslice__', '__delslice__',
+              '__iadd__', '__imul__', 'append', 'extend', 'insert', 'pop',
+              'remove', 'reverse', 'sort'):
+    setattr(_ProtocolList, _name, _changing(_name))
+
+
 class Packet(object):
     """A packet decoder/encoder class.
 
@@ -31,30 +66,72 @@ class Packet(object):
     Protocol headers are instances of subclass of packet_base.PacketBase.
     The payload is a bytearray.  They are iterated in on-wire order.
 
+    If *lazy* is True, the headers are decoded only when they're needed.
+    get_protocol(), iteration and indexing with a non-negative integer
+    decode as far as the requested header; anything else decodes them all.
+
     *data* should be omitted when encoding a packet.
     """
 
-    def __init__(self, data=None, protocols=None, parse_cls=ethernet.ethernet):
+    def __init__(self, data=None, protocols=None, parse_cls=ethernet.ethernet,
+                 lazy=False):
         super(Packet, self).__init__()
         self.data = data
         if protocols is None:
-            self.protocols = []
+            self._protocols = _ProtocolList()
         else:
-            self.protocols = protocols
+            self._protocols = _ProtocolList(protocols)
+        # the class to decode rest_data with, or None when done
+        self._parse_cls = None
+        self._rest_data = None
         if self.data:
-            self._parser(parse_cls)
-
-    def _parser(self, cls):
-        rest_data = self.data
-        while cls:
-            try:
-                proto, cls, rest_data = cls.parser(rest_data)
-            except struct.error:
-                break
-            if proto:
-                self.protocols.append(proto)
-        if rest_data:
-            self.protocols.append(rest_data)
+            self._parse_cls = parse_cls
+            self._rest_data = self.data
+            if not lazy:
+                self._parse_all()
+
+    def _parse_next(self):
+        # decode one more header.  return False if there is no more.
+        cls = self._parse_cls
+        if cls is None:
+            return False
+        rest_data = self._rest_data
+        try:
+            proto, cls, rest_data = cls.parser(rest_data)
+        except struct.error:
+            proto, cls = None, None
+        # decoded headers don't change what the index has found, so
+        # bypass _ProtocolList.append
+        protocols = self._protocols
+        if proto:
+            list.append(protocols, proto)
+        self._parse_cls = cls
+        if cls is None:
+            if rest_data:
+                list.append(protocols, rest_data)
+            rest_data = None
+        self._rest_data = rest_data
+        return True
+
+    def _parse_all(self):
+        while self._parse_next():
+            pass
+
+    def _parse_to(self, idx):
+        # decode until there are more than idx protocols
+        while len(self._protocols) <= idx and self._parse_next():
+            pass
+
+    @property
+    def protocols(self):
+        self._parse_all()
+        return self._protocols
+
+    @protocols.setter
+    def protocols(self, protocols):
+        self._parse_cls = None
+        self._rest_data = None
+        self._protocols = _ProtocolList(protocols)
 
     def serialize(self):
         """Encode a packet and store the resulted bytearray in self.data.
@@ -62,18 +139,41 @@ class Packet(object):
         This method is legal only when encoding a packet.
         """
 
-        self.data = bytearray()
-        r = self.protocols[::-1]
-        for i, p in enumerate(r):
-            if isinstance(p, packet_base.PacketBase):
-                if i == len(r) - 1:
+        protocols = self.protocols
+        # allocate a buffer at once for the raw payloads and the headers,
+        # which are expected to fit in the headroom, and write the
+        # headers from the end of it.  each header is given a buffer of
+        # the rest of the packet as its payload.
+        size = _SERIALIZE_HEADROOM
+        for p in protocols:
+            if isinstance(p, _RAW_TYPES):
+                size += len(p)
+        buf = bytearray(size)
+        start = size
+        offsets = [0] * len(protocols)
+        for i in range(len(protocols) - 1, -1, -1):
+            p = protocols[i]
+            if isinstance(p, _RAW_TYPES):
+                data = p
+            elif packet_base.PacketBase in type(p).__mro__:
+                if i == 0:
                     prev = None
                 else:
-                    prev = r[i + 1]
-                data = p.serialize(self.data, prev)
+                    prev = protocols[i - 1]
+                data = p.serialize(buffer(buf, start), prev)
             else:
                 data = str(p)
-            self.data = data + self.data
+            length = len(data)
+            if length > start:
+                grow = length - start + _SERIALIZE_HEADROOM
+                buf[0:0] = bytearray(grow)
+                start += grow
+            start -= length
+            buf[start:start + length] = data
+            offsets[i] = start
+        del buf[:start]
+        self.data = buf
+        self._offsets = [offset - start for offset in offsets]
 
     def add_protocol(self, proto):
         """Register a protocol *proto* for this packet.
@@ -93,16 +193,38 @@ class Packet(object):
         """
         if isinstance(protocol, packet_base.PacketBase):
             protocol = protocol.__class__
-        assert issubclass(protocol, packet_base.PacketBase)
-        return [p for p in self.protocols if isinstance(p, protocol)]
+        self._parse_all()
+        protocols = self._protocols
+        result = protocols.all.get(protocol)
+        if result is None:
+            assert issubclass(protocol, packet_base.PacketBase)
+            result = [p for p in protocols if isinstance(p, protocol)]
+            protocols.all[protocol] = result
+        return list(result)
 
     def get_protocol(self, protocol):
         """Returns the firstly found protocol that matches to the
         specified protocol.
         """
-        result = self.get_protocols(protocol)
-        if len(result) > 0:
-            return result[0]
+        if isinstance(protocol, packet_base.PacketBase):
+            protocol = protocol.__class__
+        protocols = self._protocols
+        try:
+            return protocols.first[protocol]
+        except KeyError:
+            pass
+        assert issubclass(protocol, packet_base.PacketBase)
+        i = 0
+        while True:
+            while i < len(protocols):
+                p = protocols[i]
+                if isinstance(p, protocol):
+                    protocols.first[protocol] = p
+                    return p
+                i += 1
+            if not self._parse_next():
+                break
+        protocols.first[protocol] = None
         return None
 
     def __div__(self, trailer):
@@ -110,9 +232,18 @@ class Packet(object):
         return self
 
     def __iter__(self):
-        return iter(self.protocols)
+        i = 0
+        while True:
+            self._parse_to(i)
+            if i >= len(self._protocols):
+                return
+            yield self._protocols[i]
+            i += 1
 
     def __getitem__(self, idx):
+        if isinstance(idx, (int, long)) and idx >= 0:
+            self._parse_to(idx)
+            return self._protocols[idx]
         return self.protocols[idx]
 
     def __setitem__(self, idx, item):
@@ -135,6 +266,68 @@ class Packet(object):
     __repr__ = __str__  # note: str(list) uses __repr__ for elements
 
 
+class PacketTemplate(object):
+    """A serialized packet to make copies of with some fields changed.
+
+    *pkt* is a Packet to encode, which is serialized once.
+    add_field() names a field in it and build() returns a copy of the
+    encoded packet with the given fields packed.  Checksums aren't
+    updated, so the fields shouldn't be covered by a checksum.
+
+    For example::
+
+        pkt = packet.Packet()
+        pkt.add_protocol(ethernet.ethernet(dst, '00:00:00:00:00:00', type_))
+        ...
+        tmpl = packet.PacketTemplate(pkt)
+        tmpl.add_field('src', ethernet.ethernet, 6, '!6s')
+        data = tmpl.build(src=addrconv.mac.text_to_bin(src))
+    """
+
+    def __init__(self, pkt):
+        super(PacketTemplate, self).__init__()
+        pkt.serialize()
+        self.data = pkt.data
+        self._protocols = list(pkt.protocols)
+        self._offsets = pkt._offsets
+        self._fields = {}   # name -> (offset, struct.Struct)
+
+    def add_field(self, name, protocol, offset, fmt):
+        """Name a field to change with build().
+
+        *protocol* is a protocol header of the packet, or a protocol class
+        for the first header of the class.  *offset* is the offset of
+        the field in the header and *fmt* is its struct format.
+        """
+        for p, start in zip(self._protocols, self._offsets):
+            if p is protocol or (inspect.isclass(protocol) and
+                                 isinstance(p, protocol)):
+                break
+        else:
+            raise ValueError('no protocol %s in the packet' % protocol)
+        field = struct.Struct(fmt)
+        offset += start
+        if offset + field.size > len(self.data):
+            raise ValueError('field %s is out of the packet' % name)
+        self._fields[name] = (offset, field)
+
+    def build(self, **values):
+        """Return a copy of the encoded packet as a bytearray, with the
+        given fields packed.
+
+        The value of a field with more than one item in its format is a
+        tuple.
+        """
+        data = bytearray(self.data)
+        for name, value in values.iteritems():
+            offset, field = self._fields[name]
+            if isinstance(value, tuple):
+                field.pack_into(data, offset, *value)
+            else:
+                field.pack_into(data, offset, value)
+        return data
+
+
 # XXX: Hack for preventing recursive import
 def _PacketBase__div__(self, trailer):
     pkt = Packet()
@@ -78,7 +78,7 @@ class PacketBase(stringify.StringifyMixin):
         Returns a bytearray which contains the header.
 
         *payload* is the rest of the packet which will immediately follow
-        this header.
+        this header.  It may be a read-only buffer.
 
         *prev* is a packet_base.PacketBase subclass for the outer protocol
         header.  *prev* is None if the current header is the outer-most.
@@ -13,26 +13,140 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import array
-import socket
 import struct
 from ryu.lib import addrconv
 
+# numpy is imported by checksum_many on its first batch, and is False if
+# it isn't available.  it's optional and slow to import.
+numpy = None
+
+# checksum_many uses numpy for at least this many data
+NUMPY_MIN_BATCH = 16
+
+_UINT16 = struct.Struct('!H')
+_UINT8 = struct.Struct('!B')
+_WORDS = {}     # number of 32 bit words -> struct.Struct
+
 
 def carry_around_add(a, b):
     c = a + b
     return (c & 0xffff) + (c >> 16)
 
 
-def checksum(data):
-    if len(data) % 2:
-        data += '\x00'
+def _fold(s):
+    while s >> 16:
+        s = (s & 0xffff) + (s >> 16)
+    return s
+
+
+def _sum(data, offset=0, length=None):
+    # sum of the data as big endian 32 bit words, which is congruent to
+    # the sum of 16 bit words modulo 0xffff.  an odd byte at the end is
+    # padded with zero.  data can be any buffer and isn't copied.
+    if length is None:
+        length = len(data) - offset
+    n = length >> 2
+    words = _WORDS.get(n)
+    if words is None:
+        words = struct.Struct('!%dI' % n)
+        _WORDS[n] = words
+    s = sum(words.unpack_from(data, offset))
+    if length & 3:
+        offset += n << 2
+        if length & 2:
+            s += _UINT16.unpack_from(data, offset)[0]
+            offset += 2
+        if length & 1:
+            s += _UINT8.unpack_from(data, offset)[0] << 8
+    return s
+
+
+def _sum_parts(parts):
+    # sum of the concatenation of parts without concatenating them.
+    # a part which starts at an odd offset is summed as if it were
+    # aligned and its sum is byte swapped.  (RFC 1071 2.(B))
+    s = 0
+    odd = False
+    for part in parts:
+        part_sum = _fold(_sum(part))
+        if odd:
+            part_sum = ((part_sum & 0xff) << 8) | (part_sum >> 8)
+        s += part_sum
+        if len(part) & 1:
+            odd = not odd
+    return s
 
-    data = str(data)    # input can be bytearray.
-    s = sum(array.array('H', data))
-    s = (s & 0xffff) + (s >> 16)
-    s += (s >> 16)
-    return socket.ntohs(~s & 0xffff)
+
+def checksum(data, offset=0, length=None):
+    """
+    Return the internet checksum of data, or of length bytes of it
+    from offset.
+
+    data can be a str, bytearray, buffer or memoryview.
+    It isn't copied.
+    """
+    return ~_fold(_sum(data, offset, length)) & 0xffff
+
+
+def checksum_update(csum, old, new):
+    """
+    Return csum updated for a change of a part of the checksummed data
+    from old to new, without the rest of the data. (RFC 1624 eqn. 3)
+
+    old and new are either 16 bit integers or buffers of the same even
+    length which start at an even offset of the data.  For example,
+    to update an ipv4 header checksum for the change of a ttl:
+
+        csum = checksum_update(csum, ttl << 8 | proto,
+                               (ttl - 1) << 8 | proto)
+    """
+    if isinstance(old, (int, long)):
+        old_sum = old
+        new_sum = new
+    else:
+        assert len(old) == len(new) and not len(old) & 1
+        old_sum = _fold(_sum(old))
+        new_sum = _fold(_sum(new))
+    return ~_fold((~csum & 0xffff) + (~old_sum & 0xffff) + new_sum) & 0xffff
+
+
+def checksum_many(datas):
+    """
+    Return a list of the checksums of each of datas.
+
+    When numpy is available and there are many datas, they are summed
+    at once by numpy.
+    """
+    global numpy
+    if len(datas) >= NUMPY_MIN_BATCH and numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    if not numpy or len(datas) < NUMPY_MIN_BATCH:
+        return [checksum(data) for data in datas]
+
+    buf = bytearray()
+    starts = []
+    empty = []
+    for i, data in enumerate(datas):
+        if not len(data):
+            empty.append(i)
+            continue
+        starts.append(len(buf) >> 1)
+        buf += data
+        if len(data) & 1:
+            buf += '\x00'
+    if not buf:
+        return [0xffff] * len(datas)
+    words = numpy.frombuffer(buffer(buf), dtype='>u2')
+    sums = numpy.add.reduceat(words, starts, dtype=numpy.uint64)
+    for _i in range(3):
+        sums = (sums & 0xffff) + (sums >> 16)
+    result = (~sums & 0xffff).tolist()
+    for i in empty:
+        result.insert(i, 0xffff)
+    return result
 
 
 # avoid circular import
@@ -81,6 +195,8 @@ def checksum_ip(ipvx, length, payload):
     +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
     |                      zero                     |  Next Header  |
     +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+    payload can also be a list of buffers whose concatenation is the
+    payload.
     """
     if ipvx.version == 4:
         header = struct.pack(_IPV4_PSEUDO_HEADER_PACK_STR,
@@ -95,5 +211,8 @@ def checksum_ip(ipvx, length, payload):
     else:
         raise ValueError('Unknown IP version %d' % ipvx.version)
 
-    buf = header + payload
-    return checksum(buf)
+    if isinstance(payload, (list, tuple)):
+        s = _sum(header) + _sum_parts(payload)
+    else:
+        s = _sum(header) + _sum(payload)
+    return ~_fold(s) & 0xffff
@@ -0,0 +1,326 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fast path packet decoder
+
+PacketView decodes the headers which packet-in handlers usually look at
+(ethernet, vlan, arp, ipv4, ipv6, tcp, udp, icmp and icmpv6) without
+building protocol objects.  The headers are located once by their offsets
+in a memoryview of the packet data, which is never copied, and integer
+fields are kept as they are.  Addresses are converted to strings only when
+they are accessed.
+
+    view = packet_view.PacketView(msg.data)
+    if view.tcp_dst == 80:
+        print view.ipv4_src, view.tcp_src
+
+Fields of the headers which are absent or truncated are None.
+Use to_packet() to get the fully decoded Packet of the same data.
+"""
+
+import socket
+import struct
+
+from ryu.lib import addrconv
+from ryu.ofproto import ether
+from ryu.ofproto import inet
+from . import packet
+
+
+_ETH = struct.Struct('!6s6sH')
+_VLAN = struct.Struct('!HH')
+_ARP = struct.Struct('!HHBBH')
+_IPV4 = struct.Struct('!BBHHHBB')
+_IPV6 = struct.Struct('!IHBB')
+_IPV6_EXT = struct.Struct('!BB')
+_IPV6_FRAG = struct.Struct('!BxH')
+_PORTS = struct.Struct('!HH')
+_TCP_FLAGS = struct.Struct('!B')
+_ICMP = struct.Struct('!BB')
+
+_VLAN_TYPES = (ether.ETH_TYPE_8021Q, ether.ETH_TYPE_8021AD)
+_IPV6_EXT_HDRS = (inet.IPPROTO_HOPOPTS, inet.IPPROTO_ROUTING,
+                  inet.IPPROTO_DSTOPTS)
+
+_IPV4_OFFSET_MASK = 0x1fff
+_IPV6_OFFSET_MASK = 0xfff8
+
+_ETH_LEN = _ETH.size
+_ARP_LEN = _ARP.size + 20     # ethernet/ipv4 addresses
+_IPV4_LEN = 20
+_IPV6_LEN = 40
+_TCP_LEN = 20
+_UDP_LEN = 8
+_ICMP_LEN = 4
+
+
+def _mac(buf, offset):
+    return addrconv.mac.bin_to_text(buf[offset:offset + 6])
+
+
+class PacketView(object):
+    """
+    Headers of a packet, decoded from offsets.
+
+    ================ =====================================================
+    Attribute        Description
+    ================ =====================================================
+    data             memoryview of the packet
+    eth_type         Ethertype after vlan tags
+    vlan_vids        VLAN IDs of the vlan tags, the outermost first
+    l3_offset        Offset of the arp, ipv4 or ipv6 header
+    arp_op           ARP opcode
+    ip_proto         IP protocol (ipv6 next header after extensions)
+    ip_ttl           IPv4 TTL or IPv6 hop limit
+    ip_fragment      True if the packet is a non-first ip fragment
+    l4_offset        Offset of the tcp, udp, icmp or icmpv6 header
+    src_port         TCP or UDP source port
+    dst_port         TCP or UDP destination port
+    tcp_flags        TCP flags (lower 8 bits)
+    icmp_type        ICMP or ICMPv6 type
+    icmp_code        ICMP or ICMPv6 code
+    ================ =====================================================
+
+    Addresses are properties: eth_src, eth_dst, arp_sha, arp_spa, arp_tha,
+    arp_tpa, ipv4_src, ipv4_dst, ipv6_src and ipv6_dst.  eth_src_bin and
+    eth_dst_bin are the 6 bytes of the mac addresses.
+    """
+
+    __slots__ = ('data', 'eth_type', 'vlan_vids', 'l3_offset', 'arp_op',
+                 'ip_proto', 'ip_ttl', 'ip_fragment', 'l4_offset',
+                 'src_port', 'dst_port', 'tcp_flags', 'icmp_type',
+                 'icmp_code')
+
+    def __init__(self, data):
+        if not isinstance(data, memoryview):
+            data = memoryview(data)
+        self.data = data
+        self.eth_type = None
+        self.vlan_vids = ()
+        self.l3_offset = None
+        self.arp_op = None
+        self.ip_proto = None
+        self.ip_ttl = None
+        self.ip_fragment = False
+        self.l4_offset = None
+        self.src_port = None
+        self.dst_port = None
+        self.tcp_flags = None
+        self.icmp_type = None
+        self.icmp_code = None
+        self._decode(data, len(data))
+
+    def _decode(self, buf, length):
+        if length < _ETH_LEN:
+            return
+        offset = _ETH_LEN
+        eth_type = _ETH.unpack_from(buf)[2]
+        vids = []
+        while eth_type in _VLAN_TYPES and offset + _VLAN.size <= length:
+            tci, eth_type = _VLAN.unpack_from(buf, offset)
+            vids.append(tci & 0xfff)
+            offset += _VLAN.size
+        if vids:
+            self.vlan_vids = tuple(vids)
+        self.eth_type = eth_type
+        self.l3_offset = offset
+
+        if eth_type == ether.ETH_TYPE_IP:
+            if offset + _IPV4_LEN > length:
+                return
+            (ver_ihl, _tos, _total_len, _ident, flags_off, ttl,
+             proto) = _IPV4.unpack_from(buf, offset)
+            self.ip_proto = proto
+            self.ip_ttl = ttl
+            if flags_off & _IPV4_OFFSET_MASK:
+                self.ip_fragment = True
+                return
+            offset += (ver_ihl & 0xf) * 4
+        elif eth_type == ether.ETH_TYPE_IPV6:
+            if offset + _IPV6_LEN > length:
+                return
+            _flow, _payload_len, nxt, hlim = _IPV6.unpack_from(buf, offset)
+            self.ip_ttl = hlim
+            offset += _IPV6_LEN
+            while True:
+                if nxt in _IPV6_EXT_HDRS:
+                    if offset + _IPV6_EXT.size > length:
+                        self.ip_proto = nxt
+                        return
+                    nxt, ext_len = _IPV6_EXT.unpack_from(buf, offset)
+                    offset += (ext_len + 1) * 8
+                elif nxt == inet.IPPROTO_FRAGMENT:
+                    if offset + _IPV6_FRAG.size > length:
+                        self.ip_proto = nxt
+                        return
+                    nxt, frag_off = _IPV6_FRAG.unpack_from(buf, offset)
+                    offset += 8
+                    if frag_off & _IPV6_OFFSET_MASK:
+                        self.ip_proto = nxt
+                        self.ip_fragment = True
+                        return
+                else:
+                    break
+            self.ip_proto = nxt
+        elif eth_type == ether.ETH_TYPE_ARP:
+            if offset + _ARP_LEN <= length:
+                self.arp_op = _ARP.unpack_from(buf, offset)[4]
+            return
+        else:
+            return
+
+        proto = self.ip_proto
+        if proto == inet.IPPROTO_TCP:
+            if offset + _TCP_LEN > length:
+                return
+            self.src_port, self.dst_port = _PORTS.unpack_from(buf, offset)
+            self.tcp_flags = _TCP_FLAGS.unpack_from(buf, offset + 13)[0]
+        elif proto == inet.IPPROTO_UDP:
+            if offset + _UDP_LEN > length:
+                return
+            self.src_port, self.dst_port = _PORTS.unpack_from(buf, offset)
+        elif proto in (inet.IPPROTO_ICMP, inet.IPPROTO_ICMPV6):
+            if offset + _ICMP_LEN > length:
+                return
+            self.icmp_type, self.icmp_code = _ICMP.unpack_from(buf, offset)
+        else:
+            return
+        self.l4_offset = offset
+
+    def _bytes(self, offset, size):
+        return self.data[offset:offset + size].tobytes()
+
+    @property
+    def eth_dst(self):
+        if self.eth_type is None:
+            return None
+        return _mac(self.data, 0)
+
+    @property
+    def eth_src(self):
+        if self.eth_type is None:
+            return None
+        return _mac(self.data, 6)
+
+    @property
+    def eth_dst_bin(self):
+        if self.eth_type is None:
+            return None
+        return self._bytes(0, 6)
+
+    @property
+    def eth_src_bin(self):
+        if self.eth_type is None:
+            return None
+        return self._bytes(6, 6)
+
+    def _arp_mac(self, offset):
+        if self.arp_op is None:
+            return None
+        return _mac(self.data, self.l3_offset + offset)
+
+    def _arp_ip(self, offset):
+        if self.arp_op is None:
+            return None
+        return socket.inet_ntoa(self._bytes(self.l3_offset + offset, 4))
+
+    @property
+    def arp_sha(self):
+        return self._arp_mac(8)
+
+    @property
+    def arp_spa(self):
+        return self._arp_ip(14)
+
+    @property
+    def arp_tha(self):
+        return self._arp_mac(18)
+
+    @property
+    def arp_tpa(self):
+        return self._arp_ip(24)
+
+    def _ipv4(self, offset):
+        if self.eth_type != ether.ETH_TYPE_IP or self.ip_proto is None:
+            return None
+        return socket.inet_ntoa(self._bytes(self.l3_offset + offset, 4))
+
+    @property
+    def ipv4_src(self):
+        return self._ipv4(12)
+
+    @property
+    def ipv4_dst(self):
+        return self._ipv4(16)
+
+    def _ipv6(self, offset):
+        if self.eth_type != ether.ETH_TYPE_IPV6 or self.ip_ttl is None:
+            return None
+        return socket.inet_ntop(socket.AF_INET6,
+                                self._bytes(self.l3_offset + offset, 16))
+
+    @property
+    def ipv6_src(self):
+        return self._ipv6(8)
+
+    @property
+    def ipv6_dst(self):
+        return self._ipv6(24)
+
+    @property
+    def tcp_src(self):
+        if self.ip_proto != inet.IPPROTO_TCP:
+            return None
+        return self.src_port
+
+    @property
+    def tcp_dst(self):
+        if self.ip_proto != inet.IPPROTO_TCP:
+            return None
+        return self.dst_port
+
+    @property
+    def udp_src(self):
+        if self.ip_proto != inet.IPPROTO_UDP:
+            return None
+        return self.src_port
+
+    @property
+    def udp_dst(self):
+        if self.ip_proto != inet.IPPROTO_UDP:
+            return None
+        return self.dst_port
+
+    @property
+    def payload_offset(self):
+        """
+        Offset of the payload of the innermost decoded header.
+        """
+        if self.l4_offset is not None:
+            proto = self.ip_proto
+            if proto == inet.IPPROTO_TCP:
+                return (self.l4_offset +
+                        (ord(self.data[self.l4_offset + 12]) >> 4) * 4)
+            if proto == inet.IPPROTO_UDP:
+                return self.l4_offset + _UDP_LEN
+            return self.l4_offset + _ICMP_LEN
+        return self.l3_offset
+
+    def to_packet(self):
+        """
+        Decode the data with the full parser and return the Packet.
+        """
+        return packet.Packet(self.data.tobytes())
@@ -106,6 +106,6 @@ class tcp(packet_base.PacketBase):
         if self.csum == 0:
             total_length = len(h) + len(payload)
             self.csum = packet_utils.checksum_ip(prev, total_length,
-                                                 h + payload)
+                                                 (h, payload))
             struct.pack_into('!H', h, 16, self.csum)
         return str(h)
@@ -62,7 +62,7 @@ class udp(packet_base.PacketBase):
                         self.total_length, self.csum)
         if self.csum == 0:
             self.csum = packet_utils.checksum_ip(
-                prev, self.total_length, h + payload)
+                prev, self.total_length, (h, payload))
             h = struct.pack(udp._PACK_STR, self.src_port, self.dst_port,
                             self.total_length, self.csum)
         return h
@@ -15,13 +15,13 @@
 
 
 import logging
+import struct
 
 from ryu.base import app_manager
 from ryu.controller import event
 from ryu.controller import handler
 from ryu.controller import ofp_event
 from ryu.controller.handler import set_ev_cls
-from ryu.exception import RyuException
 from ryu.exception import OFPUnknownVersion
 from ryu.lib import hub
 from ryu.lib.dpid import dpid_to_str
@@ -37,6 +37,18 @@ STP_EV_DISPATCHER = "stplib"
 
 MAX_PORT_NO = 0xfff
 
+# fields of ConfigurationBPDUs in the wire order, and whether they are
+# changed for each config BPDU sent from a port.
+_CONFIG_BPDU_FIELDS = [('flags', '!B', True),
+                       ('root_id', '!Q', True),
+                       ('root_path_cost', '!I', True),
+                       ('bridge_id', '!Q', False),
+                       ('port_id', '!H', False),
+                       ('message_age', '!H', True),
+                       ('max_age', '!H', True),
+                       ('hello_time', '!H', True),
+                       ('forward_delay', '!H', True)]
+
 # Result of compared config BPDU priority.
 SUPERIOR = -1
 REPEATED = 0
@@ -141,6 +153,8 @@ class EventPortStateChange(event.EventBase):
 
 # Event for receive packet in message except BPDU packet.
 class EventPacketIn(event.EventBase):
+    EVENT_PRIORITY = event.EVENT_PRIORITY_LOW
+
     def __init__(self, msg):
         super(EventPacketIn, self).__init__()
         self.msg = msg
@@ -376,6 +390,7 @@ class Bridge(object):
         self.root_times = self.bridge_times
         # Ports
         self.ports = {}
+        self.timer_worker = PortTimerWorker(logger, self.dpid_str)
         self.ports_conf = config.get('ports', {})
         for ofport in dp.ports.values():
             self.port_add(ofport)
@@ -387,6 +402,7 @@ class Bridge(object):
     def delete(self):
         for port in self.ports.values():
             port.delete()
+        self.timer_worker.stop()
 
     def port_add(self, ofport):
         if ofport.port_no <= MAX_PORT_NO:
@@ -397,7 +413,7 @@ class Bridge(object):
                                               self.topology_change_notify,
                                               self.bridge_id,
                                               self.bridge_times,
-                                              ofport)
+                                              ofport, self.timer_worker)
 
     def port_delete(self, port_no):
         self.link_down(port_no)
@@ -651,7 +667,8 @@ class Port(object):
                   ofproto_v1_0.OFPPF_10GB_FD: bpdu.PORT_PATH_COST_10GB}
 
     def __init__(self, dp, logger, config, send_ev_func, timeout_func,
-                 topology_change_func, bridge_id, bridge_times, ofport):
+                 topology_change_func, bridge_id, bridge_times, ofport,
+                 timer_worker):
         super(Port, self).__init__()
         self.dp = dp
         self.logger = logger
@@ -685,17 +702,21 @@ class Port(object):
         # Receive BPDU data
         self.designated_priority = None
         self.designated_times = None
-        # BPDU handling threads
-        self.send_bpdu_thread = PortThread(self._transmit_config_bpdu)
-        self.wait_bpdu_thread = PortThread(self._wait_bpdu_timer)
-        self.send_tc_thread = PortThread(self._transmit_tc_bpdu)
-        self.send_tcn_thread = PortThread(self._transmit_tcn_bpdu)
+        # BPDU packets
+        self.config_bpdu_template = self._config_bpdu_template()
+        self.tcn_bpdu_data = None
+        # BPDU handling timers
+        self.send_bpdu_timer = PortTimer(self._transmit_config_bpdu,
+                                         timer_worker)
+        self.wait_bpdu_timer = PortTimer(self._wait_bpdu_timer, timer_worker)
+        self.send_tc_timer = PortTimer(self._transmit_tc_bpdu, timer_worker)
+        self.send_tcn_timer = PortTimer(self._transmit_tcn_bpdu,
+                                        timer_worker)
         self.send_tc_flg = None
         self.send_tcn_flg = None
-        self.wait_timer_event = None
-        # State machine thread
-        self.state_machine = PortThread(self._state_machine)
-        self.state_event = None
+        # State machine timer
+        self.state_machine = PortTimer(self._state_machine, timer_worker)
+        self.state_machine_started = False
 
         self.up(DESIGNATED_PORT,
                 Priority(bridge_id, 0, None, None),
@@ -707,17 +728,11 @@ class Port(object):
 
     def delete(self):
         self.state_machine.stop()
-        self.send_bpdu_thread.stop()
-        self.wait_bpdu_thread.stop()
-        self.send_tc_thread.stop()
-        self.send_tcn_thread.stop()
-        if self.state_event is not None:
-            self.state_event.set()
-            self.state_event = None
-        if self.wait_timer_event is not None:
-            self.wait_timer_event.set()
-            self.wait_timer_event = None
-        self.logger.debug('[port=%d] Stop port threads.',
+        self.send_bpdu_timer.stop()
+        self.wait_bpdu_timer.stop()
+        self.send_tc_timer.stop()
+        self.send_tcn_timer.stop()
+        self.logger.debug('[port=%d] Stop port timers.',
                           self.ofport.port_no, extra=self.dpid_str)
 
     def up(self, role, root_priority, root_times):
@@ -747,8 +762,24 @@ class Port(object):
 
     def _state_machine(self):
         """ Port state machine.
-             Change next status when timer is exceeded
-             or _change_status() method is called."""
+             Change next status when timer is exceeded. """
+        if not self.state_machine_started:
+            # the first run, in the state of the port by then
+            self.state_machine_started = True
+            if self.state is PORT_STATE_DISABLE:
+                self.ofctl.set_port_status(self.ofport, self.state)
+            self._start_state_machine()
+            return
+
+        new_state = self._get_next_state()
+        self._change_status(new_state)
+
+    def _start_state_machine(self):
+        """ Start the timer of the current status, which is restarted
+             whenever _change_status() method is called. """
+        if not self.state_machine_started:
+            return
+
         role_str = {ROOT_PORT: 'ROOT_PORT          ',
                     DESIGNATED_PORT: 'DESIGNATED_PORT    ',
                     NON_DESIGNATED_PORT: 'NON_DESIGNATED_PORT'}
@@ -758,32 +789,15 @@ class Port(object):
                      PORT_STATE_LEARN: 'LEARN',
                      PORT_STATE_FORWARD: 'FORWARD'}
 
-        if self.state is PORT_STATE_DISABLE:
-            self.ofctl.set_port_status(self.ofport, self.state)
+        self.logger.info('[port=%d] %s / %s', self.ofport.port_no,
+                         role_str[self.role], state_str[self.state],
+                         extra=self.dpid_str)
 
-        while True:
-            self.logger.info('[port=%d] %s / %s', self.ofport.port_no,
-                             role_str[self.role], state_str[self.state],
-                             extra=self.dpid_str)
-
-            self.state_event = hub.Event()
-            timer = self._get_timer()
-            if timer:
-                timeout = hub.Timeout(timer)
-                try:
-                    self.state_event.wait()
-                except hub.Timeout as t:
-                    if t is not timeout:
-                        err_msg = 'Internal error. Not my timeout.'
-                        raise RyuException(msg=err_msg)
-                    new_state = self._get_next_state()
-                    self._change_status(new_state, thread_switch=False)
-                finally:
-                    timeout.cancel()
-            else:
-                self.state_event.wait()
-
-            self.state_event = None
+        timer = self._get_timer()
+        if timer:
+            self.state_machine.start(timer)
+        else:
+            self.state_machine.stop()
 
     def _get_timer(self):
         timer = {PORT_STATE_DISABLE: None,
@@ -804,7 +818,7 @@ class Port(object):
                       PORT_STATE_FORWARD: None}
         return next_state[self.state]
 
-    def _change_status(self, new_state, thread_switch=True):
+    def _change_status(self, new_state):
         if new_state is not PORT_STATE_DISABLE:
             self.ofctl.set_port_status(self.ofport, new_state)
 
@@ -818,20 +832,15 @@ class Port(object):
                 or new_state is PORT_STATE_BLOCK):
             self.send_tc_flg = False
             self.send_tcn_flg = False
-            self.send_bpdu_thread.stop()
-            self.send_tc_thread.stop()
-            self.send_tcn_thread.stop()
+            self.send_bpdu_timer.stop()
+            self.send_tc_timer.stop()
+            self.send_tcn_timer.stop()
         elif new_state is PORT_STATE_LISTEN:
-            self.send_bpdu_thread.start()
+            self.send_bpdu_timer.start()
 
         self.state = new_state
         self.send_event(EventPortStateChange(self.dp, self))
-
-        if self.state_event is not None:
-            self.state_event.set()
-            self.state_event = None
-        if thread_switch:
-            hub.sleep(0)  # For thread switching.
+        self._start_state_machine()
 
     def _change_role(self, new_role):
         if self.role is new_role:
@@ -839,10 +848,10 @@ class Port(object):
         self.role = new_role
         if (new_role is ROOT_PORT
                 or new_role is NON_DESIGNATED_PORT):
-            self.wait_bpdu_thread.start()
+            self._start_wait_bpdu_timer()
         else:
             assert new_role is DESIGNATED_PORT
-            self.wait_bpdu_thread.stop()
+            self.wait_bpdu_timer.stop()
 
     def rcv_config_bpdu(self, bpdu_pkt):
         # Check received BPDU is superior to currently held BPDU.
@@ -898,63 +907,43 @@ class Port(object):
         return rcv_info, rcv_tc
 
     def _update_wait_bpdu_timer(self):
-        if self.wait_timer_event is not None:
-            self.wait_timer_event.set()
-            self.wait_timer_event = None
-        hub.sleep(0)  # For thread switching.
+        if self.wait_bpdu_timer.is_active():
+            self._start_wait_bpdu_timer()
 
-    def _wait_bpdu_timer(self):
-        time_exceed = False
+    def _start_wait_bpdu_timer(self):
+        message_age = (self.designated_times.message_age
+                       if self.designated_times else 0)
+        timer = self.port_times.max_age - message_age
+        self.wait_bpdu_timer.start(timer)
 
-        while True:
-            self.wait_timer_event = hub.Event()
-            message_age = (self.designated_times.message_age
-                           if self.designated_times else 0)
-            timer = self.port_times.max_age - message_age
-            timeout = hub.Timeout(timer)
-            try:
-                self.wait_timer_event.wait()
-            except hub.Timeout as t:
-                if t is not timeout:
-                    err_msg = 'Internal error. Not my timeout.'
-                    raise RyuException(msg=err_msg)
-                self.logger.info('[port=%d] Wait BPDU timer is exceeded.',
-                                 self.ofport.port_no, extra=self.dpid_str)
-                time_exceed = True
-            finally:
-                timeout.cancel()
-                self.wait_timer_event = None
-
-            if time_exceed:
-                break
-
-        if time_exceed:  # Bridge.recalculate_spanning_tree
-            hub.spawn(self.wait_bpdu_timeout)
+    def _wait_bpdu_timer(self):
+        self.logger.info('[port=%d] Wait BPDU timer is exceeded.',
+                         self.ofport.port_no, extra=self.dpid_str)
+        # Bridge.recalculate_spanning_tree
+        self.wait_bpdu_timeout()
 
     def _transmit_config_bpdu(self):
         """ Send config BPDU packet if port role is DESIGNATED_PORT. """
-        while True:
-            if self.role == DESIGNATED_PORT:
-                flags = 0b00000000
-                log_msg = '[port=%d] Send Config BPDU.'
-                if self.send_tc_flg:
-                    flags = 0b00000001
-                    log_msg = '[port=%d] Send TopologyChange BPDU.'
-                bpdu_data = self._generate_config_bpdu(flags)
-                self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
-                self.logger.debug(log_msg, self.ofport.port_no,
-                                  extra=self.dpid_str)
-            hub.sleep(self.port_times.hello_time)
+        if self.role == DESIGNATED_PORT:
+            flags = 0b00000000
+            log_msg = '[port=%d] Send Config BPDU.'
+            if self.send_tc_flg:
+                flags = 0b00000001
+                log_msg = '[port=%d] Send TopologyChange BPDU.'
+            bpdu_data = self._generate_config_bpdu(flags)
+            self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
+            self.logger.debug(log_msg, self.ofport.port_no,
+                              extra=self.dpid_str)
+        self.send_bpdu_timer.start(self.port_times.hello_time)
 
     def transmit_tc_bpdu(self):
-        self.send_tc_thread.start()
-
-    def _transmit_tc_bpdu(self):
         """ Set send_tc_flg to send Topology Change BPDU. """
         timer = self.port_times.max_age + self.port_times.forward_delay
 
         self.send_tc_flg = True
-        hub.sleep(timer)
+        self.send_tc_timer.start(timer)
+
+    def _transmit_tc_bpdu(self):
         self.send_tc_flg = False
 
     def transmit_ack_bpdu(self):
@@ -964,84 +953,135 @@ class Port(object):
         self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
 
     def transmit_tcn_bpdu(self):
-        self.send_tcn_thread.start()
+        self.send_tcn_flg = True
+        self.send_tcn_timer.start()
 
     def _transmit_tcn_bpdu(self):
         """ Send Topology Change Notification BPDU until receive Ack. """
-        self.send_tcn_flg = True
-        local_hello_time = bpdu.DEFAULT_HELLO_TIME
-        while self.send_tcn_flg:
+        if self.send_tcn_flg:
             bpdu_data = self._generate_tcn_bpdu()
             self.ofctl.send_packet_out(self.ofport.port_no, bpdu_data)
             self.logger.debug('[port=%d] Send TopologyChangeNotify BPDU.',
                               self.ofport.port_no, extra=self.dpid_str)
-            hub.sleep(local_hello_time)
+            self.send_tcn_timer.start(bpdu.DEFAULT_HELLO_TIME)
 
-    def _generate_config_bpdu(self, flags):
+    def _bpdu_packet(self, bpdu_):
         src_mac = self.ofport.hw_addr
         dst_mac = bpdu.BRIDGE_GROUP_ADDRESS
-        length = (bpdu.bpdu._PACK_LEN + bpdu.ConfigurationBPDUs.PACK_LEN
+        length = (bpdu.bpdu._PACK_LEN + bpdu_.PACK_LEN
                   + llc.llc._PACK_LEN + llc.ControlFormatU._PACK_LEN)
 
         e = ethernet.ethernet(dst_mac, src_mac, length)
         l = llc.llc(llc.SAP_BPDU, llc.SAP_BPDU, llc.ControlFormatU())
-        b = bpdu.ConfigurationBPDUs(
-            flags=flags,
-            root_priority=self.port_priority.root_id.priority,
-            root_mac_address=self.port_priority.root_id.mac_addr,
-            root_path_cost=self.port_priority.root_path_cost+self.path_cost,
-            bridge_priority=self.bridge_id.priority,
-            bridge_mac_address=self.bridge_id.mac_addr,
-            port_priority=self.port_id.priority,
-            port_number=self.ofport.port_no,
-            message_age=self.port_times.message_age+1,
-            max_age=self.port_times.max_age,
-            hello_time=self.port_times.hello_time,
-            forward_delay=self.port_times.forward_delay)
 
         pkt = packet.Packet()
         pkt.add_protocol(e)
         pkt.add_protocol(l)
-        pkt.add_protocol(b)
-        pkt.serialize()
+        pkt.add_protocol(bpdu_)
+        return pkt
 
-        return pkt.data
+    def _config_bpdu_template(self):
+        # the fields which don't change are set here, the others are
+        # patched by _generate_config_bpdu().
+        b = bpdu.ConfigurationBPDUs(
+            bridge_priority=self.bridge_id.priority,
+            bridge_mac_address=self.bridge_id.mac_addr,
+            port_priority=self.port_id.priority,
+            port_number=self.ofport.port_no)
+        template = packet.PacketTemplate(self._bpdu_packet(b))
+        offset = bpdu.bpdu._PACK_LEN
+        for name, fmt, changed in _CONFIG_BPDU_FIELDS:
+            if changed:
+                template.add_field(name, b, offset, fmt)
+            offset += struct.calcsize(fmt)
+        return template
+
+    def _generate_config_bpdu(self, flags):
+        root_id = self.port_priority.root_id
+        encode_timer = bpdu.ConfigurationBPDUs._encode_timer
+        return self.config_bpdu_template.build(
+            flags=flags,
+            root_id=bpdu.ConfigurationBPDUs.encode_bridge_id(
+                root_id.priority, 0, root_id.mac_addr),
+            root_path_cost=self.port_priority.root_path_cost+self.path_cost,
+            message_age=encode_timer(self.port_times.message_age+1),
+            max_age=encode_timer(self.port_times.max_age),
+            hello_time=encode_timer(self.port_times.hello_time),
+            forward_delay=encode_timer(self.port_times.forward_delay))
 
     def _generate_tcn_bpdu(self):
-        src_mac = self.ofport.hw_addr
-        dst_mac = bpdu.BRIDGE_GROUP_ADDRESS
-        length = (bpdu.bpdu._PACK_LEN
-                  + bpdu.TopologyChangeNotificationBPDUs.PACK_LEN
-                  + llc.llc._PACK_LEN + llc.ControlFormatU._PACK_LEN)
+        # a TCN BPDU of a port is always the same
+        if self.tcn_bpdu_data is None:
+            pkt = self._bpdu_packet(bpdu.TopologyChangeNotificationBPDUs())
+            pkt.serialize()
+            self.tcn_bpdu_data = pkt.data
+        return self.tcn_bpdu_data
+
+
+class PortTimer(object):
+    # a timer of the shared timer wheel of hub, instead of a thread per
+    # port and timer.  the thread of the wheel must never block, so an
+    # expired timer only queues its function to the worker of the
+    # bridge.  an expiry still queued when the timer is restarted or
+    # stopped is dropped.
+    def __init__(self, function, worker):
+        super(PortTimer, self).__init__()
+        self.function = function
+        self.worker = worker
+        self.timer = None
+        self.generation = 0
+
+    def start(self, seconds=0):
+        # (re)start the timer
+        self.generation += 1
+        if self.timer is None:
+            self.timer = hub.call_later(seconds, self._expired)
+        else:
+            self.timer.reschedule(seconds)
 
-        e = ethernet.ethernet(dst_mac, src_mac, length)
-        l = llc.llc(llc.SAP_BPDU, llc.SAP_BPDU, llc.ControlFormatU())
-        b = bpdu.TopologyChangeNotificationBPDUs()
+    def _expired(self):
+        self.worker.put(self, self.generation)
 
-        pkt = packet.Packet()
-        pkt.add_protocol(e)
-        pkt.add_protocol(l)
-        pkt.add_protocol(b)
-        pkt.serialize()
+    def stop(self):
+        self.generation += 1
+        if self.timer is not None:
+            self.timer.cancel()
 
-        return pkt.data
+    def is_active(self):
+        return self.timer is not None and self.timer.is_active()
 
 
-class PortThread(object):
-    def __init__(self, function):
-        super(PortThread, self).__init__()
-        self.function = function
-        self.thread = None
+class PortTimerWorker(object):
+    # runs the functions of the expired timers of all the ports of a
+    # bridge one after another.  they send to the datapath and
+    # send_event() to the applications, both of which can block.
+    def __init__(self, logger, dpid_str):
+        super(PortTimerWorker, self).__init__()
+        self.logger = logger
+        self.dpid_str = dpid_str
+        self.queue = hub.Queue()
+        self.thread = hub.spawn(self._run)
+
+    def put(self, timer, generation):
+        # the queue is unbounded, this never blocks the wheel
+        self.queue.put((timer, generation))
 
-    def start(self):
-        self.stop()
-        self.thread = hub.spawn(self.function)
+    def _run(self):
+        while True:
+            timer, generation = self.queue.get()
+            if generation != timer.generation:
+                continue
+            try:
+                timer.function()
+            except Exception:
+                self.logger.exception('Error in a port timer.',
+                                      extra=self.dpid_str)
 
     def stop(self):
-        if self.thread is not None:
-            hub.kill(self.thread)
-            hub.joinall([self.thread])
-            self.thread = None
+        # called from the event thread of the application, never from
+        # the worker itself
+        hub.kill(self.thread)
+        hub.joinall([self.thread])
 
 
 class BridgeId(object):
@@ -1087,10 +1127,7 @@ class OfCtl_v1_0(object):
         self.dp = dp
 
     def send_packet_out(self, out_port, data):
-        actions = [self.dp.ofproto_parser.OFPActionOutput(out_port, 0)]
-        self.dp.send_packet_out(buffer_id=self.dp.ofproto.OFP_NO_BUFFER,
-                                in_port=self.dp.ofproto.OFPP_CONTROLLER,
-                                actions=actions, data=data)
+        self.dp.packet_out_template(out_port).send(data)
 
     def set_port_status(self, port, config):
         ofproto_parser = self.dp.ofproto_parser
@@ -29,13 +29,30 @@ from . import ofproto_common
 LOG = logging.getLogger('ryu.ofproto.ofproto_parser')
 
 
-def header(buf):
-    assert len(buf) >= ofproto_common.OFP_HEADER_SIZE
+# struct caches compiled formats too, but it flushes the whole cache once
+# it holds 100 formats, which the parsers of all versions together exceed.
+_STRUCTS = {}
+
+
+def compiled_struct(fmt):
+    """Return a struct.Struct for fmt, compiled only once."""
+    s = _STRUCTS.get(fmt)
+    if s is None:
+        s = _STRUCTS[fmt] = struct.Struct(fmt)
+    return s
+
+
+_HEADER = compiled_struct(ofproto_common.OFP_HEADER_PACK_STR)
+
+
+def header(buf, offset=0):
+    assert len(buf) - offset >= ofproto_common.OFP_HEADER_SIZE
     #LOG.debug('len %d bufsize %d', len(buf), ofproto.OFP_HEADER_SIZE)
-    return struct.unpack_from(ofproto_common.OFP_HEADER_PACK_STR, buffer(buf))
+    return _HEADER.unpack_from(buffer(buf), offset)
 
 
 _MSG_PARSERS = {}
+_MSG_CLASSES = {}
 
 
 def register_msg_parser(version):
@@ -45,6 +62,19 @@ def register_msg_parser(version):
     return register
 
 
+def register_msg_cls(version, msg_cls):
+    _MSG_CLASSES[(version, msg_cls.cls_msg_type)] = msg_cls
+
+
+def msg_cls(version, msg_type):
+    """
+    Return the message class registered for version and msg_type
+    without parsing anything.
+    The parser may return an instance of a sub class of it.
+    """
+    return _MSG_CLASSES.get((version, msg_type))
+
+
 def msg(datapath, version, msg_type, msg_len, xid, buf):
     assert len(buf) >= msg_len
 
@@ -59,7 +89,8 @@ def msg(datapath, version, msg_type, msg_len, xid, buf):
             'Encounter an error during parsing OpenFlow packet from switch.'
             'This implies switch sending a malfold OpenFlow packet.'
             'version 0x%02x msg_type %d msg_len %d xid %d buf %s',
-            version, msg_type, msg_len, xid, utils.bytearray_to_hex(buf))
+            version, msg_type, msg_len, xid,
+            utils.bytearray_to_hex(bytearray(buf)))
         return None
 
 
@@ -137,6 +168,12 @@ class MsgBase(StringifyMixin):
     ========= ==============================
     """
 
+    # attributes which parser() may leave undecoded.  they are decoded
+    # by _decode_lazy_attrs() when any of them is accessed first.  a
+    # decoding error is logged and raised as OFPMalformedMessage, as the
+    # message has already been delivered.
+    _LAZY_ATTRS = ()
+
     @create_list_of_base_attributes
     def __init__(self, datapath):
         super(MsgBase, self).__init__()
@@ -162,6 +199,35 @@ class MsgBase(StringifyMixin):
     def set_buf(self, buf):
         self.buf = buffer(buf)
 
+    def _defer_lazy_attrs(self):
+        for attr in self._LAZY_ATTRS:
+            self.__dict__.pop(attr, None)
+
+    def _decode_lazy_attrs(self):
+        pass
+
+    def __getattr__(self, name):
+        # called only when the normal attribute lookup fails
+        if name in self._LAZY_ATTRS:
+            try:
+                self._decode_lazy_attrs()
+            except Exception:
+                LOG.exception(
+                    'Encounter an error during decoding %s of OpenFlow '
+                    'packet from switch.  version 0x%02x msg_type %d '
+                    'msg_len %d xid %d buf %s', name, self.version,
+                    self.msg_type, self.msg_len, self.xid,
+                    utils.bytearray_to_hex(bytearray(self.buf)))
+                raise exception.OFPMalformedMessage()
+            if name in self.__dict__:
+                return self.__dict__[name]
+        raise AttributeError(name)
+
+    def stringify_attrs(self):
+        for attr in self._LAZY_ATTRS:
+            getattr(self, attr)
+        return super(MsgBase, self).stringify_attrs()
+
     def __str__(self):
         buf = 'version: 0x%x msg_type 0x%x xid 0x%x ' % (self.version,
                                                          self.msg_type,
@@ -191,9 +257,8 @@ class MsgBase(StringifyMixin):
         if self.xid is None:
             self.xid = 0
 
-        struct.pack_into(self.datapath.ofproto.OFP_HEADER_PACK_STR,
-                         self.buf, 0,
-                         self.version, self.msg_type, self.msg_len, self.xid)
+        compiled_struct(self.datapath.ofproto.OFP_HEADER_PACK_STR).pack_into(
+            self.buf, 0, self.version, self.msg_type, self.msg_len, self.xid)
 
     def _serialize_body(self):
         pass
@@ -204,19 +269,26 @@ class MsgBase(StringifyMixin):
         self._serialize_header()
 
 
+# pack args into buf at offset, growing buf as much as this call needs.
+# most messages aren't serialized into a buffer allocated to its final
+# length up front: the serializers append their variable parts, e.g.
+# matches, actions and packet data, to the end of the buffer.
 def msg_pack_into(fmt, buf, offset, *args):
-    if len(buf) < offset:
-        buf += bytearray(offset - len(buf))
+    struct_pack_into(compiled_struct(fmt), buf, offset, *args)
+
 
+def struct_pack_into(s, buf, offset, *args):
+    """msg_pack_into() with a struct.Struct s instead of a format."""
     if len(buf) == offset:
-        buf += struct.pack(fmt, *args)
+        buf += s.pack(*args)
         return
 
-    needed_len = offset + struct.calcsize(fmt)
+    # pad buf up to the end of this field in one step
+    needed_len = offset + s.size
     if len(buf) < needed_len:
         buf += bytearray(needed_len - len(buf))
 
-    struct.pack_into(fmt, buf, offset, *args)
+    s.pack_into(buf, offset, *args)
 
 
 def namedtuple(typename, fields, **kwargs):
@@ -44,6 +44,7 @@ def _register_parser(cls):
     assert cls.cls_msg_type is not None
     assert cls.cls_msg_type not in _MSG_PARSERS
     _MSG_PARSERS[cls.cls_msg_type] = cls.parser
+    ofproto_parser.register_msg_cls(ofproto_v1_0.OFP_VERSION, cls)
     return cls
 
 
@@ -42,6 +42,7 @@ def _register_parser(cls):
     assert cls.cls_msg_type is not None
     assert cls.cls_msg_type not in _MSG_PARSERS
     _MSG_PARSERS[cls.cls_msg_type] = cls.parser
+    ofproto_parser.register_msg_cls(ofproto_v1_2.OFP_VERSION, cls)
     return cls
 
 
@@ -3293,6 +3294,8 @@ class OFPMatch(StringifyMixin):
         self.fields = []
         self.type = ofproto_v1_2.OFPMT_OXM
         self.length = length
+        self._fields2_dict = None
+        self._fields2_dict_src = None
 
         if not _ordered_fields is None:
             assert not kwargs
@@ -3301,9 +3304,7 @@ class OFPMatch(StringifyMixin):
             # eg.
             #   OFPMatch(eth_src=('ff:ff:ff:00:00:00'), eth_type=0x800,
             #            ipv4_src='10.0.0.1')
-            kwargs = dict(ofproto_v1_2.oxm_normalize_user(k, v) for
-                          (k, v) in kwargs.iteritems())
-            fields = [ofproto_v1_2.oxm_from_user(k, v) for (k, v)
+            fields = [ofproto_v1_2.oxm_from_user_normalized(k, v) for (k, v)
                       in kwargs.iteritems()]
             # assumption: sorting by OXM type values makes fields
             # meet ordering requirements (eg. eth_type before ipv4_src)
@@ -3311,17 +3312,25 @@ class OFPMatch(StringifyMixin):
             self._fields2 = [ofproto_v1_2.oxm_to_user(n, v, m) for (n, v, m)
                              in fields]
 
+    def _get_fields2_dict(self):
+        # _fields2 is always replaced as a whole, never modified in place.
+        # so the dict is valid as long as it was built from the same list.
+        if self._fields2_dict_src is not self._fields2:
+            self._fields2_dict = dict(self._fields2)
+            self._fields2_dict_src = self._fields2
+        return self._fields2_dict
+
     def __getitem__(self, key):
-        return dict(self._fields2)[key]
+        return self._get_fields2_dict()[key]
 
     def __contains__(self, key):
-        return key in dict(self._fields2)
+        return key in self._get_fields2_dict()
 
     def iteritems(self):
-        return dict(self._fields2).iteritems()
+        return self._get_fields2_dict().iteritems()
 
     def get(self, key, default=None):
-        return dict(self._fields2).get(key, default)
+        return self._get_fields2_dict().get(key, default)
 
     def stringify_attrs(self):
         yield "oxm_fields", dict(self._fields2)
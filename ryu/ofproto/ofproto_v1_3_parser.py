@@ -19,6 +19,7 @@ import itertools
 
 from ryu.lib import addrconv
 from ryu.lib import mac
+from ryu import exception
 from ryu import utils
 from ofproto_parser import StringifyMixin, MsgBase, msg_pack_into, msg_str_attr
 from . import ofproto_parser
@@ -43,6 +44,7 @@ def _register_parser(cls):
     assert cls.cls_msg_type is not None
     assert cls.cls_msg_type not in _MSG_PARSERS
     _MSG_PARSERS[cls.cls_msg_type] = cls.parser
+    ofproto_parser.register_msg_cls(ofproto_v1_3.OFP_VERSION, cls)
     return cls
 
 
@@ -733,6 +735,8 @@ class OFPMatch(StringifyMixin):
         self.fields = []
         self.type = ofproto_v1_3.OFPMT_OXM
         self.length = length
+        self._fields2_dict = None
+        self._fields2_dict_src = None
 
         if not _ordered_fields is None:
             assert not kwargs
@@ -741,9 +745,7 @@ class OFPMatch(StringifyMixin):
             # eg.
             #   OFPMatch(eth_src=('ff:ff:ff:00:00:00'), eth_type=0x800,
             #            ipv4_src='10.0.0.1')
-            kwargs = dict(ofproto_v1_3.oxm_normalize_user(k, v) for
-                          (k, v) in kwargs.iteritems())
-            fields = [ofproto_v1_3.oxm_from_user(k, v) for (k, v)
+            fields = [ofproto_v1_3.oxm_from_user_normalized(k, v) for (k, v)
                       in kwargs.iteritems()]
             # assumption: sorting by OXM type values makes fields
             # meet ordering requirements (eg. eth_type before ipv4_src)
@@ -751,17 +753,25 @@ class OFPMatch(StringifyMixin):
             self._fields2 = [ofproto_v1_3.oxm_to_user(n, v, m) for (n, v, m)
                              in fields]
 
+    def _get_fields2_dict(self):
+        # _fields2 is always replaced as a whole, never modified in place.
+        # so the dict is valid as long as it was built from the same list.
+        if self._fields2_dict_src is not self._fields2:
+            self._fields2_dict = dict(self._fields2)
+            self._fields2_dict_src = self._fields2
+        return self._fields2_dict
+
     def __getitem__(self, key):
-        return dict(self._fields2)[key]
+        return self._get_fields2_dict()[key]
 
     def __contains__(self, key):
-        return key in dict(self._fields2)
+        return key in self._get_fields2_dict()
 
     def iteritems(self):
-        return dict(self._fields2).iteritems()
+        return self._get_fields2_dict().iteritems()
 
     def get(self, key, default=None):
-        return dict(self._fields2).get(key, default)
+        return self._get_fields2_dict().get(key, default)
 
     def stringify_attrs(self):
         yield "oxm_fields", dict(self._fields2)
@@ -1178,6 +1188,32 @@ class OFPMatch(StringifyMixin):
         match._fields2 = fields
         return match
 
+    @classmethod
+    def parser_field(cls, buf, offset, key, default=None):
+        """
+        Returns the value of the given field of the flow match in a buffer
+        without decoding the other fields, or default if the match
+        doesn't have the field.
+        """
+        try:
+            n = ofproto_v1_3.oxm_from_user(key, None)[0]
+        except KeyError:
+            return default
+        if isinstance(n, tuple):
+            # experimenter field
+            return cls.parser(buf, offset).get(key, default)
+
+        type_, length = struct.unpack_from('!HH', buf, offset)
+        end = offset + length
+        offset += 4
+        while offset < end:
+            (header, ) = struct.unpack_from('!I', buf, offset)
+            if header >> 9 == n:
+                n, value, mask, _len = ofproto_v1_3.oxm_parse(buf, offset)
+                return ofproto_v1_3.oxm_to_user(n, value, mask)[1]
+            offset += 4 + (header & 0xff)
+        return default
+
     @staticmethod
     def parser_old(match, buf, offset, length):
         while length > 0:
@@ -2026,6 +2062,11 @@ class OFPPacketIn(MsgBase):
                               msg.table_id, msg.cookie, msg.match,
                               utils.hex_array(msg.data))
     """
+    _LAZY_ATTRS = ('match',)
+    _PACKET_IN = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_PACKET_IN_PACK_STR)
+    _MATCH_HEADER = ofproto_parser.compiled_struct('!HH')
+
     def __init__(self, datapath, buffer_id=None, total_len=None, reason=None,
                  table_id=None, cookie=None, match=None, data=None):
         super(OFPPacketIn, self).__init__(datapath)
@@ -2042,23 +2083,44 @@ class OFPPacketIn(MsgBase):
         msg = super(OFPPacketIn, cls).parser(datapath, version, msg_type,
                                              msg_len, xid, buf)
         (msg.buffer_id, msg.total_len, msg.reason,
-         msg.table_id, msg.cookie) = struct.unpack_from(
-            ofproto_v1_3.OFP_PACKET_IN_PACK_STR,
+         msg.table_id, msg.cookie) = cls._PACKET_IN.unpack_from(
             msg.buf, ofproto_v1_3.OFP_HEADER_SIZE)
 
-        msg.match = OFPMatch.parser(msg.buf, ofproto_v1_3.OFP_PACKET_IN_SIZE -
-                                    ofproto_v1_3.OFP_MATCH_SIZE)
-
-        match_len = utils.round_up(msg.match.length, 8)
-        msg.data = msg.buf[(ofproto_v1_3.OFP_PACKET_IN_SIZE -
-                            ofproto_v1_3.OFP_MATCH_SIZE + match_len + 2):]
+        # only the length of the match is needed to locate the data.
+        # the match itself is decoded on first access.
+        offset = ofproto_v1_3.OFP_PACKET_IN_SIZE - ofproto_v1_3.OFP_MATCH_SIZE
+        _type, match_len = cls._MATCH_HEADER.unpack_from(msg.buf, offset)
+        match_len = utils.round_up(match_len, 8)
+        if offset + match_len + 2 > len(msg.buf):
+            raise exception.OFPMalformedMessage()
+        msg.data = msg.buf[offset + match_len + 2:]
 
         if msg.total_len < len(msg.data):
             # discard padding for 8-byte alignment of OFP packet
             msg.data = msg.data[:msg.total_len]
 
+        msg._defer_lazy_attrs()
         return msg
 
+    def _decode_lazy_attrs(self):
+        self.match = OFPMatch.parser(self.buf,
+                                     ofproto_v1_3.OFP_PACKET_IN_SIZE -
+                                     ofproto_v1_3.OFP_MATCH_SIZE)
+
+    def get_match_field(self, key, default=None):
+        """
+        Returns match.get(key, default).
+        Unless the match has already been decoded, only the given field
+        is decoded.  Use this for a field like in_port on the packet-in
+        fast path.
+        """
+        if 'match' in self.__dict__:
+            return self.match.get(key, default)
+        return OFPMatch.parser_field(self.buf,
+                                     ofproto_v1_3.OFP_PACKET_IN_SIZE -
+                                     ofproto_v1_3.OFP_MATCH_SIZE,
+                                     key, default)
+
 
 @_register_parser
 @_set_msg_type(ofproto_v1_3.OFPT_FLOW_REMOVED)
@@ -2221,6 +2283,10 @@ class OFPPortStatus(MsgBase):
             self.logger.debug('OFPPortStatus received: reason=%s desc=%s',
                               reason, msg.desc)
     """
+    _LAZY_ATTRS = ('desc',)
+    _PORT_STATUS = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_PORT_STATUS_PACK_STR)
+
     def __init__(self, datapath, reason=None, desc=None):
         super(OFPPortStatus, self).__init__(datapath)
         self.reason = reason
@@ -2230,13 +2296,17 @@ class OFPPortStatus(MsgBase):
     def parser(cls, datapath, version, msg_type, msg_len, xid, buf):
         msg = super(OFPPortStatus, cls).parser(datapath, version, msg_type,
                                                msg_len, xid, buf)
-        msg.reason = struct.unpack_from(
-            ofproto_v1_3.OFP_PORT_STATUS_PACK_STR, msg.buf,
-            ofproto_v1_3.OFP_HEADER_SIZE)[0]
-        msg.desc = OFPPort.parser(msg.buf,
-                                  ofproto_v1_3.OFP_PORT_STATUS_DESC_OFFSET)
+        msg.reason = cls._PORT_STATUS.unpack_from(
+            msg.buf, ofproto_v1_3.OFP_HEADER_SIZE)[0]
+        if len(msg.buf) < ofproto_v1_3.OFP_PORT_STATUS_SIZE:
+            raise exception.OFPMalformedMessage()
+        msg._defer_lazy_attrs()
         return msg
 
+    def _decode_lazy_attrs(self):
+        self.desc = OFPPort.parser(self.buf,
+                                   ofproto_v1_3.OFP_PORT_STATUS_DESC_OFFSET)
+
 
 @_set_msg_type(ofproto_v1_3.OFPT_PACKET_OUT)
 class OFPPacketOut(MsgBase):
@@ -2266,6 +2336,9 @@ class OFPPacketOut(MsgBase):
                                           in_port, actions)
             datapath.send_msg(req)
     """
+    _PACKET_OUT = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_PACKET_OUT_PACK_STR)
+
     def __init__(self, datapath, buffer_id=None, in_port=None, actions=None,
                  data=None, actions_len=None):
         assert in_port is not None
@@ -2278,20 +2351,25 @@ class OFPPacketOut(MsgBase):
         self.data = data
 
     def _serialize_body(self):
-        self.actions_len = 0
-        offset = ofproto_v1_3.OFP_PACKET_OUT_SIZE
-        for a in self.actions:
-            a.serialize(self.buf, offset)
-            offset += a.len
-            self.actions_len += a.len
-
+        # the lengths of the actions are known up front, so the buffer
+        # is allocated to its final length at once.
+        self.actions_len = sum(a.len for a in self.actions)
+        offset = ofproto_v1_3.OFP_PACKET_OUT_SIZE + self.actions_len
+        size = offset
         if self.data is not None:
             assert self.buffer_id == 0xffffffff
-            self.buf += self.data
+            size += len(self.data)
+        self.buf += bytearray(size - len(self.buf))
 
-        msg_pack_into(ofproto_v1_3.OFP_PACKET_OUT_PACK_STR,
-                      self.buf, ofproto_v1_3.OFP_HEADER_SIZE,
-                      self.buffer_id, self.in_port, self.actions_len)
+        self._PACKET_OUT.pack_into(self.buf, ofproto_v1_3.OFP_HEADER_SIZE,
+                                   self.buffer_id, self.in_port,
+                                   self.actions_len)
+        action_offset = ofproto_v1_3.OFP_PACKET_OUT_SIZE
+        for a in self.actions:
+            a.serialize(self.buf, action_offset)
+            action_offset += a.len
+        if self.data is not None:
+            self.buf[offset:] = self.data
 
 
 @_set_msg_type(ofproto_v1_3.OFPT_FLOW_MOD)
@@ -2357,6 +2435,9 @@ class OFPFlowMod(MsgBase):
                                         match, inst)
             datapath.send_msg(req)
     """
+    _FLOW_MOD = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_FLOW_MOD_PACK_STR0)
+
     def __init__(self, datapath, cookie=0, cookie_mask=0, table_id=0,
                  command=ofproto_v1_3.OFPFC_ADD,
                  idle_timeout=0, hard_timeout=0, priority=0,
@@ -2382,12 +2463,12 @@ class OFPFlowMod(MsgBase):
         self.instructions = instructions
 
     def _serialize_body(self):
-        msg_pack_into(ofproto_v1_3.OFP_FLOW_MOD_PACK_STR0, self.buf,
-                      ofproto_v1_3.OFP_HEADER_SIZE,
-                      self.cookie, self.cookie_mask, self.table_id,
-                      self.command, self.idle_timeout, self.hard_timeout,
-                      self.priority, self.buffer_id, self.out_port,
-                      self.out_group, self.flags)
+        ofproto_parser.struct_pack_into(
+            self._FLOW_MOD, self.buf, ofproto_v1_3.OFP_HEADER_SIZE,
+            self.cookie, self.cookie_mask, self.table_id,
+            self.command, self.idle_timeout, self.hard_timeout,
+            self.priority, self.buffer_id, self.out_port,
+            self.out_group, self.flags)
 
         offset = (ofproto_v1_3.OFP_FLOW_MOD_SIZE -
                   ofproto_v1_3.OFP_MATCH_SIZE)
@@ -2504,6 +2585,9 @@ class OFPInstructionActions(StringifyMixin):
 
     ``type`` attribute corresponds to ``type_`` parameter of __init__.
     """
+    _INSTRUCTION_ACTIONS = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_INSTRUCTION_ACTIONS_PACK_STR)
+
     def __init__(self, type_, actions=None, len_=None):
         super(OFPInstructionActions, self).__init__()
         self.type = type_
@@ -2511,9 +2595,7 @@ class OFPInstructionActions(StringifyMixin):
 
     @classmethod
     def parser(cls, buf, offset):
-        (type_, len_) = struct.unpack_from(
-            ofproto_v1_3.OFP_INSTRUCTION_ACTIONS_PACK_STR,
-            buf, offset)
+        (type_, len_) = cls._INSTRUCTION_ACTIONS.unpack_from(buf, offset)
 
         offset += ofproto_v1_3.OFP_INSTRUCTION_ACTIONS_SIZE
         actions = []
@@ -2540,8 +2622,8 @@ class OFPInstructionActions(StringifyMixin):
         ofproto_parser.msg_pack_into("%dx" % pad_len, buf, action_offset)
         self.len += pad_len
 
-        msg_pack_into(ofproto_v1_3.OFP_INSTRUCTION_ACTIONS_PACK_STR,
-                      buf, offset, self.type, self.len)
+        ofproto_parser.struct_pack_into(self._INSTRUCTION_ACTIONS, buf,
+                                        offset, self.type, self.len)
 
 
 @OFPInstruction.register_instruction_type([ofproto_v1_3.OFPIT_METER])
@@ -2578,13 +2660,16 @@ class OFPInstructionMeter(StringifyMixin):
 
 
 class OFPActionHeader(StringifyMixin):
+    _ACTION_HEADER = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_ACTION_HEADER_PACK_STR)
+
     def __init__(self, type_, len_):
         self.type = type_
         self.len = len_
 
     def serialize(self, buf, offset):
-        msg_pack_into(ofproto_v1_3.OFP_ACTION_HEADER_PACK_STR,
-                      buf, offset, self.type, self.len)
+        ofproto_parser.struct_pack_into(self._ACTION_HEADER, buf, offset,
+                                        self.type, self.len)
 
 
 class OFPAction(OFPActionHeader):
@@ -2606,8 +2691,7 @@ class OFPAction(OFPActionHeader):
 
     @classmethod
     def parser(cls, buf, offset):
-        type_, len_ = struct.unpack_from(
-            ofproto_v1_3.OFP_ACTION_HEADER_PACK_STR, buf, offset)
+        type_, len_ = cls._ACTION_HEADER.unpack_from(buf, offset)
         cls_ = cls._ACTION_TYPES.get(type_)
         assert cls_ is not None
         return cls_.parser(buf, offset)
@@ -2628,6 +2712,9 @@ class OFPActionOutput(OFPAction):
     max_len          Max length to send to controller
     ================ ======================================================
     """
+    _ACTION_OUTPUT = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_ACTION_OUTPUT_PACK_STR)
+
     def __init__(self, port, max_len=ofproto_v1_3.OFPCML_MAX,
                  type_=None, len_=None):
         super(OFPActionOutput, self).__init__()
@@ -2636,13 +2723,14 @@ class OFPActionOutput(OFPAction):
 
     @classmethod
     def parser(cls, buf, offset):
-        type_, len_, port, max_len = struct.unpack_from(
-            ofproto_v1_3.OFP_ACTION_OUTPUT_PACK_STR, buf, offset)
+        type_, len_, port, max_len = cls._ACTION_OUTPUT.unpack_from(
+            buf, offset)
         return cls(port, max_len)
 
     def serialize(self, buf, offset):
-        msg_pack_into(ofproto_v1_3.OFP_ACTION_OUTPUT_PACK_STR, buf,
-                      offset, self.type, self.len, self.port, self.max_len)
+        ofproto_parser.struct_pack_into(self._ACTION_OUTPUT, buf, offset,
+                                        self.type, self.len, self.port,
+                                        self.max_len)
 
 
 @OFPAction.register_action_type(ofproto_v1_3.OFPAT_GROUP,
@@ -3433,6 +3521,7 @@ class OFPMultipartRequest(MsgBase):
 @_set_msg_type(ofproto_v1_3.OFPT_MULTIPART_REPLY)
 class OFPMultipartReply(MsgBase):
     _STATS_MSG_TYPES = {}
+    _LAZY_ATTRS = ('body',)
 
     @staticmethod
     def register_stats_type(body_single_struct=False):
@@ -3481,19 +3570,21 @@ class OFPMultipartReply(MsgBase):
             datapath, version, msg_type, msg_len, xid, buf)
         msg.type = type_
         msg.flags = flags
+        msg._defer_lazy_attrs()
+        return msg
 
+    def _decode_lazy_attrs(self):
         offset = ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE
         body = []
-        while offset < msg_len:
-            b = stats_type_cls.cls_stats_body_cls.parser(msg.buf, offset)
+        while offset < self.msg_len:
+            b = self.cls_stats_body_cls.parser(self.buf, offset)
             body.append(b)
             offset += b.length if hasattr(b, 'length') else b.len
 
-        if stats_type_cls.cls_body_single_struct:
-            msg.body = body[0]
+        if self.cls_body_single_struct:
+            self.body = body[0]
         else:
-            msg.body = body
-        return msg
+            self.body = body
 
 
 class OFPDescStats(ofproto_parser.namedtuple('OFPDescStats', (
@@ -3579,6 +3670,9 @@ class OFPDescStatsReply(OFPMultipartReply):
 
 
 class OFPFlowStats(StringifyMixin):
+    _FLOW_STATS_0 = ofproto_parser.compiled_struct(
+        ofproto_v1_3.OFP_FLOW_STATS_0_PACK_STR)
+
     def __init__(self, table_id=None, duration_sec=None, duration_nsec=None,
                  priority=None, idle_timeout=None, hard_timeout=None,
                  flags=None, cookie=None, packet_count=None,
@@ -3608,8 +3702,8 @@ class OFPFlowStats(StringifyMixin):
          flow_stats.priority, flow_stats.idle_timeout,
          flow_stats.hard_timeout, flow_stats.flags,
          flow_stats.cookie, flow_stats.packet_count,
-         flow_stats.byte_count) = struct.unpack_from(
-            ofproto_v1_3.OFP_FLOW_STATS_0_PACK_STR, buf, offset)
+         flow_stats.byte_count) = cls._FLOW_STATS_0.unpack_from(
+            buf, offset)
         offset += ofproto_v1_3.OFP_FLOW_STATS_0_SIZE
 
         flow_stats.match = OFPMatch.parser(buf, offset)
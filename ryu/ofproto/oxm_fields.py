@@ -24,10 +24,11 @@
 #   value and mask are on-wire bytes.
 #   mask is None if no mask.
 
+import binascii
 import itertools
 import struct
 import ofproto_common
-from ofproto_parser import msg_pack_into
+from ofproto_parser import compiled_struct, msg_pack_into
 
 from ryu.lib import addrconv
 
@@ -37,23 +38,34 @@ class TypeDescr(object):
 
 
 class IntDescr(TypeDescr):
+    _PACK_STRS = {
+        1: '!B',
+        2: '!H',
+        4: '!I',
+        8: '!Q',
+    }
+
     def __init__(self, size):
         self.size = size
+        self._max = (1 << (size * 8)) - 1
+        pack_str = self._PACK_STRS.get(size)
+        if pack_str is None:
+            self._struct = None
+        else:
+            self._struct = struct.Struct(pack_str)
 
     def to_user(self, bin):
-        i = 0
-        for x in xrange(self.size):
-            c = bin[:1]
-            i = i * 256 + ord(c)
-            bin = bin[1:]
-        return i
+        if self._struct is not None:
+            return self._struct.unpack_from(bin)[0]
+        return int(binascii.hexlify(bin[:self.size]), 16)
 
     def from_user(self, i):
-        bin = ''
-        for x in xrange(self.size):
-            bin = chr(i & 255) + bin
-            i /= 256
-        return bin
+        # keep only the lower bytes.  a negative value becomes
+        # its two's complement.
+        i &= self._max
+        if self._struct is not None:
+            return self._struct.pack(i)
+        return binascii.unhexlify('%0*x' % (self.size * 2, i))
 
 Int1 = IntDescr(1)
 Int2 = IntDescr(2)
@@ -145,6 +157,8 @@ def generate(modname):
     name_to_field = dict((f.name, f) for f in mod.oxm_types)
     num_to_field = dict((f.num, f) for f in mod.oxm_types)
     add_attr('oxm_from_user', functools.partial(from_user, name_to_field))
+    add_attr('oxm_from_user_normalized',
+             functools.partial(from_user_normalized, name_to_field))
     add_attr('oxm_to_user', functools.partial(to_user, num_to_field))
     add_attr('_oxm_field_desc', functools.partial(_field_desc, num_to_field))
     add_attr('oxm_normalize_user', functools.partial(normalize_user, mod))
@@ -202,21 +216,42 @@ def _field_desc(num_to_field, n):
     return num_to_field[n]
 
 
-def normalize_user(mod, k, uv):
-    (n, v, m) = mod.oxm_from_user(k, uv)
-    # apply mask
+def _and_bytes(x, y):
+    if len(x) != len(y) or not x:
+        return ''.join(chr(ord(a) & ord(b)) for (a, b)
+                       in itertools.izip(x, y))
+    return binascii.unhexlify('%0*x' % (len(x) * 2,
+                                        int(binascii.hexlify(x), 16) &
+                                        int(binascii.hexlify(y), 16)))
+
+
+def from_user_normalized(name_to_field, name, user_value):
+    """
+    from_user() with the mask applied to the value.
+    This is what normalize_user() followed by from_user() returns.
+    """
+    (n, v, m) = from_user(name_to_field, name, user_value)
     if not m is None:
-        v = ''.join(chr(ord(x) & ord(y)) for (x, y)
-            in itertools.izip(v, m))
+        v = _and_bytes(v, m)
+    return n, v, m
+
+
+def normalize_user(mod, k, uv):
+    (n, v, m) = mod.oxm_from_user_normalized(k, uv)
     (k2, uv2) = mod.oxm_to_user(n, v, m)
     assert k2 == k
     return (k2, uv2)
 
 
+_HDR = struct.Struct('!I')
+
+# (oxm_type, value length, has mask) -> (tlv header, pack_str)
+_SERIALIZE_HEADERS = {}
+
+
 def parse(mod, buf, offset):
-    hdr_pack_str = '!I'
-    (header, ) = struct.unpack_from(hdr_pack_str, buf, offset)
-    hdr_len = struct.calcsize(hdr_pack_str)
+    (header, ) = _HDR.unpack_from(buf, offset)
+    hdr_len = _HDR.size
     oxm_type = header >> 9  # class|field
     oxm_hasmask = mod.oxm_tlv_header_extract_hasmask(header)
     len = mod.oxm_tlv_header_extract_length(header)
@@ -237,32 +272,30 @@ def parse(mod, buf, offset):
         exp_hdr_len = 0
     value_offset = offset + hdr_len + exp_hdr_len
     value_len = len - exp_hdr_len
-    value_pack_str = '!%ds' % value_len
-    assert struct.calcsize(value_pack_str) == value_len
-    (value, ) = struct.unpack_from(value_pack_str, buf, value_offset)
+    value_struct = compiled_struct('!%ds' % value_len)
+    assert value_struct.size == value_len
+    (value, ) = value_struct.unpack_from(buf, value_offset)
     if oxm_hasmask:
-        (mask, ) = struct.unpack_from(value_pack_str, buf,
-                                      value_offset + value_len)
+        (mask, ) = value_struct.unpack_from(buf, value_offset + value_len)
     else:
         mask = None
     field_len = hdr_len + (header & 0xff)
     return num, value, mask, field_len
 
 
-def serialize(mod, n, value, mask, buf, offset):
+def _serialize_experimenter(mod, n, value, mask, buf, offset):
     exp_hdr = bytearray()
-    if isinstance(n, tuple):
-        (cls, exp_type) = n
-        desc = mod._oxm_field_desc(n)
-        assert issubclass(cls, _Experimenter)
-        assert isinstance(desc, cls)
-        assert cls is ONFExperimenter
-        onf_exp_hdr_pack_str = '!IH'  # experimenter_id, exp_type
-        msg_pack_into(onf_exp_hdr_pack_str, exp_hdr, 0,
-                      cls.experimenter_id, exp_type)
-        assert len(exp_hdr) == struct.calcsize(onf_exp_hdr_pack_str)
-        n = desc.oxm_type
-        assert (n >> 7) == OFPXMC_EXPERIMENTER
+    (cls, exp_type) = n
+    desc = mod._oxm_field_desc(n)
+    assert issubclass(cls, _Experimenter)
+    assert isinstance(desc, cls)
+    assert cls is ONFExperimenter
+    onf_exp_hdr_pack_str = '!IH'  # experimenter_id, exp_type
+    msg_pack_into(onf_exp_hdr_pack_str, exp_hdr, 0,
+                  cls.experimenter_id, exp_type)
+    assert len(exp_hdr) == struct.calcsize(onf_exp_hdr_pack_str)
+    n = desc.oxm_type
+    assert (n >> 7) == OFPXMC_EXPERIMENTER
     exp_hdr_len = len(exp_hdr)
     value_len = len(value)
     if mask:
@@ -279,6 +312,30 @@ def serialize(mod, n, value, mask, buf, offset):
     return struct.calcsize(pack_str)
 
 
+def serialize(mod, n, value, mask, buf, offset):
+    if isinstance(n, tuple):
+        return _serialize_experimenter(mod, n, value, mask, buf, offset)
+
+    value_len = len(value)
+    key = (n, value_len, bool(mask))
+    try:
+        header, pack_str = _SERIALIZE_HEADERS[key]
+    except KeyError:
+        if mask:
+            header = (n << 9) | (1 << 8) | (value_len * 2)
+            pack_str = "!I%ds%ds" % (value_len, value_len)
+        else:
+            header = (n << 9) | (0 << 8) | value_len
+            pack_str = "!I%ds" % (value_len,)
+        _SERIALIZE_HEADERS[key] = (header, pack_str)
+    if mask:
+        assert value_len == len(mask)
+        msg_pack_into(pack_str, buf, offset, header, value, mask)
+    else:
+        msg_pack_into(pack_str, buf, offset, header, value)
+    return compiled_struct(pack_str).size
+
+
 def to_jsondict(k, uv):
     if isinstance(uv, tuple):
         (value, mask) = uv
@@ -31,53 +31,44 @@ from ryu.services.protocols.vrrp import event as vrrp_event
 from ryu.services.protocols.vrrp import api as vrrp_api
 
 
-# TODO: improve Timer service and move it into framework
 class Timer(object):
+    # a timer of the shared timer wheel of hub.  the handler is called by
+    # the thread of the wheel, so it should not block for long.
     def __init__(self, handler_):
         assert callable(handler_)
 
         super(Timer, self).__init__()
         self._handler = handler_
-        self._event = hub.Event()
-        self._thread = None
+        self._timer = None
 
     def start(self, interval):
         """interval is in seconds"""
-        if self._thread:
+        if self._timer:
             self.cancel()
-        self._event.clear()
-        self._thread = hub.spawn(self._timer, interval)
+        self._timer = hub.call_later(interval, self._handler)
 
     def cancel(self):
-        if self._thread is None:
+        if self._timer is None:
             return
-        self._event.set()
-        hub.joinall([self._thread])
-        self._thread = None
+        self._timer.cancel()
+        self._timer = None
 
     def is_running(self):
-        return self._thread is not None
-
-    def _timer(self, interval):
-        # Avoid cancellation during execution of self._callable()
-        cancel = self._event.wait(interval)
-        if cancel:
-            return
-
-        self._handler()
+        return self._timer is not None
 
 
 class TimerEventSender(Timer):
     # timeout handler is called by timer thread context.
     # So in order to actual execution context to application's event thread,
-    # post the event to the application
+    # post the event to the application.  Posting waits while the event
+    # queue of the application is full, so it's done by a thread of its own.
     def __init__(self, app, ev_cls):
         super(TimerEventSender, self).__init__(self._timeout)
         self._app = app
         self._ev_cls = ev_cls
 
     def _timeout(self):
-        self._app.send_event(self._app.name, self._ev_cls())
+        hub.spawn(self._app.send_event, self._app.name, self._ev_cls())
 
 
 class VRRPParams(object):
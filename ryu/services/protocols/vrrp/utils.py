@@ -53,13 +53,7 @@ def get_dp(app, dpid):
 
 def dp_packet_out(dp, port_no, data):
     # OF 1.2
-    ofproto = dp.ofproto
-    ofproto_parser = dp.ofproto_parser
-    actions = [ofproto_parser.OFPActionOutput(port_no,
-                                              ofproto.OFPCML_NO_BUFFER)]
-    packet_out = ofproto_parser.OFPPacketOut(
-        dp, 0xffffffff, ofproto.OFPP_CONTROLLER, actions, data)
-    dp.send_msg(packet_out)
+    dp.packet_out_template(port_no).send(data)
 
 
 def dp_flow_mod(dp, table, command, priority, match, instructions,
@@ -0,0 +1,228 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.app import rest_topology
+from ryu.app.wsgi import WSGIApplication
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_0
+from ryu.topology import switches
+
+
+class _OFPPort(object):
+    def __init__(self, port_no, name='port'):
+        self.port_no = port_no
+        self.hw_addr = '00:00:00:00:00:%02x' % port_no
+        self.name = name
+        self.config = 0
+        self.state = 0
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_0
+
+    def __init__(self, dpid):
+        self.id = dpid
+
+
+def _switch(dpid, *port_nos):
+    switch = switches.Switch(_Datapath(dpid))
+    for port_no in port_nos:
+        switch.add_port(_OFPPort(port_no))
+    return switch
+
+
+def _port(dpid, port_no, name='port'):
+    return switches.Port(dpid, ofproto_v1_0, _OFPPort(port_no, name))
+
+
+def _link(src_dpid, src_port_no, dst_dpid, dst_port_no):
+    return switches.Link(_port(src_dpid, src_port_no),
+                         _port(dst_dpid, dst_port_no))
+
+
+class Test_TopologyState(unittest.TestCase):
+    """ Test case for ryu.app.rest_topology.TopologyState
+    """
+
+    def setUp(self):
+        self.state = rest_topology.TopologyState(log_size=4)
+
+    def test_changes(self):
+        state = self.state
+        state.switch_enter(_switch(1, 1, 2))
+        state.switch_enter(_switch(2, 1))
+        state.link_add(_link(1, 1, 2, 1))
+        eq_(3, state.version)
+
+        changes = state.changes(1)
+        eq_([2, 3], [change['version'] for change in changes])
+        eq_('add', changes[0]['event'])
+        eq_('0000000000000002', changes[0]['switch']['dpid'])
+        eq_('0000000000000001', changes[1]['link']['src']['dpid'])
+        eq_([3], [c['version'] for c in state.changes(0, kind='links')])
+        eq_([2], [c['version'] for c in state.changes(0, dpid=2)])
+        eq_([], state.changes(3))
+        eq_(None, state.changes(4))
+
+    def test_ports(self):
+        state = self.state
+        state.switch_enter(_switch(1, 1))
+        state.port_update(_port(1, 2))
+        # no change
+        state.port_update(_port(1, 2))
+        eq_(2, state.version)
+        state.port_update(_port(1, 2, name='eth2'))
+        state.port_update(_port(1, 1), deleted=True)
+        eq_(4, state.version)
+        change = state.changes(3)[0]
+        eq_('modify', change['event'])
+        eq_(['eth2'], [port['name'] for port in change['switch']['ports']])
+
+        # unknown switch
+        state.port_update(_port(2, 1))
+        eq_(4, state.version)
+
+    def test_log_size(self):
+        state = self.state
+        for dpid in range(1, 7):
+            state.switch_enter(_switch(dpid))
+        eq_(None, state.changes(1))
+        eq_([3, 4, 5, 6], [c['version'] for c in state.changes(2)])
+
+    def test_snapshot(self):
+        state = self.state
+        state.switch_enter(_switch(1, 1))
+        version, body = state.snapshot('switches')
+        eq_(1, version)
+        eq_(['0000000000000001'], [s['dpid'] for s in json.loads(body)])
+
+        # unchanged lists are cached
+        state.link_add(_link(1, 1, 2, 1))
+        ok_(body is state.snapshot('switches')[1])
+        eq_((2, '[]'), state.snapshot('links', 3))
+        eq_(2, state.snapshot('links', 1)[0])
+
+        state.switch_leave(_switch(1))
+        eq_((3, '[]'), state.snapshot('switches'))
+
+    def test_snapshot_cache(self):
+        state = self.state
+        state.switch_enter(_switch(1, 1))
+        state.snapshot('switches', 1)
+        state.snapshot('links', 1)
+        eq_(2, len(state._snapshots))
+        # unknown switches aren't cached
+        for dpid in range(2, 100):
+            state.snapshot('switches', dpid)
+        eq_(2, len(state._snapshots))
+        # nor departed ones
+        state.switch_leave(_switch(1))
+        eq_(0, len(state._snapshots))
+
+    def test_seed(self):
+        state = self.state
+        state.switch_enter(_switch(1, 1))
+        state.seed([_switch(1, 1, 2), _switch(2, 1)],
+                   [_link(1, 1, 2, 1), _link(2, 1, 1, 1)])
+        eq_(4, state.version)
+        eq_([2, 3, 4], [c['version'] for c in state.changes(1)])
+        # the switch which is known already is kept as it is
+        eq_([1], sorted(state.switches[1]))
+        state.seed([_switch(2, 1)], [_link(1, 1, 2, 1)])
+        eq_(4, state.version)
+
+    def test_wait(self):
+        state = self.state
+
+        def _change():
+            hub.sleep(0.1)
+            state.switch_enter(_switch(1))
+
+        thread = hub.spawn(_change)
+        state.wait(5)
+        eq_(1, state.version)
+        hub.joinall([thread])
+
+
+class Test_TopologyController(unittest.TestCase):
+    """ Test case for the REST API of ryu.app.rest_topology
+    """
+
+    def setUp(self):
+        self.wsgi = WSGIApplication()
+        self.app = rest_topology.TopologyAPI(wsgi=self.wsgi)
+        self.app.state.switch_enter(_switch(1, 1))
+        self.app.state.link_add(_link(1, 1, 2, 1))
+
+    def _get(self, path, query='', headers=None):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+                   'QUERY_STRING': query}
+        environ.update(headers or {})
+        result = {}
+
+        def start_response(status, headerlist):
+            result['status'] = status
+            result['headers'] = dict(headerlist)
+
+        body = ''.join(self.wsgi(environ, start_response))
+        return result['status'], result['headers'], body
+
+    def test_etag(self):
+        status, headers, body = self._get('/v1.0/topology/switches')
+        eq_('200 OK', status)
+        eq_('"1"', headers['ETag'])
+        eq_(1, len(json.loads(body)))
+
+        status, headers, _body = self._get(
+            '/v1.0/topology/switches',
+            headers={'HTTP_IF_NONE_MATCH': '"1"'})
+        eq_('304 Not Modified', status)
+        status, headers, _body = self._get(
+            '/v1.0/topology/links',
+            headers={'HTTP_IF_NONE_MATCH': '"1"'})
+        eq_('200 OK', status)
+        eq_('"2"', headers['ETag'])
+
+    def test_since(self):
+        status, _headers, body = self._get('/v1.0/topology/links',
+                                           'since=0')
+        eq_('200 OK', status)
+        body = json.loads(body)
+        eq_(2, body['version'])
+        eq_([2], [change['version'] for change in body['changes']])
+
+        status, _headers, body = self._get('/v1.0/topology/changes',
+                                           'since=1&wait=0')
+        eq_([2], [c['version'] for c in json.loads(body)['changes']])
+
+        status, _headers, _body = self._get('/v1.0/topology/changes',
+                                            'since=3')
+        eq_('410 Gone', status)
+        status, _headers, _body = self._get('/v1.0/topology/changes')
+        eq_('400 Bad Request', status)
+
+    def test_wait(self):
+        for wait in ('nan', 'inf', '-inf', '-1', 'x'):
+            status, _headers, _body = self._get('/v1.0/topology/changes',
+                                                'since=2&wait=' + wait)
+            eq_('400 Bad Request', status)
+        status, _headers, body = self._get('/v1.0/topology/changes',
+                                           'since=2&wait=0.01')
+        eq_('200 OK', status)
+        eq_([], json.loads(body)['changes'])
@@ -0,0 +1,130 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_, raises
+
+from ryu.lib import hub
+hub.patch()
+
+from ryu.base import app_manager
+from ryu.controller import event
+
+
+class _EventHigh(event.EventBase):
+    EVENT_PRIORITY = event.EVENT_PRIORITY_HIGH
+
+
+class _EventNormal(event.EventBase):
+    pass
+
+
+class _EventLow(event.EventBase):
+    EVENT_PRIORITY = event.EVENT_PRIORITY_LOW
+
+
+class _EventBarrier(event.EventBase):
+    EVENT_BARRIER = True
+
+
+class Test_EventQueue(unittest.TestCase):
+    """ Test case for ryu.base.app_manager.EventQueue
+    """
+
+    def _get_all(self, q):
+        evs = []
+        while not q.empty():
+            evs.append(q.get()[0])
+        return evs
+
+    def test_priority(self):
+        q = app_manager.EventQueue(8)
+        low = _EventLow()
+        normal1 = _EventNormal()
+        normal2 = _EventNormal()
+        high = _EventHigh()
+        for ev in (low, normal1, high, normal2):
+            q.put((ev, None))
+        eq_(4, q.qsize())
+        eq_([high, normal1, normal2, low], self._get_all(q))
+
+    def test_barrier(self):
+        q = app_manager.EventQueue(8)
+        low1 = _EventLow()
+        normal = _EventNormal()
+        barrier = _EventBarrier()
+        low2 = _EventLow()
+        high = _EventHigh()
+        for ev in (low1, normal, barrier, low2, high):
+            q.put((ev, None))
+        eq_([high, normal, low1, barrier, low2], self._get_all(q))
+
+    def test_drop_oldest(self):
+        q = app_manager.EventQueue(2, 'drop-oldest')
+        low1 = _EventLow()
+        low2 = _EventLow()
+        low3 = _EventLow()
+        for ev in (low1, low2, low3):
+            q.put((ev, None))
+        eq_([low2, low3], self._get_all(q))
+        eq_(1, q.stats['dropped'])
+
+    def test_drop_oldest_for_normal(self):
+        q = app_manager.EventQueue(2, 'drop-oldest')
+        low = _EventLow()
+        normal1 = _EventNormal()
+        normal2 = _EventNormal()
+        for ev in (low, normal1, normal2):
+            q.put((ev, None))
+        eq_([normal1, normal2], self._get_all(q))
+
+    def test_drop_newest(self):
+        q = app_manager.EventQueue(2, 'drop-newest')
+        low1 = _EventLow()
+        low2 = _EventLow()
+        low3 = _EventLow()
+        for ev in (low1, low2, low3):
+            q.put((ev, None))
+        eq_([low1, low2], self._get_all(q))
+        eq_(1, q.stats['dropped'])
+
+    def test_block(self):
+        q = app_manager.EventQueue(1, 'block')
+        low1 = _EventLow()
+        low2 = _EventLow()
+        q.put((low1, None))
+        t = hub.spawn(q.put, (low2, None))
+        hub.sleep(0.1)
+        eq_(1, q.qsize())
+        eq_(1, q.stats['stalls'])
+        eq_(low1, q.get()[0])
+        hub.joinall([t])
+        eq_(low2, q.get()[0])
+        eq_(0, q.stats['dropped'])
+
+    def test_get_wait(self):
+        q = app_manager.EventQueue(1)
+        ev = _EventNormal()
+
+        def _put():
+            hub.sleep(0.1)
+            q.put((ev, None))
+        hub.spawn(_put)
+        eq_(ev, q.get()[0])
+        ok_(q.empty())
+
+    @raises(ValueError)
+    def test_unknown_policy(self):
+        app_manager.EventQueue(1, 'coalesce')
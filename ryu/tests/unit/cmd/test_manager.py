@@ -19,9 +19,20 @@ import unittest
 import mock
 from nose.tools import eq_, raises
 
+from ryu.app.wsgi import WSGIApplication
+from ryu.base.app_manager import AppManager, RyuApp
+from ryu.cmd import manager
 from ryu.cmd.manager import main
 
 
+class _AllDatapathsApp(RyuApp):
+    _ALL_DATAPATHS = True
+
+
+class _RestApp(RyuApp):
+    _CONTEXTS = {'wsgi': WSGIApplication}
+
+
 class Test_Manager(unittest.TestCase):
     """Test ryu-manager command
     """
@@ -49,3 +60,19 @@ class Test_Manager(unittest.TestCase):
                                  'ryu.tests.unit.cmd.dummy_app'])
     def test_no_services(self):
         main()
+
+    def _check_workers(self, app_cls):
+        app_mgr = AppManager()
+        app_mgr.applications_cls['app'] = app_cls
+        manager._check_workers(app_mgr)
+
+    @raises(SystemExit)
+    def test_workers_refuse_all_datapaths(self):
+        self._check_workers(_AllDatapathsApp)
+
+    @raises(SystemExit)
+    def test_workers_refuse_rest(self):
+        self._check_workers(_RestApp)
+
+    def test_workers(self):
+        self._check_workers(RyuApp)
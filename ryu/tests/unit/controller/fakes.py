@@ -0,0 +1,72 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# fake datapaths and messages shared by the tests of ryu.controller
+
+# app_manager imports controller, which can't be imported first
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class FakeDatapath(object):
+    """
+    A connected datapath without a socket.  The sent buffers are kept in
+    sent.  xids and packet-out templates are the ones of Datapath.
+    """
+
+    def __init__(self, dpid=1, ofproto=ofproto_v1_3,
+                 ofproto_parser=ofproto_v1_3_parser):
+        super(FakeDatapath, self).__init__()
+        self.id = dpid
+        self.ofproto = ofproto
+        self.ofproto_parser = ofproto_parser
+        self.is_active = True
+        self.xid = 0
+        self.requests = {}
+        self.ports = {}
+        self.packet_out_templates = {}
+        self.sent = []
+
+    next_xid = controller.Datapath.next_xid.im_func
+    set_xid = controller.Datapath.set_xid.im_func
+    packet_out_template = controller.Datapath.packet_out_template.im_func
+
+    def send(self, buf):
+        self.sent.append(buf)
+
+
+class StandaloneDatapath(controller.Datapath):
+    """
+    A Datapath whose state changes aren't sent to the applications.
+    """
+
+    def set_state(self, state):
+        self.state = state
+
+
+class FakeReply(object):
+    """
+    A message received from a datapath, with the attributes which the
+    replies to requests are dispatched by.
+    """
+
+    def __init__(self, msg_type, xid, flags=0, datapath=None):
+        super(FakeReply, self).__init__()
+        self.msg_type = msg_type
+        self.xid = xid
+        self.flags = flags
+        self.datapath = datapath
@@ -0,0 +1,97 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+from nose.tools import eq_
+
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.tests.unit.controller.fakes import StandaloneDatapath
+
+
+class _Socket(object):
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def recv(self, bufsize):
+        return next(self.chunks, '')
+
+
+class _Request(object):
+    def __init__(self):
+        self.msgs = []
+
+    def _reply(self, msg):
+        self.msgs.append(msg)
+
+
+class TestStandaloneDatapath(unittest.TestCase):
+    """ Test case for ryu.controller.controller.Datapath
+    """
+
+    def _echo_reply(self, dp, xid, data):
+        msg = ofproto_v1_3_parser.OFPEchoReply(dp, data)
+        msg.xid = xid
+        msg.serialize()
+        return str(msg.buf)
+
+    def _recv(self, chunks):
+        dp = StandaloneDatapath(None, ('127.0.0.1', 6633))
+        dp.set_version(ofproto_v1_3.OFP_VERSION)
+        request = _Request()
+        dp.requests = dict((xid, request) for xid in range(1, 6))
+        dp.socket = _Socket(chunks)
+        dp._recv_loop()
+        return request.msgs
+
+    def test_recv_copy(self):
+        dp = StandaloneDatapath(None, ('127.0.0.1', 6633))
+        datas = ['a', 'b' * 10, 'c' * 10]
+        big = '\x01' * 40000
+        chunk = ''.join(self._echo_reply(dp, xid, data)
+                        for xid, data in zip([1, 2, 4], datas))
+        big_chunk = self._echo_reply(dp, 3, big) + chunk[:-20]
+        refcounts = [sys.getrefcount(chunk), sys.getrefcount(big_chunk)]
+
+        msgs = self._recv([chunk, big_chunk, chunk[-20:]])
+        eq_([1, 2, 4, 3, 1, 2, 4], [msg.xid for msg in msgs])
+        eq_(datas + [big] + datas, [str(msg.data) for msg in msgs])
+        # only the message taking up most of a chunk keeps it alive
+        eq_([refcounts[0], refcounts[1] + 1],
+            [sys.getrefcount(chunk), sys.getrefcount(big_chunk)])
+
+    def test_sendmsg_all(self):
+        written = []
+
+        class _VectoredSocket(object):
+            # writes at most 5 bytes per call
+            def sendmsg(self, bufs):
+                data = ''.join(str(buf) for buf in bufs)[:5]
+                written.append(data)
+                return len(data)
+
+        dp = StandaloneDatapath(_VectoredSocket(), ('127.0.0.1', 6633))
+        dp._sendmsg_all(['abc', bytearray('defgh'), 'ijklmnop'])
+        eq_(['abcde', 'fghij', 'klmno', 'p'], written)
+
+    def test_send_nonblocking(self):
+        dp = StandaloneDatapath(None, ('127.0.0.1', 6633))
+        dp.send_q_high = 1
+        eq_(True, dp.send('a', block=False))
+        # the queue is full
+        eq_(False, dp.send('b', block=False))
+        eq_(1, dp.send_q.qsize())
+        eq_(1, dp.send_stats['bytes_queued'])
@@ -0,0 +1,79 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_
+
+from ryu.base import app_manager
+from ryu.controller import dpset
+from ryu.controller import handler
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.tests.unit.controller.fakes import FakeDatapath
+
+# the event classes which DPSet handles.  ofproto/test_ofproto.py
+# reloads ofp_event, so they may not be the ones of ofp_event any more.
+EventOFPStateChange = dpset.DPSet.dispacher_change.ev_cls
+EventOFPPortStatus = dpset.DPSet.port_status_handler.ev_cls
+
+
+def _event(ev_cls, **attrs):
+    # the __init__ of a class of a reloaded module calls super() with
+    # the new class of its name, so the attributes are set here.
+    ev = ev_cls.__new__(ev_cls)
+    ev.__dict__.update(attrs)
+    return ev
+
+
+class Test_DPSet(unittest.TestCase):
+    """ Test case for ryu.controller.dpset.DPSet
+    """
+
+    def setUp(self):
+        self.dpset = dpset.DPSet()
+        handler.register_instance(self.dpset)
+        self.dp = FakeDatapath(1)
+
+    def _state_change(self, state):
+        ev = _event(EventOFPStateChange, datapath=self.dp, state=state)
+        self.dpset._send_event(ev, state)
+
+    def _port_status(self, reason, port_no):
+        port = ofproto_v1_3_parser.OFPPort(
+            port_no, '\x00' * 6, 'eth%d' % port_no, 0, 0, 0, 0, 0, 0, 0, 0)
+        msg = ofproto_v1_3_parser.OFPPortStatus(self.dp, reason, port)
+        self.dpset._send_event(_event(EventOFPPortStatus, msg=msg),
+                               handler.MAIN_DISPATCHER)
+
+    def _run(self):
+        self.dpset.is_active = False
+        self.dpset._send_event(self.dpset._event_stop, None)
+        self.dpset._event_loop()
+
+    def test_port_status_before_dead(self):
+        self._state_change(handler.MAIN_DISPATCHER)
+        self._port_status(ofproto_v1_3.OFPPR_ADD, 1)
+        self._state_change(handler.DEAD_DISPATCHER)
+        # the port status is handled before the datapath is forgotten
+        self._run()
+        eq_([], self.dpset.get_all())
+        eq_({}, self.dpset.port_state)
+
+    def test_port_status_after_main(self):
+        self._state_change(handler.MAIN_DISPATCHER)
+        self._port_status(ofproto_v1_3.OFPPR_ADD, 1)
+        self._run()
+        eq_([(1, self.dp)], self.dpset.get_all())
+        eq_([1], self.dpset.port_state[1].keys())
@@ -0,0 +1,97 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+# app_manager imports controller, which can't be imported first
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.ofproto import ofproto_v1_0
+from ryu.ofproto import ofproto_v1_0_parser
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.tests.unit.controller.fakes import FakeDatapath
+
+
+def _datapath(ofproto, ofproto_parser):
+    dp = FakeDatapath(ofproto=ofproto, ofproto_parser=ofproto_parser)
+    dp.xid = 0x100
+    return dp
+
+
+class Test_PacketOutTemplate(unittest.TestCase):
+    """ Test case for ryu.controller.controller.PacketOutTemplate
+    """
+
+    def _packet_out(self, dp, out_port, data, in_port):
+        actions = [dp.ofproto_parser.OFPActionOutput(out_port, 0)]
+        msg = dp.ofproto_parser.OFPPacketOut(
+            dp, dp.ofproto.OFP_NO_BUFFER, in_port, actions, data)
+        dp.set_xid(msg)
+        msg.serialize()
+        return msg
+
+    def _test_send(self, ofproto, ofproto_parser):
+        dp = _datapath(ofproto, ofproto_parser)
+        template = dp.packet_out_template(3)
+        ok_(template is dp.packet_out_template(3))
+        ok_(template is not dp.packet_out_template(3, 1))
+
+        datas = ['\x01' * 60, '\x01' * 60, '\x02' * 60, '\x03' * 100]
+        xids = [template.send(data) for data in datas]
+        eq_(range(0x101, 0x105), xids)
+
+        dp.xid = 0x100
+        for data, buf in zip(datas, dp.sent):
+            msg = self._packet_out(dp, 3, data, ofproto.OFPP_CONTROLLER)
+            eq_(str(msg.buf), str(buf))
+
+    def test_send_v1_0(self):
+        self._test_send(ofproto_v1_0, ofproto_v1_0_parser)
+
+    def test_send_v1_3(self):
+        self._test_send(ofproto_v1_3, ofproto_v1_3_parser)
+
+    def test_send_msg_hooks(self):
+        dp = _datapath(ofproto_v1_3, ofproto_v1_3_parser)
+        sent = []
+
+        def hook(msg):
+            sent.append((msg.xid, str(msg.buf)))
+
+        controller.Datapath.send_msg_hooks.append(hook)
+        try:
+            xid = dp.packet_out_template(1, 2).send('\x00' * 64)
+        finally:
+            controller.Datapath.send_msg_hooks.remove(hook)
+        eq_(1, len(sent))
+        eq_([(xid, str(dp.sent[0]))], sent)
+
+    def test_send_mutated_data(self):
+        dp = _datapath(ofproto_v1_3, ofproto_v1_3_parser)
+        template = dp.packet_out_template(3)
+        data = bytearray('\x01' * 60)
+        xids = [template.send(data)]
+        data[0:1] = '\x02'
+        xids.append(template.send(data))
+        eq_([0x101, 0x102], xids)
+
+        # the second send patches the changed data into the message
+        dp.xid = 0x101
+        msg = self._packet_out(dp, 3, str(data),
+                               ofproto_v1_3.OFPP_CONTROLLER)
+        eq_(str(msg.buf), str(dp.sent[1]))
+        eq_(str(data), template.msg.data)
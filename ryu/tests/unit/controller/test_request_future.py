@@ -0,0 +1,192 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_, raises
+
+from ryu import exception
+# app_manager imports controller, which can't be imported first
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.tests.unit.controller.fakes import FakeDatapath, FakeReply
+
+
+class Test_RequestFuture(unittest.TestCase):
+    """ Test case for ryu.controller.controller.RequestFuture
+    """
+
+    def _request(self, msg, stream=False):
+        dp = FakeDatapath()
+        msg.xid = 0x1234
+        future = controller.RequestFuture(dp, msg, stream)
+        dp.requests[msg.xid] = future
+        return dp, future
+
+    def test_reply(self):
+        dp, future = self._request(ofproto_v1_3_parser.OFPBarrierRequest(None))
+        reply = FakeReply(ofproto_v1_3.OFPT_BARRIER_REPLY, 0x1234)
+        future._reply(reply)
+        ok_(future.done())
+        eq_(reply, future.result())
+        eq_({}, dp.requests)
+
+    def test_multipart(self):
+        dp, future = self._request(
+            ofproto_v1_3_parser.OFPDescStatsRequest(None, 0))
+        reply1 = FakeReply(ofproto_v1_3.OFPT_MULTIPART_REPLY, 0x1234,
+                           ofproto_v1_3.OFPMPF_REPLY_MORE)
+        reply2 = FakeReply(ofproto_v1_3.OFPT_MULTIPART_REPLY, 0x1234)
+        future._reply(reply1)
+        ok_(not future.done())
+        future._reply(reply2)
+        eq_([reply1, reply2], future.result())
+
+    @raises(exception.OFPRequestError)
+    def test_error(self):
+        _dp, future = self._request(
+            ofproto_v1_3_parser.OFPBarrierRequest(None))
+        error = FakeReply(ofproto_v1_3.OFPT_ERROR, 0x1234)
+        error.type = ofproto_v1_3.OFPET_BAD_REQUEST
+        error.code = ofproto_v1_3.OFPBRC_BAD_TYPE
+        future._reply(error)
+        future.result()
+
+    @raises(exception.OFPRequestTimeout)
+    def test_timeout(self):
+        _dp, future = self._request(
+            ofproto_v1_3_parser.OFPBarrierRequest(None))
+        future.result(timeout=0.1)
+
+    def test_cancel(self):
+        dp, future = self._request(ofproto_v1_3_parser.OFPBarrierRequest(None))
+        done = []
+        future.add_done_callback(done.append)
+        ok_(future.cancel())
+        eq_([future], done)
+        eq_({}, dp.requests)
+        ok_(isinstance(future.exception(), exception.OFPRequestCancelled))
+        ok_(not future.cancel())
+
+    def test_wait(self):
+        _dp, future = self._request(
+            ofproto_v1_3_parser.OFPBarrierRequest(None))
+        reply = FakeReply(ofproto_v1_3.OFPT_BARRIER_REPLY, 0x1234)
+
+        def _reply():
+            hub.sleep(0.1)
+            future._reply(reply)
+        hub.spawn(_reply)
+        eq_(reply, future.result(timeout=5))
+
+    def test_stream(self):
+        _dp, future = self._request(
+            ofproto_v1_3_parser.OFPPortStatsRequest(None, 0, 0), stream=True)
+        reply1 = FakeReply(ofproto_v1_3.OFPT_MULTIPART_REPLY, 0x1234,
+                           ofproto_v1_3.OFPMPF_REPLY_MORE)
+        reply1.body = [1, 2]
+        reply2 = FakeReply(ofproto_v1_3.OFPT_MULTIPART_REPLY, 0x1234)
+        reply2.body = [3]
+        body = future.iter_body(timeout=5)
+        future._reply(reply1)
+        eq_(1, next(body))
+        eq_(2, next(body))
+        future._reply(reply2)
+        eq_([3], list(body))
+        eq_([], future.replies)
+
+    @raises(exception.OFPRequestTimeout)
+    def test_stream_timeout(self):
+        _dp, future = self._request(
+            ofproto_v1_3_parser.OFPPortStatsRequest(None, 0, 0), stream=True)
+        list(future.iter_replies(timeout=0.1))
+
+    def test_stream_slow_reader(self):
+        dp, future = self._request(
+            ofproto_v1_3_parser.OFPPortStatsRequest(None, 0, 0), stream=True)
+        # the receive loop never waits for the reader
+        for i in range(100):
+            reply = FakeReply(ofproto_v1_3.OFPT_MULTIPART_REPLY, 0x1234,
+                              ofproto_v1_3.OFPMPF_REPLY_MORE)
+            reply.body = [i]
+            future._reply(reply)
+        reply = FakeReply(ofproto_v1_3.OFPT_MULTIPART_REPLY, 0x1234)
+        reply.body = []
+        future._reply(reply)
+        ok_(future.done())
+        eq_({}, dp.requests)
+        eq_(range(100), list(future.iter_body(timeout=5)))
+
+
+class Test_MessageBatch(unittest.TestCase):
+    """ Test case for ryu.controller.controller.MessageBatch
+    """
+
+    def _flow_mod(self, dp):
+        return ofproto_v1_3_parser.OFPFlowMod(
+            dp, match=ofproto_v1_3_parser.OFPMatch(), instructions=[])
+
+    def test_commit(self):
+        dp = FakeDatapath()
+        with controller.MessageBatch(dp) as batch:
+            xid1 = batch.add(self._flow_mod(dp))
+            xid2 = batch.add(self._flow_mod(dp))
+        future = batch.future
+        eq_(1, len(dp.sent))
+        msg_len = len(batch.msgs[0].buf)
+        eq_(2 * msg_len + ofproto_v1_3.OFP_HEADER_SIZE, len(dp.sent[0]))
+        eq_(set([xid1, xid2, future.xid]), set(dp.requests))
+
+        error = FakeReply(ofproto_v1_3.OFPT_ERROR, xid2)
+        future._reply(error)
+        ok_(not future.done())
+        future._reply(FakeReply(ofproto_v1_3.OFPT_BARRIER_REPLY, future.xid))
+        eq_({xid2: error}, future.result())
+        eq_({}, dp.requests)
+
+    def test_disconnected(self):
+        dp = FakeDatapath()
+        dp.is_active = False
+        batch = controller.MessageBatch(dp)
+        batch.add(self._flow_mod(dp))
+        future = batch.commit()
+        ok_(isinstance(future.exception(),
+                       exception.OFPDatapathDisconnected))
+        eq_([], dp.sent)
+
+    def test_send_msg_hooks(self):
+        dp = FakeDatapath()
+        sent = []
+
+        def hook(msg):
+            sent.append(msg.xid)
+
+        controller.Datapath.send_msg_hooks.append(hook)
+        try:
+            try:
+                with controller.MessageBatch(dp) as batch:
+                    batch.add(self._flow_mod(dp))
+                    raise ValueError()
+            except ValueError:
+                pass
+            # the batch which isn't committed isn't seen by the hooks
+            eq_([], sent)
+            with controller.MessageBatch(dp) as batch:
+                xid = batch.add(self._flow_mod(dp))
+        finally:
+            controller.Datapath.send_msg_hooks.remove(hook)
+        eq_([xid], sent)
@@ -0,0 +1,186 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.controller import handler
+from ryu.controller import shadow_flow
+from ryu.ofproto import ofproto_common
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.tests.unit.controller.fakes import FakeDatapath, FakeReply
+
+
+class Test_ShadowFlowTable(unittest.TestCase):
+    """ Test case for ryu.controller.shadow_flow.ShadowFlowTable
+    """
+
+    def setUp(self):
+        self.dp = FakeDatapath()
+        self.table = shadow_flow.ShadowFlowTable()
+
+    def _flow_mod(self, command, priority=0, cookie=0, cookie_mask=0,
+                  table_id=0, out_port=1, **match):
+        parser = ofproto_v1_3_parser
+        actions = [parser.OFPActionOutput(out_port, 0)]
+        inst = [parser.OFPInstructionActions(
+            ofproto_v1_3.OFPIT_APPLY_ACTIONS, actions)]
+        msg = parser.OFPFlowMod(
+            self.dp, cookie=cookie, cookie_mask=cookie_mask,
+            table_id=table_id, command=command, priority=priority,
+            out_port=ofproto_v1_3.OFPP_ANY, out_group=ofproto_v1_3.OFPG_ANY,
+            match=parser.OFPMatch(**match), instructions=inst)
+        msg.set_xid(0)
+        msg.serialize()
+        return self.table.apply_flow_mod(ofproto_v1_3, parser, msg.buf)
+
+    def test_add(self):
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, eth_type=0x800,
+                       in_port=1)
+        eq_(1, len(self.table))
+        # the order of match fields doesn't matter
+        entry = self.table.get(0, 10, (('eth_type', 0x800), ('in_port', 1)))
+        ok_(entry is not None)
+
+        # a flow-mod rebuilt from the entry is the same as the original
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, in_port=1,
+                       eth_type=0x800)
+        eq_(1, len(self.table))
+        msg = shadow_flow._FlowMod(self.dp, entry, ofproto_v1_3.OFPFC_ADD)
+        msg.set_xid(0)
+        msg.serialize()
+        table = shadow_flow.ShadowFlowTable()
+        table.apply_flow_mod(ofproto_v1_3, ofproto_v1_3_parser, msg.buf)
+        eq_(entry.match_inst, table.flows[entry.key].match_inst)
+
+    def test_modify(self):
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, in_port=1)
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, in_port=2)
+        entry = self.table.get(0, 10, (('in_port', 2), ))
+        self._flow_mod(ofproto_v1_3.OFPFC_MODIFY, out_port=3, in_port=1)
+        ok_(self.table.get(0, 10, (('in_port', 1), )).instructions !=
+            entry.instructions)
+        eq_(entry, self.table.get(0, 10, (('in_port', 2), )))
+
+    def test_delete(self):
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, cookie=1, in_port=1)
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 20, cookie=1, in_port=1,
+                       eth_type=0x800)
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, cookie=2, in_port=2)
+        self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, cookie=2, in_port=3,
+                       table_id=1)
+
+        self._flow_mod(ofproto_v1_3.OFPFC_DELETE_STRICT, 10, in_port=3)
+        eq_(4, len(self.table))
+
+        undo = self._flow_mod(ofproto_v1_3.OFPFC_DELETE, in_port=1,
+                              table_id=ofproto_v1_3.OFPTT_ALL)
+        eq_(2, len(self.table))
+        self.table.undo(undo)
+        eq_(4, len(self.table))
+
+        self._flow_mod(ofproto_v1_3.OFPFC_DELETE, cookie=2,
+                       cookie_mask=shadow_flow.UINT64_MAX,
+                       table_id=ofproto_v1_3.OFPTT_ALL)
+        eq_(2, len(self.table))
+        eq_(set([1]), set(self.table.cookies))
+
+    def test_undo_add(self):
+        undo = self._flow_mod(ofproto_v1_3.OFPFC_ADD, 10, in_port=1)
+        self.table.undo(undo)
+        eq_(0, len(self.table))
+        eq_({}, self.table.cookies)
+
+
+def _error(datapath, xid, msg_type=ofproto_v1_3.OFPT_FLOW_MOD):
+    error = FakeReply(ofproto_v1_3.OFPT_ERROR, xid, datapath=datapath)
+    # the header of the failed message
+    error.data = struct.pack(ofproto_common.OFP_HEADER_PACK_STR,
+                             ofproto_v1_3.OFP_VERSION, msg_type,
+                             ofproto_common.OFP_HEADER_SIZE, xid)
+    return error
+
+
+class _StateChange(object):
+    def __init__(self, datapath, state):
+        self.datapath = datapath
+        self.state = state
+
+
+class Test_ShadowFlowTables(unittest.TestCase):
+    """ Test case for ryu.controller.shadow_flow.ShadowFlowTables
+    """
+
+    def setUp(self):
+        self.tables = shadow_flow.ShadowFlowTables()
+
+    def tearDown(self):
+        self.tables.close()
+
+    def _flow_mod(self, dp, in_port):
+        parser = ofproto_v1_3_parser
+        msg = parser.OFPFlowMod(dp, match=parser.OFPMatch(in_port=in_port),
+                                instructions=[])
+        msg.set_xid(1)
+        msg.serialize()
+        return msg
+
+    def test_error_of_other_datapath(self):
+        dp1 = FakeDatapath(1)
+        dp2 = FakeDatapath(2)
+        # the same xid on both datapaths
+        self.tables._msg_sent(self._flow_mod(dp1, 1))
+        self.tables._msg_sent(self._flow_mod(dp2, 2))
+        self.tables._msg_failed(_error(dp2, 1))
+        eq_(0, len(self.tables.get(2)))
+        eq_(1, len(self.tables.get(1)))
+        self.tables._msg_failed(_error(dp1, 1))
+        eq_(0, len(self.tables.get(1)))
+
+    def test_error_of_other_message(self):
+        dp = FakeDatapath(1)
+        self.tables._msg_sent(self._flow_mod(dp, 1))
+        # e.g. a packet-out which was sent with the xid of the flow-mod
+        self.tables._msg_failed(_error(dp, 1, ofproto_v1_3.OFPT_PACKET_OUT))
+        eq_(1, len(self.tables.get(1)))
+        self.tables._msg_failed(_error(dp, 1))
+        eq_(0, len(self.tables.get(1)))
+
+    def test_disconnect(self):
+        dp = FakeDatapath(1)
+        self.tables._msg_sent(self._flow_mod(dp, 1))
+        eq_(1, len(self.tables._undo_log))
+        self.tables.state_change_handler(
+            _StateChange(dp, handler.DEAD_DISPATCHER))
+        eq_(0, len(self.tables._undo_log))
+        # the shadow is kept to reconcile the datapath when it reconnects
+        eq_(1, len(self.tables.get(1)))
+
+    def test_batch_error(self):
+        dp = FakeDatapath(1)
+        parser = ofproto_v1_3_parser
+        with controller.MessageBatch(dp) as batch:
+            batch.add(parser.OFPFlowMod(
+                dp, match=parser.OFPMatch(in_port=1), instructions=[]))
+            xid = batch.add(parser.OFPFlowMod(
+                dp, match=parser.OFPMatch(in_port=2), instructions=[]))
+        eq_(2, len(self.tables.get(1)))
+        batch.future._reply(_error(dp, xid))
+        eq_(1, len(self.tables.get(1)))
+        ok_(self.tables.get(1).get(0, 0, (('in_port', 1), )) is not None)
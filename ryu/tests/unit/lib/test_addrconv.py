@@ -54,3 +54,27 @@ class Test_addrconv(unittest.TestCase):
     def test_mac(self):
         self._test_conv(addrconv.mac, 'f2:0b:a4:01:0a:23',
                         '\xf2\x0b\xa4\x01\x0a\x23')
+
+    def test_mac_other_formats(self):
+        bin_value = '\xf2\x0b\xa4\x01\x0a\x23'
+        eq_(bin_value, addrconv.mac.text_to_bin('F2:0B:A4:01:0A:23'))
+        eq_(bin_value, addrconv.mac.text_to_bin('f2-0b-a4-01-0a-23'))
+        eq_('f2:0b:a4:01:0a:23',
+            addrconv.mac.bin_to_text(bytearray(bin_value)))
+
+    def test_cache(self):
+        conv = addrconv.mac
+        conv.set_cache_size(2)
+        try:
+            self._test_conv(conv, 'f2:0b:a4:01:0a:23',
+                            '\xf2\x0b\xa4\x01\x0a\x23')
+            self._test_conv(conv, 'f2:0b:a4:01:0a:23',
+                            '\xf2\x0b\xa4\x01\x0a\x23')
+            self._test_conv(conv, '00:00:00:00:00:01',
+                            '\x00\x00\x00\x00\x00\x01')
+            self._test_conv(conv, '00:00:00:00:00:02',
+                            '\x00\x00\x00\x00\x00\x02')
+        finally:
+            conv.set_cache_size(0)
+        self._test_conv(conv, 'f2:0b:a4:01:0a:23',
+                        '\xf2\x0b\xa4\x01\x0a\x23')
@@ -237,3 +237,106 @@ class Test_hub(unittest.TestCase):
         # allow multiple sets unlike eventlet Event
         ev.set()
         ev.set()
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 100.
+
+    def __call__(self):
+        return self.now
+
+
+class Test_TimerWheel(unittest.TestCase):
+    """ Test case for ryu.lib.hub.TimerWheel
+    """
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.wheel = hub.TimerWheel(tick=.01, clock=self.clock)
+        self.fired = []
+
+    def _advance(self, seconds):
+        end = self.clock.now + seconds
+        while self.clock.now < end:
+            self.clock.now = min(self.clock.now + 1, end)
+            self.wheel.run()
+
+    def _call_later(self, seconds, name):
+        return self.wheel.call_later(seconds, self._fire, name)
+
+    def _fire(self, name):
+        self.fired.append((name, self.clock.now))
+
+    def test_expire(self):
+        # in level 0, 1, 2 and 3
+        for seconds in (1.5, 100, 5000, 20000):
+            self._call_later(seconds, seconds)
+        assert len(self.wheel) == 4
+        self._advance(20001)
+        assert [name for name, _now in self.fired] == [1.5, 100, 5000,
+                                                       20000]
+        for seconds, now in self.fired:
+            assert 100 + seconds <= now < 100 + seconds + 1
+        assert len(self.wheel) == 0
+
+    def test_tick(self):
+        timer = self._call_later(.05, 'a')
+        self.clock.now += .04
+        self.wheel.run()
+        assert self.fired == []
+        assert timer.is_active()
+        self.clock.now += .02
+        self.wheel.run()
+        assert [name for name, _now in self.fired] == ['a']
+        assert not timer.is_active()
+
+    def test_cancel_reschedule(self):
+        timer_a = self._call_later(1, 'a')
+        timer_b = self._call_later(1, 'b')
+        self._call_later(2, 'c')
+        timer_a.cancel()
+        timer_a.cancel()
+        timer_b.reschedule(3)
+        assert len(self.wheel) == 2
+        self._advance(4)
+        assert [name for name, _now in self.fired] == ['c', 'b']
+
+        # an expired timer can be scheduled again
+        timer_a.reschedule(1)
+        self._advance(2)
+        assert [name for name, _now in self.fired] == ['c', 'b', 'a']
+
+    def test_cancel_from_timer(self):
+        timers = []
+
+        def _cancel(name):
+            self.fired.append(name)
+            for timer in timers:
+                timer.cancel()
+
+        timers.extend(self.wheel.call_later(1, _cancel, i) for i in range(5))
+        self._advance(2)
+        assert len(self.fired) == 1
+        assert len(self.wheel) == 0
+
+    def test_periodic(self):
+        def _periodic():
+            self.fired.append(self.clock.now)
+            timer.reschedule(1)
+
+        timer = self.wheel.call_later(1, _periodic)
+        for _i in range(500):
+            self.clock.now += .25
+            self.wheel.run()
+        assert len(self.fired) == 125
+
+    def test_call_later(self):
+        result = []
+        with hub.Timeout(2):
+            timer = hub.call_later(0.5, result.append, 1)
+            hub.call_later(0.1, result.append, 2)
+            hub.call_later(0.3, timer.cancel)
+            hub.call_later(0.2, result.append, 3).cancel()
+            hub.sleep(1)
+        assert result == [2]
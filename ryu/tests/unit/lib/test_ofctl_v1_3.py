@@ -19,6 +19,7 @@ import unittest
 import logging
 from nose.tools import *
 
+from ryu.exception import OFPRequestTimeout
 from ryu.lib import ofctl_v1_3
 from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
 from ryu.ofproto.ofproto_v1_3_parser import OFPActionPopMpls
@@ -31,6 +32,28 @@ class _Datapath(object):
     ofproto_parser = ofproto_v1_3_parser
 
 
+class _StreamDatapath(_Datapath):
+    def __init__(self, future):
+        self.future = future
+
+    def send_request(self, msg, stream=False):
+        return self.future
+
+
+class _FailingFuture(object):
+    def __init__(self, entries):
+        self.entries = entries
+        self.cancelled = False
+
+    def iter_body(self, timeout=None):
+        for entry in self.entries:
+            yield entry
+        raise OFPRequestTimeout(xid=1)
+
+    def cancel(self):
+        self.cancelled = True
+
+
 class Test_ofctl_v1_3(unittest.TestCase):
 
     """ Test case for ofctl_v1_3
@@ -56,3 +79,13 @@ class Test_ofctl_v1_3(unittest.TestCase):
         act = insts.actions[0]
         ok_(isinstance(act, OFPActionPopMpls))
         eq_(act.ethertype, 0x0800)
+
+    def test_iter_stats_failure(self):
+        future = _FailingFuture([1, 2])
+        dp = _StreamDatapath(future)
+        stats = ofctl_v1_3.iter_stats(dp, None)
+        eq_(1, next(stats))
+        eq_(2, next(stats))
+        # a failure halfway is not mistaken for the end of the entries
+        assert_raises(OFPRequestTimeout, next, stats)
+        ok_(future.cancelled)
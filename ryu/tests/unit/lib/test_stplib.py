@@ -0,0 +1,147 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import unittest
+from nose.tools import eq_
+
+from ryu.lib import hub
+from ryu.lib import stplib
+from ryu.lib.packet import bpdu
+from ryu.ofproto import ofproto_v1_0
+from ryu.ofproto import ofproto_v1_0_parser
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 100.
+
+    def __call__(self):
+        return self.now
+
+
+class _PacketOutTemplate(object):
+    def send(self, data):
+        pass
+
+
+class _Datapath(object):
+    ofproto = ofproto_v1_0
+    ofproto_parser = ofproto_v1_0_parser
+
+    def __init__(self):
+        self.id = 1
+        self.port_mods = []
+
+    def send_msg(self, msg):
+        self.port_mods.append(msg.config)
+
+    def packet_out_template(self, out_port):
+        return _PacketOutTemplate()
+
+
+class Test_Port(unittest.TestCase):
+    """ Test case for the state machine of stplib.Port on the timer wheel
+    """
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.wheel = hub.TimerWheel(tick=.01, clock=self.clock)
+        self._call_later = hub.call_later
+        hub.call_later = self.wheel.call_later
+        self.dp = _Datapath()
+        self.logger = logging.getLogger('test_stplib')
+        self.worker = stplib.PortTimerWorker(self.logger,
+                                             {'dpid': 'test'})
+        self.states = []
+        self.port = None
+
+    def tearDown(self):
+        if self.port is not None:
+            self.port.delete()
+        self.worker.stop()
+        hub.call_later = self._call_later
+
+    def _port(self, config):
+        bridge_id = stplib.BridgeId(bpdu.DEFAULT_BRIDGE_PRIORITY, 0,
+                                    '00:00:00:00:00:01')
+        times = stplib.Times(0, 20, 2, 15)
+        ofport = ofproto_v1_0_parser.OFPPhyPort(
+            1, '00:00:00:00:00:02', 'eth1', 0, 0, 0, 0, 0, 0)
+        self.port = stplib.Port(self.dp, self.logger, config,
+                                self._send_event, lambda: None,
+                                lambda state: None, bridge_id, times,
+                                ofport, self.worker)
+        return self.port
+
+    def _send_event(self, ev):
+        self.states.append(ev.port_state)
+
+    def _advance(self, seconds):
+        end = self.clock.now + seconds
+        while self.clock.now < end:
+            self.clock.now = min(self.clock.now + .5, end)
+            self.wheel.run()
+            # let the worker run the expired timers
+            hub.sleep(0)
+
+    def test_transitions(self):
+        port = self._port({})
+        port.down(stplib.PORT_STATE_DISABLE)
+        # the first run of the state machine disables the port, in the
+        # state the port is in by then
+        eq_(self.dp.port_mods, [stplib.PORT_STATE_LISTEN])
+        self._advance(1)
+        eq_(self.dp.port_mods, [stplib.PORT_STATE_LISTEN,
+                                stplib.PORT_STATE_DISABLE])
+
+        port.up(stplib.DESIGNATED_PORT, port.port_priority, port.port_times)
+        eq_(port.state, stplib.PORT_STATE_LISTEN)
+        self._advance(14)
+        eq_(port.state, stplib.PORT_STATE_LISTEN)
+        self._advance(2)
+        eq_(port.state, stplib.PORT_STATE_LEARN)
+        self._advance(15)
+        eq_(port.state, stplib.PORT_STATE_FORWARD)
+        # no timer in FORWARD
+        self._advance(60)
+        eq_(self.states, [ofproto_v1_0.OFPPS_STP_LISTEN,
+                          ofproto_v1_0.OFPPS_LINK_DOWN,
+                          ofproto_v1_0.OFPPS_STP_LISTEN,
+                          ofproto_v1_0.OFPPS_STP_LEARN,
+                          ofproto_v1_0.OFPPS_STP_FORWARD])
+        eq_(self.dp.port_mods, [stplib.PORT_STATE_LISTEN,
+                                stplib.PORT_STATE_DISABLE,
+                                stplib.PORT_STATE_LISTEN,
+                                stplib.PORT_STATE_LEARN,
+                                stplib.PORT_STATE_FORWARD])
+
+    def test_disabled(self):
+        port = self._port({'enable': False})
+        eq_(port.state, stplib.PORT_STATE_DISABLE)
+        eq_(self.dp.port_mods, [])
+        self._advance(1)
+        eq_(self.dp.port_mods, [stplib.PORT_STATE_DISABLE])
+
+    def test_restarted_timer(self):
+        port = self._port({})
+        self._advance(1)
+        # an expiry queued to the worker is dropped when the timer is
+        # restarted before the worker runs it
+        port.state_machine.start(0)
+        self.wheel.run(self.clock.now + 1)
+        port.state_machine.start(100)
+        hub.sleep(0)
+        eq_(port.state, stplib.PORT_STATE_LISTEN)
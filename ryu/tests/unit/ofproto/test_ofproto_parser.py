@@ -16,6 +16,8 @@
 # vim: tabstop=4 shiftwidth=4 softtabstop=4
 
 import binascii
+import os
+import sys
 import unittest
 from nose.tools import *
 import struct
@@ -23,6 +25,7 @@ from ryu import exception
 
 from ryu.ofproto import ofproto_common, ofproto_parser
 from ryu.ofproto import ofproto_v1_0, ofproto_v1_0_parser
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
 
 import logging
 LOG = logging.getLogger(__name__)
@@ -68,6 +71,23 @@ class TestOfproto_Parser(unittest.TestCase):
         eq_(msg_len, 8)
         eq_(xid, 1)
 
+    def testHeaderOffset(self):
+        buf = self.bufPacketIn + self.bufHello
+        (version,
+         msg_type,
+         msg_len,
+         xid) = ofproto_parser.header(buf, len(self.bufPacketIn))
+        eq_(version, 1)
+        eq_(msg_type, 0)
+        eq_(msg_len, 8)
+        eq_(xid, 1)
+
+    def testMsgCls(self):
+        eq_(ofproto_v1_0_parser.OFPPacketIn,
+            ofproto_parser.msg_cls(ofproto_v1_0.OFP_VERSION,
+                                   ofproto_v1_0.OFPT_PACKET_IN))
+        eq_(None, ofproto_parser.msg_cls(ofproto_v1_0.OFP_VERSION, 0xff))
+
     def testFeaturesReply(self):
         (version,
          msg_type,
@@ -134,6 +154,62 @@ class TestOfproto_Parser(unittest.TestCase):
                            self.bufPacketIn)
 
 
+class TestLazyAttrs(unittest.TestCase):
+    """ Test case for attributes decoded on first access
+    """
+
+    def _parse(self, name):
+        packet_dir = os.path.join(os.path.dirname(sys.modules[
+            __name__].__file__), '../../packet_data/of13')
+        buf = open(os.path.join(packet_dir, name)).read()
+        (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+        return ofproto_parser.msg(None, version, msg_type, msg_len, xid, buf)
+
+    def test_packet_in(self):
+        msg = self._parse('4-4-ofp_packet_in.packet')
+        ok_('match' not in msg.__dict__)
+        ok_(isinstance(msg.match, ofproto_v1_3_parser.OFPMatch))
+        ok_('match' in msg.__dict__)
+
+    def test_flow_stats_reply(self):
+        msg = self._parse('4-12-ofp_flow_stats_reply.packet')
+        ok_('body' not in msg.__dict__)
+        ok_('body' in msg.to_jsondict()['OFPFlowStatsReply'])
+        ok_(isinstance(msg.body[0], ofproto_v1_3_parser.OFPFlowStats))
+
+    def test_port_status(self):
+        msg = self._parse('4-39-ofp_port_status.packet')
+        ok_('desc' not in msg.__dict__)
+        ok_(isinstance(msg.desc, ofproto_v1_3_parser.OFPPort))
+
+    @raises(AttributeError)
+    def test_unknown_attr(self):
+        msg = self._parse('4-39-ofp_port_status.packet')
+        msg.no_such_attr
+
+    def _truncate(self, name, length):
+        buf = bytearray(self._parse(name).buf[:length])
+        struct.pack_into('!H', buf, 2, length)
+        (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+        return ofproto_parser.msg(None, version, msg_type, msg_len, xid, buf)
+
+    def test_truncated_packet_in(self):
+        # the match doesn't fit, which is found when it's parsed
+        eq_(None, self._truncate('4-4-ofp_packet_in.packet',
+                                 ofproto_v1_3.OFP_PACKET_IN_SIZE))
+
+    def test_truncated_port_status(self):
+        eq_(None, self._truncate('4-39-ofp_port_status.packet',
+                                 ofproto_v1_3.OFP_PORT_STATUS_SIZE - 8))
+
+    @raises(exception.OFPMalformedMessage)
+    def test_truncated_flow_stats_reply(self):
+        msg = self._truncate('4-12-ofp_flow_stats_reply.packet',
+                             ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE + 20)
+        ok_(msg is not None)
+        msg.body
+
+
 class TestMsgBase(unittest.TestCase):
     """ Test case for ofproto_parser.MsgBase
     """
@@ -0,0 +1,93 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_
+
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import oxm_fields
+
+
+class Test_IntDescr(unittest.TestCase):
+    """ Test case for ryu.ofproto.oxm_fields.IntDescr
+    """
+
+    def _test(self, size, user, bin):
+        descr = oxm_fields.IntDescr(size)
+        eq_(bin, descr.from_user(user))
+        eq_(user, descr.to_user(bin))
+
+    def test_int1(self):
+        self._test(1, 0xab, '\xab')
+
+    def test_int2(self):
+        self._test(2, 0xabcd, '\xab\xcd')
+
+    def test_int3(self):
+        self._test(3, 0xabcdef, '\xab\xcd\xef')
+
+    def test_int4(self):
+        self._test(4, 0xabcdef01, '\xab\xcd\xef\x01')
+
+    def test_int8(self):
+        self._test(8, 0xabcdef0123456789, '\xab\xcd\xef\x01\x23\x45\x67\x89')
+
+    def test_truncate(self):
+        eq_('\x34\x56', oxm_fields.IntDescr(2).from_user(0x123456))
+        eq_('\x00\x12\x34', oxm_fields.IntDescr(3).from_user(0x1000001234))
+        eq_('\xff\xff', oxm_fields.IntDescr(2).from_user(-1))
+
+
+class Test_normalize(unittest.TestCase):
+    """ Test case for masking of user values
+    """
+
+    def test_int(self):
+        eq_(('metadata', (0x1200, 0xff00)),
+            ofproto_v1_3.oxm_normalize_user('metadata', (0x1234, 0xff00)))
+
+    def test_ipv4(self):
+        eq_(('ipv4_src', ('10.1.0.0', '255.255.0.0')),
+            ofproto_v1_3.oxm_normalize_user('ipv4_src',
+                                            ('10.1.2.3', '255.255.0.0')))
+
+    def test_from_user_normalized(self):
+        eq_((ofproto_v1_3.oxm_from_user('eth_dst', ('aa:bb:cc:00:00:00',
+                                                    'ff:ff:ff:00:00:00'))),
+            ofproto_v1_3.oxm_from_user_normalized('eth_dst',
+                                                  ('aa:bb:cc:dd:ee:ff',
+                                                   'ff:ff:ff:00:00:00')))
+
+
+class Test_serialize(unittest.TestCase):
+    """ Test case for OXM TLV serialization and parsing
+    """
+
+    def _test(self, name, user_value, wire):
+        n, value, mask = ofproto_v1_3.oxm_from_user(name, user_value)
+        buf = bytearray()
+        eq_(len(wire), ofproto_v1_3.oxm_serialize(n, value, mask, buf, 0))
+        eq_(wire, str(buf))
+        eq_((n, value, mask, len(wire)),
+            ofproto_v1_3.oxm_parse(str(buf), 0))
+
+    def test_in_port(self):
+        self._test('in_port', 1, '\x80\x00\x00\x04\x00\x00\x00\x01')
+
+    def test_metadata_w(self):
+        self._test('metadata', (1, 0xff),
+                   '\x80\x00\x05\x10' +
+                   '\x00\x00\x00\x00\x00\x00\x00\x01' +
+                   '\x00\x00\x00\x00\x00\x00\x00\xff')
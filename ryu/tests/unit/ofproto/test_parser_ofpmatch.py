@@ -53,12 +53,17 @@ class Test_Parser_OFPMatch(unittest.TestCase):
             ok_(k in match2)
             eq_(match[k], v)
             eq_(match2[k], v)
+            if ofpp is ofproto_v1_3_parser:
+                eq_(ofpp.OFPMatch.parser_field(buffer(b), 0, k), v)
         for k, v in match.iteritems():
             ok_(k in d)
             eq_(d[k], v)
         for k, v in match2.iteritems():
             ok_(k in d)
             eq_(d[k], v)
+        if ofpp is ofproto_v1_3_parser:
+            eq_(ofpp.OFPMatch.parser_field(buffer(b), 0, 'no_such_field', 1),
+                1)
 
 
 def _add_tests():
@@ -1529,3 +1529,115 @@ class TestPacket(unittest.TestCase):
         ok_(isinstance(pkt.protocols[0], ethernet.ethernet))
         ok_(isinstance(pkt.protocols[1], ipv4.ipv4))
         ok_(isinstance(pkt.protocols[2], udp.udp))
+
+    def _udp_data(self):
+        e = ethernet.ethernet(self.dst_mac, self.src_mac, ether.ETH_TYPE_IP)
+        i = ipv4.ipv4(proto=inet.IPPROTO_UDP)
+        u = udp.udp(self.src_port, self.dst_port)
+        pkt = e/i/u/self.payload
+        pkt.serialize()
+        return str(pkt.data)
+
+    def test_lazy_get_protocol(self):
+        pkt = packet.Packet(self._udp_data(), lazy=True)
+        e = pkt.get_protocol(ethernet.ethernet)
+        ok_(isinstance(e, ethernet.ethernet))
+        eq_(1, len(pkt._protocols))
+        ok_(pkt.get_protocol(ethernet.ethernet) is e)
+
+        u = pkt.get_protocol(udp.udp)
+        eq_(self.dst_port, u.dst_port)
+        # udp is the last header, followed by the payload
+        eq_(4, len(pkt._protocols))
+
+        eq_(None, pkt.get_protocol(tcp.tcp))
+        eq_(self.payload, pkt[3])
+        eq_([u], pkt.get_protocols(udp.udp))
+
+    def test_lazy_iter(self):
+        pkt = packet.Packet(self._udp_data(), lazy=True)
+        i = iter(pkt)
+        ok_(isinstance(i.next(), ethernet.ethernet))
+        ok_(isinstance(i.next(), ipv4.ipv4))
+        eq_(2, len(pkt._protocols))
+        ok_(isinstance(pkt[1], ipv4.ipv4))
+        eq_(2, len(pkt._protocols))
+
+        eq_(4, len(pkt))
+        eq_([p.__class__ for p in packet.Packet(self._udp_data())],
+            [p.__class__ for p in pkt])
+
+    def test_protocol_index_modified(self):
+        pkt = packet.Packet(self._udp_data())
+        eq_(None, pkt.get_protocol(tcp.tcp))
+        eq_([], pkt.get_protocols(tcp.tcp))
+        t = tcp.tcp(self.src_port, self.dst_port)
+        pkt.protocols.append(t)
+        ok_(pkt.get_protocol(tcp.tcp) is t)
+        eq_([t], pkt.get_protocols(tcp.tcp))
+        pkt[4] = udp.udp()
+        eq_(None, pkt.get_protocol(tcp.tcp))
+
+    def test_protocol_index_replaced(self):
+        pkt = packet.Packet(self._udp_data())
+        protocols = pkt.protocols
+        eq_(None, pkt.get_protocol(tcp.tcp))
+        u = pkt.get_protocol(udp.udp)
+        eq_([u], pkt.get_protocols(udp.udp))
+        # the same length, through a reference to the list
+        t = tcp.tcp(self.src_port, self.dst_port)
+        protocols[2] = t
+        ok_(pkt.get_protocol(tcp.tcp) is t)
+        eq_(None, pkt.get_protocol(udp.udp))
+        eq_([], pkt.get_protocols(udp.udp))
+        protocols[2:3] = [u]
+        ok_(pkt.get_protocol(udp.udp) is u)
+        eq_(None, pkt.get_protocol(tcp.tcp))
+
+    def test_serialize_headroom(self):
+        # headers larger than the headroom of the buffer
+        data = '\x01' * 300
+        pkt = packet.Packet()
+        pkt.add_protocol(ethernet.ethernet(self.dst_mac, self.src_mac,
+                                           ether.ETH_TYPE_8021Q))
+        for vid in range(1, 40):
+            pkt.add_protocol(vlan.vlan(vid=vid,
+                                       ethertype=ether.ETH_TYPE_8021Q))
+        pkt.add_protocol(vlan.vlan(vid=40, ethertype=ether.ETH_TYPE_IP))
+        pkt.add_protocol(ipv4.ipv4(proto=inet.IPPROTO_UDP))
+        pkt.add_protocol(self.payload)
+        pkt.add_protocol(data)
+        pkt.serialize()
+        eq_(14 + 40 * 4 + 20 + len(self.payload) + len(data), len(pkt.data))
+        eq_(self.payload + data, str(pkt.data[194:]))
+        vlans = packet.Packet(pkt.data).get_protocols(vlan.vlan)
+        eq_(range(1, 41), [v.vid for v in vlans])
+
+    def test_template(self):
+        e = ethernet.ethernet(self.dst_mac, self.src_mac, ether.ETH_TYPE_IP)
+        i = ipv4.ipv4(proto=inet.IPPROTO_UDP, ttl=64)
+        u = udp.udp(self.src_port, self.dst_port)
+        tmpl = packet.PacketTemplate(e/i/u/self.payload)
+        tmpl.add_field('src', ethernet.ethernet, 6, '!6s')
+        tmpl.add_field('ttl', i, 8, '!B')
+        tmpl.add_field('ports', udp.udp, 0, '!HH')
+
+        data = tmpl.build(src=addrconv.mac.text_to_bin('00:01:02:03:04:05'),
+                          ttl=3, ports=(1, 2))
+        pkt = packet.Packet(data)
+        eq_('00:01:02:03:04:05', pkt.get_protocol(ethernet.ethernet).src)
+        eq_(3, pkt.get_protocol(ipv4.ipv4).ttl)
+        eq_(1, pkt.get_protocol(udp.udp).src_port)
+        eq_(2, pkt.get_protocol(udp.udp).dst_port)
+
+        # the template itself is unchanged
+        pkt = packet.Packet(tmpl.build())
+        eq_(self.src_mac, pkt.get_protocol(ethernet.ethernet).src)
+        eq_(64, pkt.get_protocol(ipv4.ipv4).ttl)
+
+    def test_template_invalid_field(self):
+        e = ethernet.ethernet(self.dst_mac, self.src_mac, ether.ETH_TYPE_IP)
+        tmpl = packet.PacketTemplate(e/ipv4.ipv4())
+        assert_raises(ValueError, tmpl.add_field, 'x', tcp.tcp, 0, '!H')
+        assert_raises(ValueError, tmpl.add_field, 'x', ipv4.ipv4, 19, '!H')
+        assert_raises(KeyError, tmpl.build, x=1)
@@ -0,0 +1,106 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import struct
+import unittest
+from nose.tools import eq_
+
+from ryu.ofproto import inet
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import packet_utils
+
+
+def _checksum(data):
+    # straightforward RFC 1071 checksum
+    data = str(data)
+    if len(data) % 2:
+        data += '\x00'
+    s = sum(struct.unpack('!%dH' % (len(data) / 2), data))
+    while s >> 16:
+        s = (s & 0xffff) + (s >> 16)
+    return ~s & 0xffff
+
+
+class Test_checksum(unittest.TestCase):
+    """ Test case for ryu.lib.packet.packet_utils checksums
+    """
+
+    def setUp(self):
+        rand = random.Random(0)
+        self.datas = [''.join(chr(rand.randrange(256))
+                              for _i in range(length))
+                      for length in range(0, 70) + [1499, 1500]]
+        self.datas.append('\xff\xff')
+        self.datas.append('\x00' * 8)
+
+    def test_checksum(self):
+        for data in self.datas:
+            eq_(_checksum(data), packet_utils.checksum(data))
+            eq_(_checksum(data), packet_utils.checksum(bytearray(data)))
+            eq_(_checksum(data), packet_utils.checksum(memoryview(data)))
+
+    def test_checksum_offset(self):
+        data = self.datas[-3]
+        eq_(_checksum(data[20:41]), packet_utils.checksum(data, 20, 21))
+        eq_(_checksum(data[6:]), packet_utils.checksum(data, 6))
+
+    def test_checksum_no_modify(self):
+        data = bytearray('\x01\x02\x03')
+        packet_utils.checksum(data)
+        eq_(bytearray('\x01\x02\x03'), data)
+
+    def test_checksum_ip_parts(self):
+        ip = ipv4.ipv4(src='10.0.0.1', dst='10.0.0.2', proto=inet.IPPROTO_UDP)
+        data = self.datas[-3]
+        expected = packet_utils.checksum_ip(ip, len(data), data)
+        for parts in ([data[:7], data[7:]],
+                      [data[:1], data[1:2], data[2:1001], data[1001:]],
+                      (bytearray(data[:8]), memoryview(data[8:]))):
+            eq_(expected, packet_utils.checksum_ip(ip, len(data), parts))
+
+    def _ipv4_header(self, ttl, src):
+        hdr = bytearray(struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20, 1, 0, ttl,
+                                    inet.IPPROTO_TCP, 0, src,
+                                    '\x0a\x00\x00\x02'))
+        struct.pack_into('!H', hdr, 10, packet_utils.checksum(hdr))
+        return hdr
+
+    def test_checksum_update(self):
+        hdr = self._ipv4_header(64, '\x0a\x00\x00\x01')
+        csum = struct.unpack_from('!H', hdr, 10)[0]
+
+        csum = packet_utils.checksum_update(
+            csum, 64 << 8 | inet.IPPROTO_TCP, 63 << 8 | inet.IPPROTO_TCP)
+        eq_(struct.unpack_from('!H', self._ipv4_header(
+            63, '\x0a\x00\x00\x01'), 10)[0], csum)
+
+        csum = packet_utils.checksum_update(csum, '\x0a\x00\x00\x01',
+                                            '\xc0\xa8\xff\xfe')
+        eq_(struct.unpack_from('!H', self._ipv4_header(
+            63, '\xc0\xa8\xff\xfe'), 10)[0], csum)
+
+    def test_checksum_many(self):
+        expected = [_checksum(data) for data in self.datas]
+        eq_(expected, packet_utils.checksum_many(self.datas))
+        eq_(expected[:3], packet_utils.checksum_many(self.datas[:3]))
+
+        numpy = packet_utils.numpy
+        # as if numpy weren't available
+        packet_utils.numpy = False
+        try:
+            eq_(expected, packet_utils.checksum_many(self.datas))
+        finally:
+            packet_utils.numpy = numpy
@@ -0,0 +1,164 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.ofproto import ether
+from ryu.ofproto import inet
+from ryu.lib.packet import arp
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import icmp
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import ipv6
+from ryu.lib.packet import packet
+from ryu.lib.packet import packet_view
+from ryu.lib.packet import tcp
+from ryu.lib.packet import udp
+from ryu.lib.packet import vlan
+
+
+class Test_PacketView(unittest.TestCase):
+    """ Test case for ryu.lib.packet.packet_view
+    """
+
+    dst_mac = 'aa:aa:aa:aa:aa:aa'
+    src_mac = '0a:1b:2c:3d:4e:5f'
+    src_ip = '10.0.0.1'
+    dst_ip = '192.168.1.2'
+
+    def _build(self, *protocols):
+        pkt = packet.Packet()
+        for p in protocols:
+            pkt.add_protocol(p)
+        pkt.serialize()
+        return pkt.data
+
+    def _eth(self, ethertype):
+        return ethernet.ethernet(self.dst_mac, self.src_mac, ethertype)
+
+    def _ipv4(self, proto, **kwargs):
+        return ipv4.ipv4(proto=proto, src=self.src_ip, dst=self.dst_ip,
+                         **kwargs)
+
+    def test_tcp(self):
+        data = self._build(self._eth(ether.ETH_TYPE_IP),
+                           self._ipv4(inet.IPPROTO_TCP, ttl=64),
+                           tcp.tcp(src_port=1234, dst_port=80, bits=0x12),
+                           'payload')
+        view = packet_view.PacketView(data)
+        eq_(self.dst_mac, view.eth_dst)
+        eq_(self.src_mac, view.eth_src)
+        eq_('\x0a\x1b\x2c\x3d\x4e\x5f', view.eth_src_bin)
+        eq_(ether.ETH_TYPE_IP, view.eth_type)
+        eq_((), view.vlan_vids)
+        eq_(self.src_ip, view.ipv4_src)
+        eq_(self.dst_ip, view.ipv4_dst)
+        eq_(64, view.ip_ttl)
+        eq_(inet.IPPROTO_TCP, view.ip_proto)
+        eq_(1234, view.tcp_src)
+        eq_(80, view.tcp_dst)
+        eq_(None, view.udp_src)
+        eq_(0x12, view.tcp_flags)
+        eq_('payload', str(data[view.payload_offset:]))
+        eq_(None, view.ipv6_src)
+        eq_(None, view.arp_spa)
+
+    def test_vlan_udp(self):
+        data = self._build(self._eth(ether.ETH_TYPE_8021AD),
+                           vlan.svlan(vid=100, ethertype=ether.ETH_TYPE_8021Q),
+                           vlan.vlan(vid=200, ethertype=ether.ETH_TYPE_IP),
+                           self._ipv4(inet.IPPROTO_UDP),
+                           udp.udp(src_port=68, dst_port=67))
+        view = packet_view.PacketView(data)
+        eq_((100, 200), view.vlan_vids)
+        eq_(ether.ETH_TYPE_IP, view.eth_type)
+        eq_(22, view.l3_offset)
+        eq_(42, view.l4_offset)
+        eq_(68, view.udp_src)
+        eq_(67, view.udp_dst)
+        eq_(None, view.tcp_src)
+
+    def test_arp(self):
+        data = self._build(self._eth(ether.ETH_TYPE_ARP),
+                           arp.arp_ip(arp.ARP_REQUEST, self.src_mac,
+                                      self.src_ip, '00:00:00:00:00:00',
+                                      self.dst_ip))
+        view = packet_view.PacketView(data)
+        eq_(arp.ARP_REQUEST, view.arp_op)
+        eq_(self.src_mac, view.arp_sha)
+        eq_(self.src_ip, view.arp_spa)
+        eq_('00:00:00:00:00:00', view.arp_tha)
+        eq_(self.dst_ip, view.arp_tpa)
+        eq_(None, view.ip_proto)
+        eq_(None, view.ipv4_src)
+
+    def test_icmp(self):
+        data = self._build(self._eth(ether.ETH_TYPE_IP),
+                           self._ipv4(inet.IPPROTO_ICMP),
+                           icmp.icmp(icmp.ICMP_ECHO_REQUEST, 0, 0,
+                                     icmp.echo(1, 1, 'ping')))
+        view = packet_view.PacketView(data)
+        eq_(icmp.ICMP_ECHO_REQUEST, view.icmp_type)
+        eq_(0, view.icmp_code)
+        eq_(None, view.src_port)
+
+    def test_ipv6_ext_hdrs(self):
+        ext_hdrs = [ipv6.hop_opts(nxt=inet.IPPROTO_DSTOPTS,
+                                  data=[ipv6.option(1, 4, '\x00' * 4)]),
+                    ipv6.dst_opts(nxt=inet.IPPROTO_TCP,
+                                  data=[ipv6.option(1, 4, '\x00' * 4)])]
+        data = self._build(self._eth(ether.ETH_TYPE_IPV6),
+                           ipv6.ipv6(nxt=inet.IPPROTO_HOPOPTS,
+                                     hop_limit=255, src='fe80::1',
+                                     dst='ff02::1', ext_hdrs=ext_hdrs),
+                           tcp.tcp(src_port=179, dst_port=5000))
+        view = packet_view.PacketView(data)
+        eq_('fe80::1', view.ipv6_src)
+        eq_('ff02::1', view.ipv6_dst)
+        eq_(255, view.ip_ttl)
+        eq_(inet.IPPROTO_TCP, view.ip_proto)
+        eq_(14 + 40 + 16, view.l4_offset)
+        eq_(179, view.tcp_src)
+
+    def test_ipv4_fragment(self):
+        data = self._build(self._eth(ether.ETH_TYPE_IP),
+                           self._ipv4(inet.IPPROTO_UDP, offset=100),
+                           udp.udp(src_port=1, dst_port=2))
+        view = packet_view.PacketView(data)
+        ok_(view.ip_fragment)
+        eq_(self.src_ip, view.ipv4_src)
+        eq_(None, view.l4_offset)
+        eq_(None, view.udp_src)
+
+    def test_truncated(self):
+        data = self._build(self._eth(ether.ETH_TYPE_IP),
+                           self._ipv4(inet.IPPROTO_TCP),
+                           tcp.tcp(src_port=1, dst_port=2))
+        view = packet_view.PacketView(data[:40])
+        eq_(self.dst_ip, view.ipv4_dst)
+        eq_(None, view.tcp_src)
+        view = packet_view.PacketView(data[:10])
+        eq_(None, view.eth_type)
+        eq_(None, view.eth_src)
+
+    def test_to_packet(self):
+        data = self._build(self._eth(ether.ETH_TYPE_IP),
+                           self._ipv4(inet.IPPROTO_UDP),
+                           udp.udp(src_port=1, dst_port=2))
+        view = packet_view.PacketView(buffer(data))
+        pkt = view.to_packet()
+        eq_(view.ipv4_src, pkt.get_protocol(ipv4.ipv4).src)
+        eq_(view.udp_dst, pkt.get_protocol(udp.udp).dst_port)
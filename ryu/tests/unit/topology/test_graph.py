@@ -0,0 +1,130 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.topology import event
+from ryu.topology import graph
+from ryu.topology import switches
+
+
+class _OFPPort(object):
+    def __init__(self, port_no):
+        self.port_no = port_no
+        self.hw_addr = '00:00:00:00:00:%02x' % port_no
+        self.name = 'port%d' % port_no
+        self.config = 0
+        self.state = 0
+
+
+def _link(src_dpid, src_port_no, dst_dpid, dst_port_no):
+    return switches.Link(
+        switches.Port(src_dpid, None, _OFPPort(src_port_no)),
+        switches.Port(dst_dpid, None, _OFPPort(dst_port_no)))
+
+
+class Test_TopologyGraph(unittest.TestCase):
+    """ Test case for ryu.topology.graph
+    """
+
+    def setUp(self):
+        self.graph = graph.TopologyGraph()
+
+    def _add(self, *links):
+        for src, src_port_no, dst, dst_port_no in links:
+            # links are discovered in both directions
+            self.graph.link_add_handler(event.EventLinkAdd(
+                _link(src, src_port_no, dst, dst_port_no)))
+            self.graph.link_add_handler(event.EventLinkAdd(
+                _link(dst, dst_port_no, src, src_port_no)))
+
+    def _del(self, src, src_port_no, dst, dst_port_no):
+        self.graph.link_delete_handler(event.EventLinkDelete(
+            _link(src, src_port_no, dst, dst_port_no)))
+        self.graph.link_delete_handler(event.EventLinkDelete(
+            _link(dst, dst_port_no, src, src_port_no)))
+
+    def _dpids(self, path):
+        return [link.src.dpid for link in path] + [path[-1].dst.dpid]
+
+    def _diamond(self):
+        # 1 - 2 - 4
+        #  \     /
+        #    3 -
+        self._add((1, 1, 2, 1), (1, 2, 3, 1), (2, 2, 4, 1), (3, 2, 4, 2))
+
+    def test_shortest_path(self):
+        self._diamond()
+        eq_(sorted([1, 2, 3, 4]), sorted(self.graph.dpids()))
+        path = self.graph.shortest_path(1, 4)
+        eq_([1, 2, 4], self._dpids(path))
+        eq_(1, path[0].src.port_no)
+        ok_(path is self.graph.shortest_path(1, 4))
+        eq_(2, self.graph.distance(1, 4))
+        eq_([], self.graph.shortest_path(1, 1))
+        eq_(None, self.graph.shortest_path(1, 5))
+
+    def test_ecmp(self):
+        self._diamond()
+        hops = self.graph.next_hops(1, 4)
+        eq_([2, 3], [link.dst.dpid for link in hops])
+        eq_([[1, 2, 4], [1, 3, 4]],
+            [self._dpids(path) for path in self.graph.ecmp_paths(1, 4)])
+        eq_(1, len(self.graph.ecmp_paths(1, 4, limit=1)))
+
+        # a parallel link is another next hop
+        self._add((1, 3, 2, 3))
+        eq_([(1, 1), (2, 1), (3, 3)],
+            [(link.src.port_no, link.dst.port_no)
+             for link in self.graph.next_hops(1, 4)])
+
+    def test_link_delete(self):
+        self._diamond()
+        eq_([1, 2, 4], self._dpids(self.graph.shortest_path(1, 4)))
+        self._del(2, 2, 4, 1)
+        eq_([1, 3, 4], self._dpids(self.graph.shortest_path(1, 4)))
+        self._del(3, 2, 4, 2)
+        eq_(None, self.graph.shortest_path(1, 4))
+        eq_([], self.graph.next_hops(1, 4))
+        eq_(None, self.graph.distance(1, 4))
+
+    def test_invalidation(self):
+        self._diamond()
+        path = self.graph.shortest_path(1, 3)
+        path_2 = self.graph.shortest_path(2, 3)
+        eq_(2, len(path_2))
+
+        # links which aren't on the shortest paths to 3 keep them cached
+        self.graph.link_delete_handler(event.EventLinkDelete(
+            _link(1, 1, 2, 1)))
+        self._add((5, 1, 6, 1))
+        ok_(path is self.graph.shortest_path(1, 3))
+        ok_(path_2 is self.graph.shortest_path(2, 3))
+
+        # a shorter path replaces the cached one
+        self._add((2, 3, 3, 3))
+        eq_([2, 3], self._dpids(self.graph.shortest_path(2, 3)))
+
+    def test_switch_leave(self):
+        self._diamond()
+        eq_([1, 2, 4], self._dpids(self.graph.shortest_path(1, 4)))
+        dp = type('_Datapath', (object, ), {'id': 2})()
+        sw = switches.Switch(dp)
+        self.graph.switch_leave_handler(event.EventSwitchLeave(sw))
+        ok_(2 not in self.graph.dpids())
+        eq_([1, 3, 4], self._dpids(self.graph.shortest_path(1, 4)))
+        eq_(4, len(self.graph.links()))
+        eq_([3], [link.dst.dpid for link in self.graph.links(1)])
@@ -0,0 +1,174 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from nose.tools import eq_, ok_
+
+from ryu.lib import hub
+from ryu.topology import switches
+
+
+class _Port(object):
+    def __init__(self, port_no, is_down=False):
+        self.port_no = port_no
+        self._is_down = is_down
+
+    def is_down(self):
+        return self._is_down
+
+    def __repr__(self):
+        return '_Port<%d>' % self.port_no
+
+
+class Test_PortDataState(unittest.TestCase):
+    """ Test case for the lldp scheduling of ryu.topology.switches
+    """
+
+    def _ports(self, state, count):
+        ports = [_Port(i) for i in range(count)]
+        for port in ports:
+            state.add_port(port, 'lldp')
+        return ports
+
+    def test_new_ports_first(self):
+        state = switches.PortDataState(4)
+        ports = self._ports(state, 3)
+        eq_(ports, state.due())
+        eq_([], state.due())
+        port = _Port(3)
+        state.add_port(port, 'lldp')
+        eq_([port], state.due())
+
+    def test_period(self):
+        state = switches.PortDataState(4)
+        ports = self._ports(state, 8)
+        eq_(ports, state.due())
+        # the new ports are spread over the slots, two per tick
+        probed = []
+        for _i in range(4):
+            state.advance(1)
+            due = state.due()
+            eq_(2, len(due))
+            probed.extend(due)
+        eq_(sorted(ports), sorted(probed))
+
+        # each port is due again one period later
+        for due in [probed[i:i + 2] for i in range(0, 8, 2)]:
+            state.advance(1)
+            eq_(sorted(due), sorted(state.due()))
+
+    def test_limit(self):
+        state = switches.PortDataState(2)
+        ports = self._ports(state, 5)
+        eq_(ports[:2], state.due(2))
+        eq_(ports[2:4], state.due(2))
+        state.advance(2)
+        # the front ports come first, then the carried over ports
+        due = state.due(2)
+        eq_(ports[4], due[0])
+        eq_(2, len(due))
+        rest = state.due()
+        eq_(3, len(rest))
+        eq_(sorted(ports), sorted(due + rest))
+
+    def test_move_front_and_delete(self):
+        state = switches.PortDataState(4)
+        ports = self._ports(state, 4)
+        state.due()
+        state.move_front(ports[2])
+        state.move_front(ports[2])
+        eq_(None, state[ports[2]].timestamp)
+        eq_([ports[2]], state.due())
+
+        state.move_front(ports[1])
+        state.del_port(ports[1])
+        state.del_port(ports[3])
+        ok_(ports[1] not in state)
+        state.advance(4)
+        eq_(sorted([ports[0], ports[2]]), sorted(state.due()))
+
+    def test_set_down(self):
+        state = switches.PortDataState(4)
+        port = _Port(1, is_down=True)
+        state.add_port(port, 'lldp')
+        state.due()
+        ok_(state.set_down(port))
+        eq_([], state.due())
+        port._is_down = False
+        ok_(not state.set_down(port))
+        eq_([port], state.due())
+
+
+class Test_LinkState(unittest.TestCase):
+    """ Test case for the link timeouts of ryu.topology.switches
+    """
+
+    def setUp(self):
+        self.links = switches.LinkState(timeout=10)
+        self.ports = [_Port(i) for i in range(3)]
+        self.now = hub.monotonic()
+
+    def _link(self, src, dst):
+        return switches.Link(self.ports[src], self.ports[dst])
+
+    def _update(self, src, dst):
+        self.links.update_link(self.ports[src], self.ports[dst])
+        return self._link(src, dst)
+
+    def test_expired(self):
+        now = self.now
+        link = self._update(0, 1)
+        rev_link = self._update(1, 0)
+        eq_([], self.links.expired(now))
+        ok_(self.links.next_deadline() >= now + 10)
+
+        # updated links are checked again at their new deadline
+        self.links[link] = now + 5
+        eq_([rev_link], self.links.expired(now + 10.5))
+        ok_(abs(now + 15 - self.links.next_deadline()) < 1e-6)
+        eq_([], self.links.expired(now + 14.5))
+        eq_([link], self.links.expired(now + 15.5))
+        eq_(None, self.links.next_deadline())
+
+    def test_schedule(self):
+        now = self.now
+        link = self._update(0, 1)
+        eq_([link], self.links.expired(now + 11))
+        self.links.schedule(link, now + 20)
+        eq_([], self.links.expired(now + 19))
+        eq_([link], self.links.expired(now + 21))
+
+    def test_rev_link_set_timestamp(self):
+        now = self.now
+        self._update(0, 1)
+        rev_link = self._update(1, 0)
+        self._update(0, 2)
+        self.links.rev_link_set_timestamp(rev_link, now - 10)
+        eq_([rev_link], self.links.expired(now + .5))
+
+    def test_delete(self):
+        now = self.now
+        link = self._update(0, 1)
+        self._update(1, 0)
+        self.links.port_deleted(self.ports[0])
+        eq_([], self.links.expired(now + 11))
+        eq_(None, self.links.next_deadline())
+
+        # a link added again keeps one entry in the heap
+        self._update(0, 1)
+        self.links.link_down(link)
+        self._update(0, 1)
+        eq_(1, len(self.links._deadlines))
+        eq_([link], self.links.expired(now + 11))
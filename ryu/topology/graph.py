@@ -0,0 +1,268 @@
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Topology graph
+
+TopologyGraph keeps a directed graph of the datapaths and the links
+between them, which is updated by the events of ryu.topology.switches
+instead of requesting the whole link list.  It answers shortest path
+queries by hop count, including the equal cost next hops (ECMP).
+
+The shortest paths to a destination are computed on demand, by a
+breadth first search from it, and cached together with the next hops
+and paths looked up from them, so that repeated lookups are dict
+lookups.  A link change drops only the cached destinations whose
+shortest paths it changes.
+
+Applications use it as a context with ryu.topology.switches, which must
+be run with --observe-links::
+
+    _CONTEXTS = {
+        'switches': switches.Switches,
+        'topology_graph': graph.TopologyGraph,
+    }
+
+    def _forward(self, src_dpid, dst_dpid):
+        path = self.topology_graph.shortest_path(src_dpid, dst_dpid)
+        for link in path:
+            ...
+"""
+
+import collections
+import logging
+
+from ryu.base import app_manager
+from ryu.controller.handler import set_ev_cls
+from ryu.topology import event
+
+LOG = logging.getLogger(__name__)
+
+
+def _link_key(link):
+    return (link.src.port_no, link.dst.dpid, link.dst.port_no)
+
+
+class _Paths(object):
+    # shortest paths to a destination.  dist maps the datapaths, which
+    # can reach the destination, to their hop counts to it.  next_hops
+    # and paths are filled by lookups, by the source datapath id.
+    def __init__(self, dist):
+        super(_Paths, self).__init__()
+        self.dist = dist
+        self.next_hops = {}
+        self.paths = {}
+
+
+class TopologyGraph(app_manager.RyuApp):
+    """
+    Graph of the datapaths and links discovered by switches.
+
+    Datapaths are identified by their datapath ids.  Paths are lists
+    of ryu.topology.switches.Link, from the source to the destination.
+    The returned lists are cached and must not be modified.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TopologyGraph, self).__init__(*args, **kwargs)
+        self.name = 'topology_graph'
+        # datapath id -> datapath id -> set of Link between them
+        self._links = {}
+        # the same by the datapath id of the link destination first
+        self._rev_links = {}
+        self._paths = {}    # destination datapath id -> _Paths
+
+    def dpids(self):
+        """
+        Return the list of the datapath ids in the graph.
+        """
+        return self._links.keys()
+
+    def links(self, dpid=None):
+        """
+        Return the list of the links from *dpid*, or all the links.
+        """
+        if dpid is None:
+            dpids = self._links.keys()
+        else:
+            dpids = [dpid]
+        return [link for dpid_ in dpids if dpid_ in self._links
+                for links in self._links[dpid_].itervalues()
+                for link in links]
+
+    def _add_switch(self, dpid):
+        if dpid not in self._links:
+            self._links[dpid] = {}
+            self._rev_links[dpid] = {}
+
+    def _del_switch(self, dpid):
+        if dpid not in self._links:
+            return
+        for links in self._links[dpid].values():
+            for link in list(links):
+                self._del_link(link)
+        for links in self._rev_links[dpid].values():
+            for link in list(links):
+                self._del_link(link)
+        del self._links[dpid]
+        del self._rev_links[dpid]
+        self._paths.pop(dpid, None)
+
+    def _add_link(self, link):
+        src = link.src.dpid
+        dst = link.dst.dpid
+        self._add_switch(src)
+        self._add_switch(dst)
+        links = self._links[src].setdefault(dst, set())
+        if link in links:
+            return
+        links.add(link)
+        self._rev_links[dst].setdefault(src, links)
+
+        # the link adds a shortest path to the cached destinations which
+        # dst can reach at least as fast as src
+        for dst_dpid, paths in self._paths.items():
+            dist = paths.dist
+            dst_dist = dist.get(dst)
+            if dst_dist is None:
+                continue
+            src_dist = dist.get(src)
+            if src_dist is None or src_dist > dst_dist:
+                del self._paths[dst_dpid]
+
+    def _del_link(self, link):
+        src = link.src.dpid
+        dst = link.dst.dpid
+        links = self._links.get(src, {}).get(dst)
+        if links is None or link not in links:
+            return
+        links.remove(link)
+        if not links:
+            del self._links[src][dst]
+            del self._rev_links[dst][src]
+
+        # only the destinations whose shortest paths use the link
+        for dst_dpid, paths in self._paths.items():
+            dist = paths.dist
+            dst_dist = dist.get(dst)
+            if dst_dist is not None and dist.get(src) == dst_dist + 1:
+                del self._paths[dst_dpid]
+
+    @set_ev_cls(event.EventSwitchEnter)
+    def switch_enter_handler(self, ev):
+        self._add_switch(ev.switch.dp.id)
+
+    @set_ev_cls(event.EventSwitchLeave)
+    def switch_leave_handler(self, ev):
+        self._del_switch(ev.switch.dp.id)
+
+    @set_ev_cls(event.EventLinkAdd)
+    def link_add_handler(self, ev):
+        self._add_link(ev.link)
+
+    @set_ev_cls(event.EventLinkDelete)
+    def link_delete_handler(self, ev):
+        self._del_link(ev.link)
+
+    def _get_paths(self, dst):
+        paths = self._paths.get(dst)
+        if paths is None:
+            dist = {dst: 0}
+            queue = collections.deque([dst])
+            rev_links = self._rev_links
+            while queue:
+                dpid = queue.popleft()
+                hops = dist[dpid] + 1
+                for src in rev_links[dpid]:
+                    if src not in dist:
+                        dist[src] = hops
+                        queue.append(src)
+            paths = _Paths(dist)
+            self._paths[dst] = paths
+        return paths
+
+    def distance(self, src, dst):
+        """
+        Return the hop count from *src* to *dst*, or None if *dst* can't
+        be reached.
+        """
+        if dst not in self._links:
+            return None
+        return self._get_paths(dst).dist.get(src)
+
+    def next_hops(self, src, dst):
+        """
+        Return the links from *src* which are on a shortest path to
+        *dst*, i.e. the ECMP set of *src*, sorted by port number.
+        The list is empty if *dst* can't be reached or is *src*.
+        """
+        if dst not in self._links:
+            return []
+        paths = self._get_paths(dst)
+        hops = paths.next_hops.get(src)
+        if hops is None:
+            dist = paths.dist
+            src_dist = dist.get(src)
+            hops = []
+            if src_dist:
+                for next_dpid, links in self._links[src].iteritems():
+                    if dist.get(next_dpid) == src_dist - 1:
+                        hops.extend(links)
+                hops.sort(key=_link_key)
+            paths.next_hops[src] = hops
+        return hops
+
+    def shortest_path(self, src, dst):
+        """
+        Return a shortest path from *src* to *dst*, or None if *dst*
+        can't be reached.  The path takes the next hop with the lowest
+        port number at each datapath, so it's the same for every lookup
+        while the topology doesn't change.
+        """
+        if src == dst:
+            return []
+        if dst not in self._links:
+            return None
+        paths = self._get_paths(dst)
+        path = paths.paths.get(src)
+        if path is None and src in paths.dist:
+            path = []
+            dpid = src
+            while dpid != dst:
+                link = self.next_hops(dpid, dst)[0]
+                path.append(link)
+                dpid = link.dst.dpid
+            paths.paths[src] = path
+        return path
+
+    def ecmp_paths(self, src, dst, limit=None):
+        """
+        Return the shortest paths from *src* to *dst*, at most *limit*
+        of them.  The number of paths can grow exponentially with the
+        path length, so this isn't cached; use next_hops() to program
+        ECMP hop by hop instead.
+        """
+        if src == dst:
+            return [[]]
+        result = []
+        stack = [(src, [])]
+        while stack and (limit is None or len(result) < limit):
+            dpid, path = stack.pop()
+            if dpid == dst:
+                result.append(path)
+                continue
+            for link in reversed(self.next_hops(dpid, dst)):
+                stack.append((link.dst.dpid, path + [link]))
+        return result
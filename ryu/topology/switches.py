@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import heapq
 import logging
 import struct
 import time
@@ -49,7 +51,23 @@ CONF.register_cli_opts([
                 help='link discovery: explicitly install flow entry '
                      'to send lldp packet to controller'),
     cfg.BoolOpt('explicit-drop', default=True,
-                help='link discovery: explicitly drop lldp packet in')
+                help='link discovery: explicitly drop lldp packet in'),
+    cfg.FloatOpt('lldp-period', default=.9,
+                 help='link discovery: seconds between lldp packets '
+                      'sent out of each port'),
+    cfg.IntOpt('lldp-max-rate', default=1000,
+               help='link discovery: maximum number of lldp packets '
+                    'sent per second to all the datapaths, for the probes '
+                    'and the link hellos each, 0 is unlimited'),
+    cfg.FloatOpt('link-hello-interval', default=0.,
+                 help='link discovery: seconds between hello packets sent '
+                      'over each discovered link for fast failure '
+                      'detection, 0 disables them.  the interval, and the '
+                      'link timeout with it, is longer if the hellos of '
+                      'all the links would exceed lldp-max-rate'),
+    cfg.IntOpt('link-hello-multiplier', default=3,
+               help='link discovery: number of hello intervals without '
+                    'a hello after which a link is deleted')
 ])
 
 
@@ -204,54 +222,50 @@ class PortData(object):
 
 class PortDataState(dict):
     # dict: Port class -> PortData class
-    # slimed down version of OrderedDict as python 2.6 doesn't support it.
-    _PREV = 0
-    _NEXT = 1
-    _KEY = 2
-
-    def __init__(self):
+    #
+    # the ports are also scheduled for lldp probes in a timer wheel of
+    # slots, one tick each, which spans the lldp period.  advance()
+    # moves the ports of the passed slots to the backlog, and due()
+    # returns the ports to probe now, the ones moved to the front
+    # first, and schedules them again one period later.
+    #
+    # _FRONT and _BACKLOG mark the ports in the queues instead of a slot.
+    # the queues can hold stale entries of ports which were rescheduled
+    # or deleted since, which due() skips.
+    _FRONT = -1
+    _BACKLOG = -2
+
+    def __init__(self, nslots=1):
         super(PortDataState, self).__init__()
-        self._root = root = []          # sentinel node
-        root[:] = [root, root, None]    # [_PREV, _NEXT, _KEY]
-                                        # doubly linked list
-        self._map = {}
-
-    def _remove_key(self, key):
-        link_prev, link_next, key = self._map.pop(key)
-        link_prev[self._NEXT] = link_next
-        link_next[self._PREV] = link_prev
-
-    def _append_key(self, key):
-        root = self._root
-        last = root[self._PREV]
-        last[self._NEXT] = root[self._PREV] = self._map[key] = [last, root,
-                                                                key]
-
-    def _prepend_key(self, key):
-        root = self._root
-        first = root[self._NEXT]
-        first[self._PREV] = root[self._NEXT] = self._map[key] = [root, first,
-                                                                 key]
-
-    def _move_last_key(self, key):
-        self._remove_key(key)
-        self._append_key(key)
-
-    def _move_front_key(self, key):
-        self._remove_key(key)
-        self._prepend_key(key)
+        self._slots = [set() for _i in range(nslots)]
+        self._cursor = 0                    # the slot due next
+        self._spread = 0                    # the slot for front ports
+        self._front = collections.deque()
+        self._backlog = collections.deque()
+        # port -> slot, _FRONT or _BACKLOG
+        self._state = {}
+
+    def _unschedule(self, port):
+        state = self._state.pop(port, None)
+        if state is not None and state >= 0:
+            self._slots[state].discard(port)
+
+    def _schedule_front(self, port):
+        if self._state.get(port) != self._FRONT:
+            self._unschedule(port)
+            self._state[port] = self._FRONT
+            self._front.append(port)
 
     def add_port(self, port, lldp_data):
         if port not in self:
-            self._prepend_key(port)
             self[port] = PortData(port.is_down(), lldp_data)
+            self._schedule_front(port)
         else:
             self[port].is_down = port.is_down()
 
     def lldp_sent(self, port):
         port_data = self[port]
         port_data.lldp_sent()
-        self._move_last_key(port)
         return port_data
 
     def lldp_received(self, port):
@@ -261,7 +275,7 @@ class PortDataState(dict):
         port_data = self.get(port, None)
         if port_data is not None:
             port_data.clear_timestamp()
-            self._move_front_key(port)
+            self._schedule_front(port)
 
     def set_down(self, port):
         is_down = port.is_down()
@@ -269,7 +283,7 @@ class PortDataState(dict):
         port_data.set_down(is_down)
         port_data.clear_timestamp()
         if not is_down:
-            self._move_front_key(port)
+            self._schedule_front(port)
         return is_down
 
     def get_port(self, port):
@@ -277,47 +291,127 @@ class PortDataState(dict):
 
     def del_port(self, port):
         del self[port]
-        self._remove_key(port)
-
-    def __iter__(self):
-        root = self._root
-        curr = root[self._NEXT]
-        while curr is not root:
-            yield curr[self._KEY]
-            curr = curr[self._NEXT]
+        self._unschedule(port)
+
+    def advance(self, ticks):
+        """
+        Advance the timer wheel by *ticks* slots and move their ports to
+        the backlog.
+        """
+        slots = self._slots
+        for _i in range(min(ticks, len(slots))):
+            slot = slots[self._cursor]
+            slots[self._cursor] = set()
+            self._cursor = (self._cursor + 1) % len(slots)
+            for port in slot:
+                self._state[port] = self._BACKLOG
+            self._backlog.extend(slot)
+
+    def due(self, limit=None):
+        """
+        Return the ports to probe now, at most *limit* of them.
+
+        The ports from the backlog are scheduled again in the slot which
+        is due one period after the last advanced one.  The ports from
+        the front are spread over the slots in turn so that ports added
+        at once aren't probed in a burst every period.
+        """
+        ports = []
+        nslots = len(self._slots)
+        for queue, state in ((self._front, self._FRONT),
+                             (self._backlog, self._BACKLOG)):
+            while queue and (limit is None or len(ports) < limit):
+                port = queue.popleft()
+                if self._state.get(port) != state:
+                    continue
+                if state == self._FRONT:
+                    slot = self._spread
+                    self._spread = (slot + 1) % nslots
+                else:
+                    slot = (self._cursor - 1) % nslots
+                self._state[port] = slot
+                self._slots[slot].add(port)
+                ports.append(port)
+        return ports
 
     def clear(self):
-        for node in self._map.itervalues():
-            del node[:]
-        root = self._root
-        root[:] = [root, root, None]
-        self._map.clear()
+        for slot in self._slots:
+            slot.clear()
+        self._front.clear()
+        self._backlog.clear()
+        self._state.clear()
         dict.clear(self)
 
-    def items(self):
-        'od.items() -> list of (key, value) pairs in od'
-        return [(key, self[key]) for key in self]
-
-    def iteritems(self):
-        'od.iteritems -> an iterator over the (key, value) pairs in od'
-        for k in self:
-            yield (k, self[k])
-
 
 class LinkState(dict):
     # dict: Link class -> timestamp
-    def __init__(self):
+    #
+    # the links are also kept in a heap of their deadlines, the timestamp
+    # plus timeout, so that expired() doesn't scan all the links.  the
+    # heap holds one entry per link, which is pushed again with the new
+    # deadline when it turns out to be stale, and an earlier entry when
+    # the deadline is moved earlier.  _queued has the deadline of the
+    # entry of each link, so that the superseded entries are skipped.
+    def __init__(self, timeout=None):
         super(LinkState, self).__init__()
         self._map = {}
+        self.timeout = timeout
+        self._deadlines = []    # heap of (deadline, Link class)
+        self._queued = {}       # Link class -> deadline in _deadlines
 
     def get_peer(self, src):
         return self._map.get(src, None)
 
+    def schedule(self, link, deadline=None):
+        """
+        Check *link* at *deadline* at the latest, by default when it
+        times out.
+        """
+        if deadline is None:
+            deadline = self[link] + self.timeout
+        queued = self._queued.get(link)
+        if queued is None or deadline < queued:
+            self._queued[link] = deadline
+            heapq.heappush(self._deadlines, (deadline, link))
+
+    def next_deadline(self):
+        """
+        Return the time of the next check of expired(), or None if
+        there are no links.
+        """
+        if self._deadlines:
+            return self._deadlines[0][0]
+        return None
+
+    def expired(self, now):
+        """
+        Return the list of the links which have timed out at *now*.
+        They aren't checked again until they're updated, or scheduled by
+        schedule().
+        """
+        links = []
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] < now:
+            deadline, link = heapq.heappop(deadlines)
+            if self._queued.get(link) != deadline:
+                continue
+            del self._queued[link]
+            timestamp = self.get(link)
+            if timestamp is None:
+                # the link has been deleted
+                continue
+            if timestamp + self.timeout < now:
+                links.append(link)
+            else:
+                self.schedule(link)
+        return links
+
     def update_link(self, src, dst):
         link = Link(src, dst)
 
-        self[link] = time.time()
+        self[link] = hub.monotonic()
         self._map[src] = dst
+        self.schedule(link)
 
         # return if the reverse link is also up or not
         rev_link = Link(dst, src)
@@ -331,6 +425,7 @@ class LinkState(dict):
         # rev_link may or may not in LinkSet
         if rev_link in self:
             self[rev_link] = timestamp
+            self.schedule(rev_link)
 
     def port_deleted(self, src):
         dst = self.get_peer(src)
@@ -361,8 +456,10 @@ class LLDPPacket(object):
     class LLDPUnknownFormat(RyuException):
         message = '%(msg)s'
 
+    _template = None
+
     @staticmethod
-    def lldp_packet(dpid, port_no, dl_addr, ttl):
+    def _lldp_packet(dpid, port_no, dl_addr, ttl):
         pkt = packet.Packet()
 
         dst = lldp.LLDP_MAC_NEAREST_BRIDGE
@@ -387,13 +484,43 @@ class LLDPPacket(object):
         tlvs = (tlv_chassis_id, tlv_port_id, tlv_ttl, tlv_end)
         lldp_pkt = lldp.lldp(tlvs)
         pkt.add_protocol(lldp_pkt)
+        return pkt
 
-        pkt.serialize()
-        return pkt.data
+    @staticmethod
+    def _lldp_template():
+        # all the LLDP packets have the same length, so the addresses
+        # are patched into a template.
+        pkt = LLDPPacket._lldp_packet(0, 0, DONTCARE_STR, 0)
+        template = packet.PacketTemplate(pkt)
+        template.add_field('src', ethernet.ethernet, 6, '!6s')
+
+        lldp_pkt = pkt.get_protocol(lldp.lldp)
+        tlv_chassis_id, tlv_port_id, tlv_ttl = lldp_pkt.tlvs[:3]
+        offset = lldp.LLDP_TLV_SIZE + lldp.ChassisID._PACK_SIZE
+        template.add_field('chassis_id', lldp_pkt, offset,
+                           '!%ds' % len(tlv_chassis_id.chassis_id))
+        offset = lldp.LLDP_TLV_SIZE + tlv_chassis_id.len
+        offset += lldp.LLDP_TLV_SIZE + lldp.PortID._PACK_SIZE
+        template.add_field('port_id', lldp_pkt, offset,
+                           LLDPPacket.PORT_ID_STR)
+        offset += LLDPPacket.PORT_ID_SIZE
+        offset += lldp.LLDP_TLV_SIZE
+        template.add_field('ttl', lldp_pkt, offset, lldp.TTL._PACK_STR)
+        return template
+
+    @staticmethod
+    def lldp_packet(dpid, port_no, dl_addr, ttl):
+        if LLDPPacket._template is None:
+            LLDPPacket._template = LLDPPacket._lldp_template()
+        return LLDPPacket._template.build(
+            src=addrconv.mac.text_to_bin(dl_addr),
+            chassis_id=LLDPPacket.CHASSIS_ID_FMT % dpid_to_str(dpid),
+            port_id=port_no, ttl=ttl)
 
     @staticmethod
     def lldp_parse(data):
-        pkt = packet.Packet(data)
+        # only ethernet and the next header are decoded
+        pkt = packet.Packet(data, lazy=True)
         i = iter(pkt)
         eth_pkt = i.next()
         assert type(eth_pkt) == ethernet.ethernet
@@ -430,12 +557,13 @@ class Switches(app_manager.RyuApp):
                event.EventPortAdd, event.EventPortDelete,
                event.EventPortModify,
                event.EventLinkAdd, event.EventLinkDelete]
+    # links between datapaths of different workers would never be found
+    _ALL_DATAPATHS = True
 
     DEFAULT_TTL = 120  # unused. ignored.
     LLDP_PACKET_LEN = len(LLDPPacket.lldp_packet(0, 0, DONTCARE_STR, 0))
 
-    LLDP_SEND_GUARD = .05
-    LLDP_SEND_PERIOD_PER_PORT = .9
+    LLDP_TICK = .05
     TIMEOUT_CHECK_PERIOD = 5.
     LINK_TIMEOUT = TIMEOUT_CHECK_PERIOD * 2
     LINK_LLDP_DROP = 5
@@ -446,10 +574,23 @@ class Switches(app_manager.RyuApp):
         self.name = 'switches'
         self.dps = {}                 # datapath_id => Datapath class
         self.port_state = {}          # datapath_id => ports
-        self.ports = PortDataState()  # Port class -> PortData class
-        self.links = LinkState()      # Link class -> timestamp
         self.is_active = True
 
+        self.link_hello_interval = CONF.link_hello_interval
+        self.link_hello_multiplier = CONF.link_hello_multiplier
+        if self.link_hello_interval > 0:
+            self.link_timeout = (self.link_hello_interval *
+                                 self.link_hello_multiplier)
+        else:
+            self.link_timeout = self.LINK_TIMEOUT
+        self.links = LinkState(self.link_timeout)  # Link class -> timestamp
+
+        self.lldp_period = max(CONF.lldp_period, self.LLDP_TICK)
+        self.lldp_max_rate = CONF.lldp_max_rate
+        # Port class -> PortData class
+        self.ports = PortDataState(
+            int(round(self.lldp_period / self.LLDP_TICK)))
+
         self.link_discovery = CONF.observe_links
         if self.link_discovery:
             self.install_flow = CONF.install_lldp_flow
@@ -458,6 +599,8 @@ class Switches(app_manager.RyuApp):
             self.link_event = hub.Event()
             self.threads.append(hub.spawn(self.lldp_loop))
             self.threads.append(hub.spawn(self.link_loop))
+            if self.link_hello_interval > 0:
+                self.threads.append(hub.spawn(self.link_hello_loop))
 
     def close(self):
         self.is_active = False
@@ -535,7 +678,6 @@ class Switches(app_manager.RyuApp):
                 ofproto = dp.ofproto
                 ofproto_parser = dp.ofproto_parser
 
-                # TODO:XXX need other versions
                 if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
                     rule = nx_match.ClsRule()
                     rule.set_dl_dst(addrconv.mac.text_to_bin(
@@ -546,6 +688,19 @@ class Switches(app_manager.RyuApp):
                     dp.send_flow_mod(
                         rule=rule, cookie=0, command=ofproto.OFPFC_ADD,
                         idle_timeout=0, hard_timeout=0, actions=actions)
+                elif ofproto.OFP_VERSION in (ofproto_v1_2.OFP_VERSION,
+                                             ofproto_v1_3.OFP_VERSION):
+                    match = ofproto_parser.OFPMatch(
+                        eth_type=ETH_TYPE_LLDP,
+                        eth_dst=lldp.LLDP_MAC_NEAREST_BRIDGE)
+                    actions = [ofproto_parser.OFPActionOutput(
+                        ofproto.OFPP_CONTROLLER, self.LLDP_PACKET_LEN)]
+                    inst = [ofproto_parser.OFPInstructionActions(
+                        ofproto.OFPIT_APPLY_ACTIONS, actions)]
+                    mod = ofproto_parser.OFPFlowMod(
+                        datapath=dp, match=match, priority=0xffff,
+                        instructions=inst)
+                    dp.send_msg(mod)
                 else:
                     LOG.error('cannot install flow. unsupported version. %x',
                               dp.ofproto.OFP_VERSION)
@@ -638,9 +793,12 @@ class Switches(app_manager.RyuApp):
             return
 
         dp = msg.datapath
-        # TODO:XXX
         if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
             dp.send_packet_out(buffer_id, msg.in_port, [])
+        elif dp.ofproto.OFP_VERSION in (ofproto_v1_2.OFP_VERSION,
+                                        ofproto_v1_3.OFP_VERSION):
+            dp.send_msg(dp.ofproto_parser.OFPPacketOut(
+                dp, buffer_id, msg.match['in_port'], [], None))
         else:
             LOG.error('cannot drop_packet. unsupported version. %x',
                       dp.ofproto.OFP_VERSION)
@@ -659,7 +817,10 @@ class Switches(app_manager.RyuApp):
             return
 
         dst_dpid = msg.datapath.id
-        dst_port_no = msg.in_port
+        if msg.datapath.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            dst_port_no = msg.in_port
+        else:
+            dst_port_no = msg.match['in_port']
 
         src = self._get_port(src_dpid, src_port_no)
         if not src or src.dpid == dst_dpid:
@@ -689,6 +850,8 @@ class Switches(app_manager.RyuApp):
         link = Link(src, dst)
         if not link in self.links:
             self.send_event_to_observers(event.EventLinkAdd(link))
+            # link_loop waits for the deadline of the new link
+            self.link_event.set()
 
         if not self.links.update_link(src, dst):
             # reverse link is not detected yet.
@@ -698,59 +861,99 @@ class Switches(app_manager.RyuApp):
         if self.explicit_drop:
             self._drop_packet(msg)
 
+    @staticmethod
+    def _lldp_packet_out_template(dp, port_no):
+        ofproto = dp.ofproto
+        if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            return dp.packet_out_template(port_no, ofproto.OFPP_NONE)
+        elif ofproto.OFP_VERSION in (ofproto_v1_2.OFP_VERSION,
+                                     ofproto_v1_3.OFP_VERSION):
+            return dp.packet_out_template(port_no)
+        LOG.error('cannot send lldp packet. unsupported version. %x',
+                  ofproto.OFP_VERSION)
+        return None
+
+    def _send_lldp_data(self, port_datas):
+        # the packet-outs to a datapath are sent in one buffer
+        bufs = {}   # datapath_id -> (Datapath class, bytearray)
+        for port, lldp_data in port_datas:
+            dp = self.dps.get(port.dpid, None)
+            if dp is None:
+                # datapath was already deleted
+                continue
+
+            # LOG.debug('lldp sent dpid=%s, port_no=%d', dp.id, port.port_no)
+            template = self._lldp_packet_out_template(dp, port.port_no)
+            if template is None:
+                continue
+            if port.dpid not in bufs:
+                bufs[port.dpid] = (dp, bytearray())
+            bufs[port.dpid][1].extend(template.build(lldp_data))
+
+        for dp, buf in bufs.itervalues():
+            dp.send(buf)
+
+    def send_lldp_packets(self, ports):
+        port_datas = []
+        for port in ports:
+            try:
+                port_data = self.ports.lldp_sent(port)
+            except KeyError:
+                # the port has been deleted
+                continue
+            if not port_data.is_down:
+                port_datas.append((port, port_data.lldp_data))
+        self._send_lldp_data(port_datas)
+
     def send_lldp_packet(self, port):
-        try:
-            port_data = self.ports.lldp_sent(port)
-        except KeyError as e:
-            # ports can be modified during our sleep in self.lldp_loop()
-            # LOG.debug('send_lldp: KeyError %s', e)
-            return
-        if port_data.is_down:
-            return
+        self.send_lldp_packets([port])
 
-        dp = self.dps.get(port.dpid, None)
-        if dp is None:
-            # datapath was already deleted
-            return
-
-        # LOG.debug('lldp sent dpid=%s, port_no=%d', dp.id, port.port_no)
-        # TODO:XXX
-        if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
-            actions = [dp.ofproto_parser.OFPActionOutput(port.port_no)]
-            dp.send_packet_out(actions=actions, data=port_data.lldp_data)
-        else:
-            LOG.error('cannot send lldp packet. unsupported version. %x',
-                      dp.ofproto.OFP_VERSION)
+    def _lldp_budget(self, credit, elapsed):
+        # probes allowed by lldp_max_rate, which accumulate for a tick at
+        # most
+        max_rate = self.lldp_max_rate
+        return min(credit + elapsed * max_rate,
+                   max(max_rate * self.LLDP_TICK, 1))
 
     def lldp_loop(self):
+        # the ports are probed once per lldp_period, spread over the
+        # ticks of the period, unless lldp_max_rate doesn't allow it.
+        # then the probes due are carried over to the next ticks.
+        tick = self.LLDP_TICK
+        wheel_time = now = hub.monotonic()
+        credit = 0.
+        warned = False
         while self.is_active:
             self.lldp_event.clear()
 
-            now = time.time()
-            timeout = None
-            ports_now = []
-            ports = []
-            for (key, data) in self.ports.items():
-                if data.timestamp is None:
-                    ports_now.append(key)
-                    continue
-
-                expire = data.timestamp + self.LLDP_SEND_PERIOD_PER_PORT
-                if expire <= now:
-                    ports.append(key)
-                    continue
-
-                timeout = expire - now
-                break
-
-            for port in ports_now:
-                self.send_lldp_packet(port)
-            for port in ports:
-                self.send_lldp_packet(port)
-                hub.sleep(self.LLDP_SEND_GUARD)      # don't burst
-
-            if timeout is not None and ports:
-                timeout = 0     # We have already slept
+            last = now
+            now = hub.monotonic()
+            ticks = int((now - wheel_time) / tick)
+            if ticks > 0:
+                self.ports.advance(ticks)
+                wheel_time += ticks * tick
+
+            if self.lldp_max_rate:
+                credit = self._lldp_budget(credit, now - last)
+                ports = self.ports.due(int(credit))
+                credit -= len(ports)
+                if (not warned and len(self.ports) >
+                        self.lldp_period * self.lldp_max_rate):
+                    LOG.warning('%d ports can not be probed every %s '
+                                'seconds at lldp-max-rate %d',
+                                len(self.ports), self.lldp_period,
+                                self.lldp_max_rate)
+                    warned = True
+            else:
+                ports = self.ports.due()
+            self.send_lldp_packets(ports)
+
+            if self.ports:
+                # wake up on the next tick at least 1ms later, so that
+                # rounding errors of the wheel time don't make us spin
+                timeout = max(wheel_time + tick - hub.monotonic(), .001)
+            else:
+                timeout = None
             # LOG.debug('lldp sleep %s', timeout)
             self.lldp_event.wait(timeout=timeout)
 
@@ -758,17 +961,23 @@ class Switches(app_manager.RyuApp):
         while self.is_active:
             self.link_event.clear()
 
-            now = time.time()
+            now = hub.monotonic()
             deleted = []
-            for (link, timestamp) in self.links.items():
-                # LOG.debug('%s timestamp %d (now %d)', link, timestamp, now)
-                if timestamp + self.LINK_TIMEOUT < now:
-                    src = link.src
-                    if src in self.ports:
-                        port_data = self.ports.get_port(src)
-                        # LOG.debug('port_data %s', port_data)
-                        if port_data.lldp_dropped() > self.LINK_LLDP_DROP:
-                            deleted.append(link)
+            for link in self.links.expired(now):
+                src = link.src
+                if self.link_hello_interval > 0:
+                    # hellos aren't counted. the link is down as soon as
+                    # they time out.
+                    deleted.append(link)
+                    continue
+                if src in self.ports:
+                    port_data = self.ports.get_port(src)
+                    # LOG.debug('port_data %s', port_data)
+                    if port_data.lldp_dropped() > self.LINK_LLDP_DROP:
+                        deleted.append(link)
+                        continue
+                # check it again later, as long as it times out
+                self.links.schedule(link, now + self.TIMEOUT_CHECK_PERIOD)
 
             for link in deleted:
                 self.links.link_down(link)
@@ -779,14 +988,59 @@ class Switches(app_manager.RyuApp):
                 rev_link = Link(dst, link.src)
                 if rev_link not in deleted:
                     # It is very likely that the reverse link is also
-                    # disconnected. Check it early.
-                    expire = now - self.LINK_TIMEOUT
-                    self.links.rev_link_set_timestamp(rev_link, expire)
+                    # disconnected. Check it early, unless its own
+                    # hellos tell it soon.
+                    if self.link_hello_interval <= 0:
+                        expire = now - self.link_timeout
+                        self.links.rev_link_set_timestamp(rev_link, expire)
                     if dst in self.ports:
                         self.ports.move_front(dst)
                         self.lldp_event.set()
 
-            self.link_event.wait(timeout=self.TIMEOUT_CHECK_PERIOD)
+            deadline = self.links.next_deadline()
+            if deadline is None:
+                timeout = None
+            else:
+                # at least 1ms later, so that a deadline which has just
+                # passed doesn't make us spin
+                timeout = max(deadline - hub.monotonic(), .001)
+            self.link_event.wait(timeout=timeout)
+
+    def link_hello_loop(self):
+        # send the lldp packet of the source port of every link each
+        # link_hello_interval, which is received as a hello by
+        # packet_in_handler.  the link times out when
+        # link_hello_multiplier hellos in a row are lost.  the hellos are
+        # sent at lldp_max_rate at most, apart from the probes of
+        # lldp_loop, by a longer interval and timeout if need be.
+        next_time = hub.monotonic()
+        warned = False
+        while self.is_active:
+            port_datas = []
+            for link in self.links.keys():
+                port_data = self.ports.get(link.src)
+                if port_data is not None and not port_data.is_down:
+                    port_datas.append((link.src, port_data.lldp_data))
+
+            interval = self.link_hello_interval
+            max_rate = self.lldp_max_rate
+            if max_rate and len(port_datas) > interval * max_rate:
+                interval = len(port_datas) / float(max_rate)
+                if not warned:
+                    LOG.warning('%d links can not be sent hellos every %s '
+                                'seconds at lldp-max-rate %d',
+                                len(port_datas), self.link_hello_interval,
+                                max_rate)
+                    warned = True
+            self.links.timeout = interval * self.link_hello_multiplier
+            self._send_lldp_data(port_datas)
+
+            now = hub.monotonic()
+            next_time += interval
+            if next_time < now:
+                # we're late. don't send a burst to catch up.
+                next_time = now
+            hub.sleep(next_time - now)
 
     @set_ev_cls(event.EventSwitchRequest)
     def switch_request_handler(self, req):
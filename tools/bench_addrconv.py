@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# micro benchmark of ryu.lib.addrconv.
+# it reports conversions/sec of the netaddr based converter, the
+# current converters and the current converters with a cache.
+#
+# usage example:
+# PYTHONPATH=.. ./bench_addrconv.py [seconds per conversion]
+
+import sys
+import time
+
+import netaddr
+
+from ryu.lib import addrconv
+
+
+CACHE_SIZE = 256
+
+NETADDR = {
+    'ipv4': addrconv.AddressConverter(netaddr.IPAddress,
+                                      netaddr.strategy.ipv4, version=4),
+    'ipv6': addrconv.AddressConverter(netaddr.IPAddress,
+                                      netaddr.strategy.ipv6, version=6),
+    'mac': addrconv.AddressConverter(netaddr.EUI, netaddr.strategy.eui48,
+                                     version=48,
+                                     dialect=addrconv.mac_mydialect),
+}
+
+ADDRS = [
+    ('ipv4', '192.168.10.1'),
+    ('ipv6', 'fe80::f00b:a4ff:fe7d:f8ea'),
+    ('mac', 'f2:0b:a4:01:0a:23'),
+]
+
+
+def _rate(func, arg, duration):
+    count = 0
+    start = time.time()
+    end = start + duration
+    now = start
+    while now < end:
+        for _i in xrange(1000):
+            func(arg)
+        count += 1000
+        now = time.time()
+    return count / (now - start)
+
+
+def bench(name, text, duration):
+    conv = getattr(addrconv, name)
+    bin = conv.text_to_bin(text)
+    for func, arg in (('text_to_bin', text), ('bin_to_text', bin)):
+        rates = []
+        rates.append(_rate(getattr(NETADDR[name], func), arg, duration))
+        rates.append(_rate(getattr(conv, func), arg, duration))
+        conv.set_cache_size(CACHE_SIZE)
+        rates.append(_rate(getattr(conv, func), arg, duration))
+        conv.set_cache_size(0)
+        print '%-4s %-11s netaddr %9.0f fast %9.0f (x%.1f) cached %9.0f' \
+            ' conversions/sec' % (name, func, rates[0], rates[1],
+                                  rates[1] / rates[0], rates[2])
+
+
+def main():
+    duration = 0.5
+    if len(sys.argv) > 1:
+        duration = float(sys.argv[1])
+    for name, text in ADDRS:
+        bench(name, text, duration)
+
+
+if __name__ == '__main__':
+    main()
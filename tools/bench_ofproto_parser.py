@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# micro benchmark of the openflow message parsers and serializers.
+# it reports msgs/sec for every message in ryu/tests/packet_data/of1x.
+#
+# usage example:
+# PYTHONPATH=.. ./bench_ofproto_parser.py [seconds per message] [of13 ...]
+
+import fnmatch
+import json
+import os
+import sys
+import time
+
+from ryu import ofproto
+from ryu.ofproto import ofproto_parser
+
+
+TOP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir)
+PACKET_DATA_DIR = os.path.join(TOP_DIR, 'ryu', 'tests', 'packet_data')
+JSON_DIR = os.path.join(TOP_DIR, 'ryu', 'tests', 'unit', 'ofproto', 'json')
+OF_VERSIONS = ['of10', 'of12', 'of13']
+
+
+class DummyDatapath(object):
+    def __init__(self, ofp, ofpp):
+        self.ofproto = ofp
+        self.ofproto_parser = ofpp
+
+
+def _rate(func, duration):
+    count = 0
+    start = time.time()
+    end = start + duration
+    now = start
+    while now < end:
+        for _i in xrange(100):
+            func()
+        count += 100
+        now = time.time()
+    return count / (now - start)
+
+
+def _parse(dp, wire_msg):
+    (version, msg_type, msg_len, xid) = ofproto_parser.header(wire_msg)
+    msg = ofproto_parser.msg(dp, version, msg_type, msg_len, xid, wire_msg)
+    # measure full decoding
+    for attr in msg._LAZY_ATTRS:
+        getattr(msg, attr)
+    return msg
+
+
+def bench(ver, duration):
+    pdir = os.path.join(PACKET_DATA_DIR, ver)
+    jdir = os.path.join(JSON_DIR, ver)
+    ofp_modules = ofproto.get_ofp_modules()
+    for name in sorted(os.listdir(pdir)):
+        if not fnmatch.fnmatch(name, '*.packet'):
+            continue
+        wire_msg = open(os.path.join(pdir, name), 'rb').read()
+        version = ofproto_parser.header(wire_msg)[0]
+        dp = DummyDatapath(*ofp_modules[version])
+
+        parse_rate = _rate(lambda: _parse(dp, wire_msg), duration)
+
+        # only messages whose serializer reproduces the wire format
+        serialize_rate = None
+        json_dict = json.load(open(os.path.join(jdir, name + '.json')))
+        msg = ofproto_parser.ofp_msg_from_jsondict(dp, json_dict)
+        try:
+            msg.serialize()
+        except Exception:
+            pass
+        if msg.buf == wire_msg:
+            serialize_rate = _rate(msg.serialize, duration)
+
+        print '%s %-40s parse %9.0f msgs/sec serialize %s' % (
+            ver, name, parse_rate,
+            '%9.0f msgs/sec' % serialize_rate
+            if serialize_rate is not None else '      n/a')
+
+
+def main():
+    args = sys.argv[1:]
+    duration = 0.2
+    if args and not args[0].startswith('of'):
+        duration = float(args.pop(0))
+    for ver in args or OF_VERSIONS:
+        bench(ver, duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2013 Nippon Telegraph and Telephone Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# benchmark of ryu.lib.hub.TimerWheel with many concurrent timers.
+# it reports the cost of the timer operations with a simulated clock,
+# then runs the timers in real time on the thread of the wheel and on a
+# thread per timer, and reports how late they expired.
+#
+# usage example:
+# PYTHONPATH=.. ./bench_timer_wheel.py [number of timers]
+
+import random
+import sys
+import time
+
+from ryu.lib import hub
+hub.patch()
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+def _ops(count):
+    clock = _Clock()
+    wheel = hub.TimerWheel(clock=clock)
+    rand = random.Random(0)
+    delays = [rand.uniform(1, 30) for _i in xrange(count)]
+    fired = []
+
+    start = time.time()
+    timers = [wheel.call_later(delay, fired.append, None)
+              for delay in delays]
+    add = time.time() - start
+
+    start = time.time()
+    for timer, delay in zip(timers, delays):
+        timer.reschedule(delay)
+    reschedule = time.time() - start
+
+    start = time.time()
+    for timer in timers[::2]:
+        timer.cancel()
+    cancel = (time.time() - start) * 2
+
+    start = time.time()
+    while len(wheel):
+        clock.now += wheel.tick
+        wheel.run()
+    run = time.time() - start
+    assert len(fired) == count - len(timers[::2])
+
+    for name, elapsed in (('call_later', add), ('reschedule', reschedule),
+                          ('cancel', cancel)):
+        print '%-10s %6.2f usec/timer' % (name, elapsed / count * 1e6)
+    print 'expire     %6.2f usec/timer (30 simulated seconds)' % (
+        run / len(fired) * 1e6)
+
+
+def _realtime(count, use_threads):
+    rand = random.Random(0)
+    lates = []
+    done = hub.Event()
+
+    def _expired(expires):
+        lates.append(time.time() - expires)
+        if len(lates) == count:
+            done.set()
+
+    def _thread(delay, expires):
+        hub.sleep(delay)
+        _expired(expires)
+
+    start = time.time()
+    for _i in xrange(count):
+        delay = rand.uniform(1, 3)
+        if use_threads:
+            hub.spawn(_thread, delay, time.time() + delay)
+        else:
+            hub.call_later(delay, _expired, time.time() + delay)
+    setup = time.time() - start
+    done.wait()
+    lates.sort()
+    print '%-8s setup %5.2f sec late avg %6.1f ms 99%% %6.1f ms ' \
+        'max %6.1f ms' % ('threads' if use_threads else 'wheel', setup,
+                          sum(lates) / count * 1000,
+                          lates[count * 99 / 100] * 1000, lates[-1] * 1000)
+
+
+def main():
+    count = 100000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    print '%d timers' % count
+    _ops(count)
+    _realtime(count, False)
+    _realtime(count, True)
+
+
+if __name__ == '__main__':
+    main()